@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+AI Detection Audit - batch ai_detection over the whole site
+סריקת AI לכל הדפים: מאגר עובדים, מטמון ציונים לפי hash של התוכן, תוצאות בזרימה ודירוג
+
+דף שהתוכן שלו לא השתנה מאז הסריקה הקודמת לא מנותח שוב - הציון מוגש מהמטמון.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Iterator, Optional
+
+import ai_detection
+from json_store import JsonDocumentStore
+
+
+BASE_DIR = Path(__file__).parent
+SCORES_FILE = BASE_DIR / "cache" / "ai_detection_scores.json"
+
+# Pages are analyzed in a process pool (analysis is CPU-bound); small batches stay in-process
+AUDIT_WORKERS = min(8, os.cpu_count() or 1)
+AUDIT_PARALLEL_MIN_PAGES = 16
+
+# Part of the content hash - bump when ai_detection scoring changes so cached scores are recomputed
+SCORER_VERSION = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def content_hash(content: str) -> str:
+    """hash של התוכן + גרסת הניקוד"""
+    return hashlib.sha1(f"{SCORER_VERSION}:{content}".encode('utf-8')).hexdigest()
+
+
+def _summarize(result: Dict) -> Dict:
+    """שמירת הסיכום בלבד (ללא רשימת ה-issues המלאה) - קטן לאחסון ולהעברה בין תהליכים"""
+    return {
+        'score': result.get('score', 0),
+        'confidence': result.get('confidence', ''),
+        'total_issues': result.get('total_issues', 0),
+        'text_length': result.get('text_length', 0),
+        'word_count': result.get('word_count', 0),
+        'categories': result.get('categories', {})
+    }
+
+
+def _analyze_worker(content: str) -> Dict:
+    """Process-pool entry point"""
+    return _summarize(ai_detection.analyze(content))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Persistent pool, started on first use (on Windows each worker imports the main module once)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=AUDIT_WORKERS)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class AIDetectionAudit:
+    """
+    ניתוח AI למספר דפים
+    pages: [{'path': 'relative/to/BASE_DIR.html', 'name': ..., 'site': ...}, ...]
+    """
+
+    def __init__(self, workers: int = AUDIT_WORKERS):
+        self.workers = workers
+        # {'scores': {path: {hash, analyzed_at, score, confidence, ...}}}
+        self._store = JsonDocumentStore.open(SCORES_FILE, lambda: {'scores': {}})
+
+    def _page_result(self, page: Dict, summary: Dict, cached: bool) -> Dict:
+        result = {
+            'path': page['path'],
+            'name': page.get('name', Path(page['path']).stem),
+            'site': page.get('site'),
+            'cached': cached
+        }
+        result.update({k: v for k, v in summary.items() if k != 'hash'})
+        return result
+
+    def iter_results(self, pages: List[Dict]) -> Iterator[Dict]:
+        """
+        תוצאה לכל דף ברגע שהיא מוכנה: קודם כל הדפים מהמטמון, אחר כך דפים שנותחו (לפי סדר סיום)
+        Failed pages yield {'path', 'error'}
+        """
+        pending = []
+        for page in pages:
+            try:
+                with open(BASE_DIR / page['path'], 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except Exception as e:
+                yield {'path': page['path'], 'error': str(e)}
+                continue
+
+            digest = content_hash(content)
+            cached = self._store.get('scores', page['path'])
+            if cached and cached.get('hash') == digest:
+                yield self._page_result(page, cached, cached=True)
+            else:
+                pending.append((page, content, digest))
+
+        for page, digest, summary, error in self._analyze(pending):
+            if error:
+                yield {'path': page['path'], 'error': error}
+                continue
+            entry = dict(summary, hash=digest, analyzed_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+            self._store.put('scores', page['path'], entry)
+            yield self._page_result(page, summary, cached=False)
+
+    def _analyze(self, pending):
+        """(page, hash, summary, error) per pending page - in the process pool when there are enough"""
+        done = set()
+        if self.workers > 1 and len(pending) >= AUDIT_PARALLEL_MIN_PAGES:
+            try:
+                pool = _get_pool()
+                futures = {pool.submit(_analyze_worker, content): (page, digest) for page, content, digest in pending}
+                for future in as_completed(futures):
+                    page, digest = futures[future]
+                    try:
+                        summary, error = future.result(), None
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        summary, error = None, str(e)
+                    done.add(page['path'])
+                    yield page, digest, summary, error
+                return
+            except (BrokenProcessPool, OSError) as e:
+                # Broken pool - analyze the rest in-process
+                print(f"[AI Audit] Worker pool failed ({e}) - continuing in-process")
+                _reset_pool()
+                pending = [item for item in pending if item[0]['path'] not in done]
+
+        for page, content, digest in pending:
+            try:
+                yield page, digest, _analyze_worker(content), None
+            except Exception as e:
+                yield page, digest, None, str(e)
+
+    def run(self, pages: List[Dict], limit: int = 20, min_score: int = 0) -> Dict:
+        """ניתוח מלא (לא בזרימה) + דירוג"""
+        started = time.time()
+        results = list(self.iter_results(pages))
+        return self.summary(results, started, limit, min_score)
+
+    @staticmethod
+    def rank(results: List[Dict], limit: Optional[int] = 20, min_score: int = 0) -> List[Dict]:
+        """הדפים עם ציון ה-AI הגבוה ביותר (מועמדים לשלבי הסרת AI)"""
+        scored = [r for r in results if 'error' not in r and r.get('score', 0) >= min_score]
+        scored.sort(key=lambda r: (-r['score'], -r.get('total_issues', 0), r['path']))
+        return scored[:limit] if limit else scored
+
+    def summary(self, results: List[Dict], started: float, limit: int = 20, min_score: int = 0) -> Dict:
+        scored = [r for r in results if 'error' not in r]
+        return {
+            'success': True,
+            'total_pages': len(results),
+            'analyzed': sum(1 for r in scored if not r['cached']),
+            'cached': sum(1 for r in scored if r['cached']),
+            'errors': [r for r in results if 'error' in r],
+            'average_score': round(sum(r['score'] for r in scored) / len(scored), 1) if scored else 0,
+            'ranking': self.rank(results, limit, min_score),
+            'seconds': round(time.time() - started, 2)
+        }
+
+    def cached_ranking(self, limit: Optional[int] = 20, min_score: int = 0) -> List[Dict]:
+        """דירוג מהציונים השמורים בלבד (ללא קריאת דפים) - נכון לסריקה האחרונה של כל דף"""
+        results = []
+        for path in self._store.keys('scores'):
+            entry = self._store.get('scores', path)
+            if entry:
+                result = {'path': path, 'name': Path(path).stem, 'cached': True, 'analyzed_at': entry.get('analyzed_at')}
+                result.update({k: v for k, v in entry.items() if k not in ('hash', 'analyzed_at')})
+                results.append(result)
+        return self.rank(results, limit, min_score)
@@ -5,6 +5,9 @@ Based on the N8N JavaScript algorithm for detecting AI-generated content in Hebr
 """
 
 import re
+import sys
+import time
+import random
 from html.parser import HTMLParser
 from collections import Counter
 
@@ -174,119 +177,148 @@ def extract_text_from_html(html_content):
     return text.strip()
 
 
+# ============================================
+# PHRASE MATCHER (compiled once)
+# ============================================
+
+# (list/dict, category, suggestion template, needs word boundaries)
+PHRASE_CATEGORIES = [
+    (AI_PHRASES, 'ai_phrase', 'שקול להסיר או לנסח מחדש בשפה טבעית יותר', False),
+    (CLAUDE_FINGERPRINTS, 'claude_fingerprint', 'ביטוי אופייני ל-Claude - שקול ניסוח אחר', False),
+    (FORMAL_TO_CASUAL, 'formal_language', 'שפה גבוהה מדי - שקול "{replacement}" במקום "{phrase}"', True),
+    (TAUTOLOGIES, 'tautology', 'כפילות מיותרת - שקול "{replacement}" במקום "{phrase}"', False),
+    (SUPERLATIVES, 'superlative', 'שפה מוגזמת - שקול "{replacement}" במקום "{phrase}"', False),
+]
+
+DIDACTIC_PATTERN = re.compile(r'\?\s+(כי|מכיוון ש|בגלל ש|הסיבה היא)')
+
+
+def _trie_pattern(phrases):
+    """
+    Regex shaped like a trie of the phrases - one character branch per step instead of
+    trying every phrase at every position. Greedy optional tails give the longest match.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = True
+    
+    def build(node):
+        terminal = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 and not terminal else '(?:' + '|'.join(branches) + ')'
+        return body + '?' if terminal else body
+    
+    return build(trie)
+
+
+class PhraseMatcher:
+    """
+    All phrase lists in one automaton: a single left-to-right pass over the text yields
+    every occurrence of every phrase (overlapping ones included)
+    """
+    
+    def __init__(self, categories):
+        # phrase -> [(category, suggestion, replacement, needs_boundary)]
+        self.entries = {}
+        for phrases, category, suggestion, needs_boundary in categories:
+            for phrase in phrases:
+                replacement = phrases[phrase] if isinstance(phrases, dict) else None
+                self.entries.setdefault(phrase, []).append(
+                    (category, suggestion.format(phrase=phrase, replacement=replacement), replacement, needs_boundary)
+                )
+        
+        # The lookahead matches at every position (zero width) and captures the longest phrase there;
+        # shorter phrases starting at the same position are exactly its prefixes
+        self.pattern = re.compile('(?=(' + _trie_pattern(self.entries) + '))')
+        self.prefixes = {
+            phrase: [other for other in self.entries if other != phrase and phrase.startswith(other)]
+            for phrase in self.entries
+        }
+    
+    @staticmethod
+    def _is_word_boundary(text, pos):
+        """Same rule as regex \\b: word character on exactly one side"""
+        before = pos > 0 and (text[pos - 1].isalnum() or text[pos - 1] == '_')
+        after = pos < len(text) and (text[pos].isalnum() or text[pos] == '_')
+        return before != after
+    
+    def scan(self, text):
+        """All issues by category, in text order: {category: [issue, ...]}"""
+        found = {category: [] for _, category, _, _ in PHRASE_CATEGORIES}
+        
+        for match in self.pattern.finditer(text):
+            pos = match.start()
+            longest = match.group(1)
+            for phrase in [longest] + self.prefixes[longest]:
+                end = pos + len(phrase)
+                for category, suggestion, replacement, needs_boundary in self.entries[phrase]:
+                    if needs_boundary and not (self._is_word_boundary(text, pos) and self._is_word_boundary(text, end)):
+                        continue
+                    
+                    context_start = max(0, pos - 30)
+                    context_end = min(len(text), end + 30)
+                    issue = {
+                        'phrase': phrase,
+                        'position': pos,
+                        'context': f"...{text[context_start:context_end]}...",
+                        'category': category,
+                        'suggestion': suggestion
+                    }
+                    if replacement is not None:
+                        issue['replacement'] = replacement
+                    found[category].append(issue)
+        
+        return found
+
+
+_phrase_matcher = None
+
+
+def get_phrase_matcher():
+    """Shared matcher, compiled on first use"""
+    global _phrase_matcher
+    if _phrase_matcher is None:
+        _phrase_matcher = PhraseMatcher(PHRASE_CATEGORIES)
+    return _phrase_matcher
+
+
 # ============================================
 # ANALYSIS FUNCTIONS
 # ============================================
 
+def scan_phrases(text):
+    """Every dictionary phrase occurrence in one pass: {category: [issue, ...]}"""
+    return get_phrase_matcher().scan(text)
+
+
 def check_ai_phrases(text):
     """Find AI-typical phrases in text."""
-    found = []
-    for phrase in AI_PHRASES:
-        if phrase in text:
-            # Find position for context
-            pos = text.find(phrase)
-            context_start = max(0, pos - 30)
-            context_end = min(len(text), pos + len(phrase) + 30)
-            context = text[context_start:context_end]
-            
-            found.append({
-                'phrase': phrase,
-                'position': pos,
-                'context': f"...{context}...",
-                'category': 'ai_phrase',
-                'suggestion': 'שקול להסיר או לנסח מחדש בשפה טבעית יותר'
-            })
-    
-    return found
+    return scan_phrases(text)['ai_phrase']
 
 
 def check_claude_fingerprints(text):
     """Find Claude-specific language patterns."""
-    found = []
-    for fingerprint in CLAUDE_FINGERPRINTS:
-        if fingerprint in text:
-            pos = text.find(fingerprint)
-            context_start = max(0, pos - 30)
-            context_end = min(len(text), pos + len(fingerprint) + 30)
-            context = text[context_start:context_end]
-            
-            found.append({
-                'phrase': fingerprint,
-                'position': pos,
-                'context': f"...{context}...",
-                'category': 'claude_fingerprint',
-                'suggestion': 'ביטוי אופייני ל-Claude - שקול ניסוח אחר'
-            })
-    
-    return found
+    return scan_phrases(text)['claude_fingerprint']
 
 
 def check_formal_language(text):
     """Find overly formal language."""
-    found = []
-    for formal, casual in FORMAL_TO_CASUAL.items():
-        pattern = rf'\b{re.escape(formal)}\b'
-        matches = list(re.finditer(pattern, text))
-        for match in matches:
-            pos = match.start()
-            context_start = max(0, pos - 30)
-            context_end = min(len(text), pos + len(formal) + 30)
-            context = text[context_start:context_end]
-            
-            found.append({
-                'phrase': formal,
-                'position': pos,
-                'context': f"...{context}...",
-                'category': 'formal_language',
-                'suggestion': f'שפה גבוהה מדי - שקול "{casual}" במקום "{formal}"',
-                'replacement': casual
-            })
-    
-    return found
+    return scan_phrases(text)['formal_language']
 
 
 def check_tautologies(text):
     """Find redundant phrases."""
-    found = []
-    for tautology, fix in TAUTOLOGIES.items():
-        if tautology in text:
-            pos = text.find(tautology)
-            context_start = max(0, pos - 30)
-            context_end = min(len(text), pos + len(tautology) + 30)
-            context = text[context_start:context_end]
-            
-            found.append({
-                'phrase': tautology,
-                'position': pos,
-                'context': f"...{context}...",
-                'category': 'tautology',
-                'suggestion': f'כפילות מיותרת - שקול "{fix}" במקום "{tautology}"',
-                'replacement': fix
-            })
-    
-    return found
+    return scan_phrases(text)['tautology']
 
 
 def check_superlatives(text):
     """Find exaggerated language."""
-    found = []
-    for superlative, alternative in SUPERLATIVES.items():
-        if superlative in text:
-            pos = text.find(superlative)
-            context_start = max(0, pos - 30)
-            context_end = min(len(text), pos + len(superlative) + 30)
-            context = text[context_start:context_end]
-            
-            found.append({
-                'phrase': superlative,
-                'position': pos,
-                'context': f"...{context}...",
-                'category': 'superlative',
-                'suggestion': f'שפה מוגזמת - שקול "{alternative}" במקום "{superlative}"',
-                'replacement': alternative
-            })
-    
-    return found
+    return scan_phrases(text)['superlative']
 
 
 def check_structure_issues(text):
@@ -308,8 +340,7 @@ def check_structure_issues(text):
             break
     
     # Check for didactic Q&A pattern
-    didactic_pattern = re.compile(r'\?\s+(כי|מכיוון ש|בגלל ש|הסיבה היא)')
-    matches = list(didactic_pattern.finditer(text))
+    matches = list(DIDACTIC_PATTERN.finditer(text))
     if matches:
         for match in matches[:3]:  # Limit to first 3
             issues.append({
@@ -401,14 +432,8 @@ def analyze(html_content):
             'word_count': len(text.split())
         }
     
-    # Run all checks
-    issues_by_category = {
-        'ai_phrase': check_ai_phrases(text),
-        'claude_fingerprint': check_claude_fingerprints(text),
-        'formal_language': check_formal_language(text),
-        'tautology': check_tautologies(text),
-        'superlative': check_superlatives(text),
-    }
+    # Run all dictionary checks in one pass over the text
+    issues_by_category = scan_phrases(text)
     
     # Add structure issues
     structure_issues = check_structure_issues(text)
@@ -464,5 +489,63 @@ def analyze(html_content):
     }
 
 
+# ============================================
+# BENCHMARK
+# ============================================
+
+def _legacy_scan(text):
+    """Previous implementation: one str.find per phrase (first hit only), one regex per formal word"""
+    found = 0
+    for phrases, category, _, _ in PHRASE_CATEGORIES:
+        if category == 'formal_language':
+            for formal in phrases:
+                found += len(list(re.finditer(rf'\b{re.escape(formal)}\b', text)))
+        else:
+            found += sum(1 for phrase in phrases if phrase in text and text.find(phrase) >= 0)
+    return found
+
+
+def benchmark(sizes=(5000, 50000, 200000), repeats=5):
+    """Time the single-pass matcher against the per-phrase loops on synthetic long pages."""
+    rng = random.Random(7)
+    phrases = [phrase for entries, _, _, _ in PHRASE_CATEGORIES for phrase in entries]
+    filler = 'אני הולך הביתה עם הכלב שלי אחרי יום ארוך בעבודה והשמש כבר שוקעת מעל הים'.split()
+    get_phrase_matcher()  # compile outside the timing
+    
+    results = []
+    for size in sizes:
+        words, length = [], 0
+        while length < size:
+            word = rng.choice(phrases) if rng.random() < 0.03 else rng.choice(filler)
+            words.append(word)
+            length += len(word) + 1
+        text = ' '.join(words)
+        
+        started = time.time()
+        for _ in range(repeats):
+            issues = scan_phrases(text)
+        matcher_time = (time.time() - started) / repeats
+        
+        started = time.time()
+        for _ in range(repeats):
+            legacy_found = _legacy_scan(text)
+        legacy_time = (time.time() - started) / repeats
+        
+        result = {
+            'characters': len(text),
+            'matcher_ms': round(matcher_time * 1000, 2),
+            'legacy_ms': round(legacy_time * 1000, 2),
+            'occurrences': sum(len(v) for v in issues.values()),
+            'legacy_occurrences': legacy_found
+        }
+        results.append(result)
+        print(f"  {len(text):>7} chars | matcher {result['matcher_ms']:>8}ms | legacy {result['legacy_ms']:>8}ms | "
+              f"occurrences {result['occurrences']} (legacy {legacy_found})")
+    
+    return results
 
 
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        print("Benchmarking AI phrase detection (single-pass matcher vs per-phrase loops)...")
+        benchmark()
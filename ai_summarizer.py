@@ -4,11 +4,23 @@ AI Summarizer Service - Ollama Multi-Model Integration
 שירות סיכום AI עם מודלים מקומיים דרך Ollama (Gemma 2 9B, Qwen 2.5 14B)
 """
 
+import os
+import re
+import sys
 import json
-import requests
+import time
+import random
+import difflib
 import hashlib
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, Future
 from datetime import datetime
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Callable, Iterable, Iterator, Tuple
+from requests.adapters import HTTPAdapter
+
+from llm_cache import LLMResultCache, get_llm_cache
+from financial_rules import extract_financial_rules
 
 
 # Supported AI models with display names
@@ -41,9 +53,333 @@ SUPPORTED_MODELS = {
 }
 
 DEFAULT_MODEL = 'gemma2:9b'
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+# Requests Ollama serves at once (set OLLAMA_NUM_PARALLEL to the server's value).
+# Extra in-flight requests only wait inside Ollama and eat into the client timeout.
+OLLAMA_NUM_PARALLEL = max(1, int(os.environ.get('OLLAMA_NUM_PARALLEL') or 1))
+
+# Part of every LLM cache key - bump when response handling changes without the prompt text changing
+# (prompt template edits already change the key)
+PROMPT_VERSION = 1
+
+# Content longer than this is summarized map-reduce (chunks in parallel + deterministic merge)
+# instead of being cut to its first SUMMARY_SINGLE_SHOT_CHARS characters
+SUMMARY_SINGLE_SHOT_CHARS = 12000
+SUMMARY_CHUNK_WORDS = 900
+SUMMARY_CHUNK_OVERLAP = 60
+
+# compare_versions sends only changed hunks: this many unchanged segments (lines/sentences) of
+# context around each change, and at most this many characters of diff per prompt
+DIFF_CONTEXT_SEGMENTS = 1
+COMPARE_MAX_DIFF_CHARS = 6000
+
+# extract_financial_data: rule results at or above this confidence are final; the LLM is called only
+# when a core field is below it and the page has values of that kind. Model answers get LLM_FIELD_CONFIDENCE.
+RULE_CONFIDENCE_THRESHOLD = 0.7
+LLM_FIELD_CONFIDENCE = 0.5
+FINANCIAL_CORE_FIELDS = ('interest_rates', 'amounts', 'periods')
+FINANCIAL_OPTIONAL_FIELDS = ('fees', 'conditions', 'last_updated')
+FINANCIAL_FIELD_SCHEMAS = {
+    'interest_rates': '[\n        {"value": "X%", "type": "שם סוג הריבית", "context": "הקשר קצר"}\n    ]',
+    'amounts': '[\n        {"value": "XXX ש\\"ח", "type": "מינימום/מקסימום/דוגמה", "context": "הקשר"}\n    ]',
+    'periods': '[\n        {"value": "X חודשים/שנים", "type": "מינימום/מקסימום", "context": "הקשר"}\n    ]',
+    'fees': '[\n        {"value": "XXX", "description": "תיאור העמלה"}\n    ]',
+    'conditions': '[\n        "תנאי 1",\n        "תנאי 2"\n    ]',
+    'last_updated': '"תאריך עדכון אם מוזכר"'
+}
+
+# Summary sections where every distinct value found across chunks is kept (rate tables list several)
+MULTI_VALUE_SECTIONS = ('rates', 'amounts', 'periods')
+NOT_SPECIFIED = 'לא צוין'
+_EMPTY_VALUES = {'', NOT_SPECIFIED, 'לא מצוין', 'לא ידוע', 'n/a', 'none', 'null', '-'}
+
+# /api/tags result reuse (seconds) - a failed check is retried sooner
+AVAILABILITY_TTL = 60
+UNAVAILABLE_TTL = 10
+
+
+class JsonObjectScanner:
+    """
+    זיהוי מצטבר של סוף אובייקט ה-JSON העליון הראשון בטקסט שמגיע בחלקים
+    (סופר סוגריים מסולסלים מחוץ למחרוזות - כל תו נסרק פעם אחת)
+    """
+    
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.length = 0
+        self.end = None  # offset just past the closing '}', once seen
+    
+    def feed(self, chunk: str) -> Optional[int]:
+        """הוספת חלק טקסט - מחזיר את ה-offset שאחרי ה-'}' הסוגר, או None אם האובייקט עוד לא נסגר"""
+        if self.end is not None:
+            return self.end
+        for i, ch in enumerate(chunk):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                if self.depth:
+                    self.in_string = True
+            elif ch == '{':
+                self.depth += 1
+            elif ch == '}' and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    self.end = self.length + i + 1
+                    return self.end
+        self.length += len(chunk)
+        return None
 
 
-def get_available_models(base_url: str = "http://localhost:11434") -> List[Dict[str, Any]]:
+class OllamaClient:
+    """
+    לקוח HTTP משותף ל-Ollama: session עם חיבורים חוזרים, הגבלת מקביליות, תור עבודות ומטמון זמינות
+    מופע אחד לכל base_url - כל ה-summarizers (לכל מודל) חולקים אותו
+    """
+    
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, num_parallel: int = OLLAMA_NUM_PARALLEL):
+        self.base_url = base_url.rstrip('/')
+        self.num_parallel = max(1, num_parallel)
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(4, self.num_parallel * 2))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.num_parallel)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._worker = threading.local()
+        self._tags: Optional[Tuple[float, Optional[List[str]]]] = None  # (checked_at, names or None if unreachable)
+    
+    def set_parallel(self, num_parallel: int):
+        """שינוי מספר הבקשות המקביליות (בקשות שכבר רצות/בתור מסתיימות כרגיל)"""
+        num_parallel = max(1, num_parallel)
+        with self._lock:
+            if num_parallel == self.num_parallel:
+                return
+            self.num_parallel = num_parallel
+            self._slots = threading.BoundedSemaphore(num_parallel)
+            old_executor, self._executor = self._executor, None
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+    
+    # ============ Availability ============
+    
+    def list_models(self, refresh: bool = False) -> Optional[List[str]]:
+        """שמות המודלים המותקנים (None אם Ollama לא זמין) - ממטמון עם TTL"""
+        with self._lock:
+            cached = self._tags
+        if cached and not refresh:
+            checked_at, names = cached
+            ttl = AVAILABILITY_TTL if names is not None else UNAVAILABLE_TTL
+            if time.time() - checked_at < ttl:
+                return names
+        
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
+            response.raise_for_status()
+            names = [m.get('name', '') for m in response.json().get('models', [])]
+        except Exception as e:
+            print(f"[AI] Ollama not available: {e}")
+            names = None
+        
+        with self._lock:
+            self._tags = (time.time(), names)
+        return names
+    
+    def has_model(self, model: str, refresh: bool = False) -> bool:
+        names = self.list_models(refresh=refresh)
+        return bool(names) and any(model.split(':')[0] in name for name in names)
+    
+    def invalidate(self):
+        with self._lock:
+            self._tags = None
+    
+    # ============ Requests ============
+    
+    def generate_stream(self, payload: Dict[str, Any], timeout: float) -> Iterator[Dict[str, Any]]:
+        """
+        POST /api/generate בזרימה - מחזיר את שורות ה-NDJSON של Ollama אחת אחת
+        ממתין לסלוט פנוי (לכל היותר num_parallel בקשות בו זמנית); סגירת הגנרטור מנתקת את החיבור
+        ו-Ollama מפסיק לייצר טוקנים. timeout חל על ההתחברות ועל כל המתנה לטוקן, לא על כל התשובה.
+        """
+        slots = self._slots
+        with slots:
+            try:
+                response = self.session.post(f"{self.base_url}/api/generate", json=dict(payload, stream=True),
+                                             timeout=timeout, stream=True)
+            except requests.exceptions.ConnectionError:
+                # Ollama went away - the next availability check must hit the server
+                self.invalidate()
+                raise
+            with response:
+                if response.status_code != 200:
+                    raise requests.HTTPError(f"Ollama returned {response.status_code}", response=response)
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+    
+    def _run_job(self, fn: Callable, args: Tuple, kwargs: Dict) -> Any:
+        self._worker.active = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._worker.active = False
+    
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """הוספת עבודה לתור: num_parallel עבודות רצות במקביל, השאר ממתינות לפי סדר ההגעה"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.num_parallel, thread_name_prefix='ollama')
+            return self._executor.submit(self._run_job, fn, args, kwargs)
+    
+    def map(self, fn: Callable, arg_lists: Iterable[Tuple]) -> List[Any]:
+        """הרצת fn(*args) לכל פריט דרך התור - תוצאות לפי סדר הקלט"""
+        if getattr(self._worker, 'active', False):
+            # Already running on a queue worker - waiting on the same queue could deadlock
+            return [fn(*args) for args in arg_lists]
+        futures = [self.submit(fn, *args) for args in arg_lists]
+        return [future.result() for future in futures]
+
+
+_clients: Dict[str, OllamaClient] = {}
+_clients_lock = threading.Lock()
+
+def get_ollama_client(base_url: str = OLLAMA_BASE_URL) -> OllamaClient:
+    """הלקוח המשותף ל-base_url (נוצר בפעם הראשונה)"""
+    key = base_url.rstrip('/')
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = OllamaClient(key)
+        return _clients[key]
+
+
+def _is_empty(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip().lower() in _EMPTY_VALUES
+    if isinstance(value, dict):
+        return all(_is_empty(v) for v in value.values())
+    if isinstance(value, list):
+        return all(_is_empty(v) for v in value)
+    return False
+
+
+def _value_key(value) -> str:
+    """מפתח להשוואת ערכים (רווחים ואותיות גדולות/קטנות מנורמלים)"""
+    if isinstance(value, str):
+        return ' '.join(value.split()).lower()
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def merge_summaries(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    איחוד דטרמיניסטי של סיכומי חלקים, לפי סדר החלקים בדף:
+    - rates/amounts/periods: כל הערכים השונים של כל שדה, מחוברים ב-" | "
+    - שאר האובייקטים והערכים הבודדים: הערך הראשון שאינו ריק
+    - רשימות: איחוד ללא כפילויות לפי סדר ההופעה
+    """
+    merged: Dict[str, Any] = {}
+    multi: Dict[str, Dict[str, List[str]]] = {}
+    seen: Dict[Tuple[str, ...], set] = {}
+    
+    def add_unique(path, target: List, item) -> None:
+        keys = seen.setdefault(path, set())
+        key = _value_key(item)
+        if key not in keys:
+            keys.add(key)
+            target.append(item)
+    
+    for part in parts:
+        for section, value in part.items():
+            if _is_empty(value):
+                continue
+            if isinstance(value, dict):
+                if not isinstance(merged.setdefault(section, {}), dict):
+                    continue
+                for key, item in value.items():
+                    if _is_empty(item):
+                        continue
+                    if section in MULTI_VALUE_SECTIONS:
+                        add_unique((section, key), multi.setdefault(section, {}).setdefault(key, []),
+                                   item if isinstance(item, str) else json.dumps(item, ensure_ascii=False))
+                    else:
+                        merged[section].setdefault(key, item)
+            elif isinstance(value, list):
+                if not isinstance(merged.setdefault(section, []), list):
+                    continue
+                for item in value:
+                    if not _is_empty(item):
+                        add_unique((section,), merged[section], item)
+            else:
+                merged.setdefault(section, value)
+    
+    for section, fields in multi.items():
+        merged[section].update({key: ' | '.join(values) for key, values in fields.items()})
+    return merged
+
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?;])\s+')
+
+
+def split_segments(text: str) -> List[str]:
+    """פיצול טקסט לשורות ולמשפטים (רווחים מנורמלים, שורות ריקות מושמטות) - יחידת ההשוואה של diff_hunks"""
+    segments = []
+    for line in text.splitlines():
+        line = ' '.join(line.split())
+        if line:
+            segments.extend(part for part in _SENTENCE_BREAK.split(line) if part)
+    return segments
+
+
+def diff_hunks(old_content: str, new_content: str, context: int = DIFF_CONTEXT_SEGMENTS) -> List[Dict[str, List[str]]]:
+    """
+    השינויים בין שתי גרסאות ברמת שורה/משפט (difflib), כל אחד עם context מקטעים לפניו ואחריו
+    [{'context_before': [...], 'removed': [...], 'added': [...], 'context_after': [...]}, ...]
+    """
+    old_segments, new_segments = split_segments(old_content), split_segments(new_content)
+    matcher = difflib.SequenceMatcher(None, old_segments, new_segments, autojunk=False)
+    hunks = []
+    for group in matcher.get_grouped_opcodes(context):
+        hunk = {'context_before': [], 'removed': [], 'added': [], 'context_after': []}
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                key = 'context_after' if hunk['removed'] or hunk['added'] else 'context_before'
+                hunk[key].extend(old_segments[i1:i2])
+            else:
+                hunk['removed'].extend(old_segments[i1:i2])
+                hunk['added'].extend(new_segments[j1:j2])
+        hunks.append(hunk)
+    return hunks
+
+
+def format_hunks(hunks: List[Dict[str, List[str]]], max_chars: int = COMPARE_MAX_DIFF_CHARS) -> Tuple[str, int]:
+    """diff בפורמט unified (שורות '-' / '+' / רווח להקשר) - מחזיר (טקסט, מספר השינויים שנכללו)"""
+    blocks, total = [], 0
+    for index, hunk in enumerate(hunks, 1):
+        lines = [f"@@ שינוי {index}"]
+        lines += [f"  {seg}" for seg in hunk['context_before']]
+        lines += [f"- {seg}" for seg in hunk['removed']]
+        lines += [f"+ {seg}" for seg in hunk['added']]
+        lines += [f"  {seg}" for seg in hunk['context_after']]
+        block = '\n'.join(lines)
+        if blocks and total + len(block) > max_chars:
+            break
+        blocks.append(block[:max_chars])
+        total += len(block)
+    return '\n\n'.join(blocks), len(blocks)
+
+
+def get_available_models(base_url: str = OLLAMA_BASE_URL) -> List[Dict[str, Any]]:
     """
     מחזיר רשימת מודלים זמינים ב-Ollama
     בודק אילו מהמודלים הנתמכים מותקנים בפועל
@@ -51,11 +387,8 @@ def get_available_models(base_url: str = "http://localhost:11434") -> List[Dict[
     available = []
     
     try:
-        response = requests.get(f"{base_url}/api/tags", timeout=5)
-        if response.status_code == 200:
-            installed_models = response.json().get('models', [])
-            installed_names = [m.get('name', '') for m in installed_models]
-            
+        installed_names = get_ollama_client(base_url).list_models()
+        if installed_names is not None:
             # Check each supported model
             for model_id, model_info in SUPPORTED_MODELS.items():
                 model_base = model_id.split(':')[0]
@@ -70,8 +403,7 @@ def get_available_models(base_url: str = "http://localhost:11434") -> List[Dict[
                 })
             
             # Also add any other installed models not in our list
-            for installed in installed_models:
-                name = installed.get('name', '')
+            for name in installed_names:
                 if name and not any(name.startswith(m.split(':')[0]) for m in SUPPORTED_MODELS.keys()):
                     available.append({
                         'id': name,
@@ -94,32 +426,36 @@ class OllamaSummarizer:
     מותאם לתוכן פיננסי בעברית
     """
     
-    def __init__(self, model: str = DEFAULT_MODEL, base_url: str = "http://localhost:11434"):
+    def __init__(self, model: str = DEFAULT_MODEL, base_url: str = OLLAMA_BASE_URL, use_cache: bool = True):
         self.model = model
         self.base_url = base_url.rstrip('/')
         self.timeout = 120  # 2 minutes timeout for AI responses
+        self.client = get_ollama_client(self.base_url)
+        # Identical requests (same model + prompt + options) are answered from the shared result cache
+        self.cache: Optional[LLMResultCache] = get_llm_cache() if use_cache else None
+        self._local = threading.local()
     
-    def is_available(self) -> bool:
-        """בדיקה אם Ollama זמין"""
-        try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            if response.status_code == 200:
-                models = response.json().get('models', [])
-                model_names = [m.get('name', '') for m in models]
-                # Check if our model is available
-                return any(self.model.split(':')[0] in name for name in model_names)
-            return False
-        except Exception as e:
-            print(f"[AI] Ollama not available: {e}")
-            return False
+    @property
+    def last_metrics(self) -> Optional[Dict[str, Any]]:
+        """מדדי הבקשה האחרונה של ה-thread הנוכחי (ttft_ms, tokens_per_sec, ...)"""
+        return getattr(self._local, 'metrics', None)
     
-    def _generate(self, prompt: str, json_mode: bool = True) -> Optional[str]:
-        """שליחת prompt ל-Ollama וקבלת תשובה"""
+    def is_available(self, refresh: bool = False) -> bool:
+        """בדיקה אם Ollama זמין והמודל מותקן (תוצאה שמורה ל-AVAILABILITY_TTL שניות)"""
+        return self.client.has_model(self.model, refresh=refresh)
+    
+    def _generate(self, prompt: str, json_mode: bool = True,
+                  on_token: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """
+        שליחת prompt ל-Ollama וקבלת תשובה (בזרימה)
+        במצב JSON הייצור נעצר ברגע שהאובייקט העליון נסגר - בלי לחכות לטוקנים מיותרים עד num_predict
+        on_token: נקרא עם כל חלק טקסט שמגיע (להצגה חיה)
+        """
+        self._local.metrics = None
         try:
             payload = {
                 "model": self.model,
                 "prompt": prompt,
-                "stream": False,
                 "options": {
                     "temperature": 0.3,  # Lower temperature for more consistent outputs
                     "num_predict": 2048
@@ -129,19 +465,62 @@ class OllamaSummarizer:
             if json_mode:
                 payload["format"] = "json"
             
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=self.timeout
-            )
+            cache_key = LLMResultCache.make_key(payload, PROMPT_VERSION) if self.cache else None
+            if cache_key:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    self._local.metrics = {"ttft_ms": 0, "total_ms": 0, "tokens": 0, "tokens_per_sec": 0.0,
+                                           "prompt_tokens": None, "stopped_early": False, "cached": True}
+                    if on_token:
+                        on_token(cached)
+                    return cached
             
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('response', '')
-            else:
-                print(f"[AI] Error from Ollama: {response.status_code}")
-                return None
-                
+            started = time.time()
+            first_token_at = last_token_at = None
+            parts, tokens, final = [], 0, None
+            scanner = JsonObjectScanner() if json_mode else None
+            stopped_early = False
+            
+            stream = self.client.generate_stream(payload, timeout=self.timeout)
+            try:
+                for chunk in stream:
+                    text = chunk.get('response', '')
+                    if text:
+                        last_token_at = time.time()
+                        if first_token_at is None:
+                            first_token_at = last_token_at
+                        tokens += 1
+                        if scanner is not None:
+                            end = scanner.feed(text)
+                            if end is not None:
+                                # Complete top-level object - drop the tail and stop generation
+                                text = text[:end - scanner.length]
+                                stopped_early = not chunk.get('done')
+                        parts.append(text)
+                        if on_token:
+                            on_token(text)
+                    if chunk.get('done'):
+                        final = chunk
+                        break
+                    if scanner is not None and scanner.end is not None:
+                        break
+            finally:
+                stream.close()
+            
+            self._local.metrics = self._metrics(started, first_token_at, last_token_at, tokens, final, stopped_early)
+            m = self._local.metrics
+            print(f"[AI] {self.model}: first token {m['ttft_ms']}ms, {m['tokens']} tokens @ {m['tokens_per_sec']} tok/s"
+                  + (" (stopped at end of JSON)" if stopped_early else ""))
+            
+            response = ''.join(parts)
+            # Cache only usable answers - a truncated/garbled one should be retried next time
+            if cache_key and response.strip() and (not json_mode or self._parse_json_response(response) is not None):
+                self.cache.put(cache_key, response, model=self.model)
+            return response
+        
+        except requests.HTTPError as e:
+            print(f"[AI] Error from Ollama: {e}")
+            return None
         except requests.exceptions.Timeout:
             print("[AI] Request timed out")
             return None
@@ -149,6 +528,27 @@ class OllamaSummarizer:
             print(f"[AI] Error generating response: {e}")
             return None
     
+    @staticmethod
+    def _metrics(started: float, first_token_at: Optional[float], last_token_at: Optional[float],
+                 tokens: int, final: Optional[Dict], stopped_early: bool) -> Dict[str, Any]:
+        """זמן עד טוקן ראשון וקצב ייצור - לפי מדדי Ollama כשהזרימה הסתיימה, אחרת לפי זמני ההגעה"""
+        if final and final.get('eval_count') and final.get('eval_duration'):
+            tokens = final['eval_count']
+            tokens_per_sec = tokens / (final['eval_duration'] / 1e9)
+        elif tokens > 1 and last_token_at > first_token_at:
+            tokens_per_sec = (tokens - 1) / (last_token_at - first_token_at)
+        else:
+            tokens_per_sec = 0.0
+        return {
+            "ttft_ms": round((first_token_at - started) * 1000) if first_token_at else None,
+            "total_ms": round((time.time() - started) * 1000),
+            "tokens": tokens,
+            "tokens_per_sec": round(tokens_per_sec, 1),
+            "prompt_tokens": (final or {}).get('prompt_eval_count'),
+            "stopped_early": stopped_early,
+            "cached": False
+        }
+    
     def _parse_json_response(self, response: str) -> Optional[Dict]:
         """פענוח תשובת JSON מה-AI"""
         if not response:
@@ -170,10 +570,14 @@ class OllamaSummarizer:
         
         return None
     
-    def summarize(self, content: str, url: str = "") -> Dict[str, Any]:
+    def summarize(self, content: str, url: str = "",
+                  on_token: Optional[Callable[[str], None]] = None,
+                  map_reduce: Optional[bool] = None) -> Dict[str, Any]:
         """
         יצירת סיכום מובנה של תוכן פיננסי
         מחלץ את כל הפרטים החשובים לשימוש ביצירת תוכן
+        on_token: נקרא עם כל חלק מהתשובה בזמן שהיא נוצרת (בקריאה בודדת בלבד)
+        map_reduce: None = אוטומטי - תוכן ארוך מ-SUMMARY_SINGLE_SHOT_CHARS מסוכם בחלקים (ראו summarize_map_reduce)
         
         Returns:
             {
@@ -195,15 +599,21 @@ class OllamaSummarizer:
                     "key_points": [...]
                 },
                 "model": str,
-                "timestamp": str
+                "timestamp": str,
+                "metrics": {"ttft_ms", "total_ms", "tokens", "tokens_per_sec", ...}
             }
         """
         if not content:
             return {"success": False, "error": "No content provided"}
         
+        if map_reduce is None:
+            map_reduce = len(content) > SUMMARY_SINGLE_SHOT_CHARS
+        if map_reduce:
+            return self.summarize_map_reduce(content, url)
+        
         # Truncate content if too long (keep first 12000 chars for more context)
         # Also try to keep complete sentences
-        max_chars = 12000
+        max_chars = SUMMARY_SINGLE_SHOT_CHARS
         if len(content) > max_chars:
             # Try to cut at a sentence boundary
             truncated = content[:max_chars]
@@ -213,13 +623,86 @@ class OllamaSummarizer:
         else:
             truncated = content
         
-        prompt = f"""אתה מנתח תוכן פיננסי מקצועי. חלץ את כל המידע הרלוונטי מהטקסט הבא.
+        prompt = self._summary_prompt(truncated)
+        
+        response = self._generate(prompt, json_mode=True, on_token=on_token)
+        parsed = self._parse_json_response(response)
+        
+        if parsed:
+            return {
+                "success": True,
+                "summary": parsed,
+                "model": self.model,
+                "timestamp": datetime.now().isoformat(),
+                "content_hash": hashlib.sha256(content.encode()).hexdigest()[:16],
+                "metrics": self.last_metrics
+            }
+        else:
+            return {
+                "success": False,
+                "error": "Failed to parse AI response",
+                "raw_response": response[:500] if response else None
+            }
+    
+    def summarize_map_reduce(self, content: str, url: str = "") -> Dict[str, Any]:
+        """
+        סיכום תוכן ארוך: פיצול ל-chunks (rag_service.ChunkingService), סיכום כל chunk במקביל
+        דרך תור הבקשות, ואיחוד דטרמיניסטי (merge_summaries) - בלי לחתוך טבלאות בהמשך הדף
+        """
+        from rag_service import ChunkingService
+        
+        started = time.time()
+        source_id = hashlib.sha256(content.encode()).hexdigest()[:16]
+        chunks = ChunkingService(chunk_size=SUMMARY_CHUNK_WORDS, overlap=SUMMARY_CHUNK_OVERLAP).chunk_text(content, source_id)
+        
+        def summarize_chunk(text):
+            parsed = self._parse_json_response(self._generate(self._summary_prompt(text, partial=True), json_mode=True))
+            return parsed, self.last_metrics
+        
+        outputs = self._run_batch(summarize_chunk, [(chunk['text'],) for chunk in chunks])
+        parts = [out[0] for out in outputs if isinstance(out, tuple) and isinstance(out[0], dict)]
+        chunk_metrics = [out[1] for out in outputs if isinstance(out, tuple) and out[1]]
+        print(f"[AI] Map-reduce summary: {len(parts)}/{len(chunks)} chunks parsed in {time.time() - started:.1f}s")
+        
+        if not parts:
+            return {"success": False, "error": "Failed to parse AI response for any chunk"}
+        
+        wall_seconds = time.time() - started
+        tokens = sum(m.get('tokens') or 0 for m in chunk_metrics)
+        ttfts = [m['ttft_ms'] for m in chunk_metrics if m.get('ttft_ms') is not None]
+        return {
+            "success": True,
+            "summary": merge_summaries(parts),
+            "model": self.model,
+            "timestamp": datetime.now().isoformat(),
+            "content_hash": source_id,
+            "chunks": len(chunks),
+            "failed_chunks": len(chunks) - len(parts),
+            "metrics": {
+                "ttft_ms": min(ttfts) if ttfts else None,
+                "total_ms": round(wall_seconds * 1000),
+                "tokens": tokens,
+                "tokens_per_sec": round(tokens / wall_seconds, 1) if wall_seconds else 0.0,
+                "stopped_early": any(m.get('stopped_early') for m in chunk_metrics)
+            }
+        }
+    
+    def _summary_prompt(self, text: str, partial: bool = False) -> str:
+        """prompt הסיכום המובנה - partial: קטע מתוך דף ארוך (שדות חסרים מושמטים במקום "לא צוין")"""
+        if partial:
+            intro = 'זהו קטע אחד מתוך דף ארוך. חלץ רק מידע שמופיע בקטע הזה והשמט שדות שלא מופיעים בו:'
+            missing_rule = '2. השמט שדות ורשימות שאין עליהם מידע בקטע (אל תכתוב "לא צוין")'
+        else:
+            intro = 'חלץ את כל המידע הבא וכתוב "לא צוין" אם המידע לא מופיע:'
+            missing_rule = '2. אם מידע לא מופיע, כתוב "לא צוין"'
+        
+        return f"""אתה מנתח תוכן פיננסי מקצועי. חלץ את כל המידע הרלוונטי מהטקסט הבא.
 המטרה: ליצור מאגר מידע מדויק שישמש ליצירת תוכן שיווקי.
 
 הטקסט:
-{truncated}
+{text}
 
-חלץ את כל המידע הבא וכתוב "לא צוין" אם המידע לא מופיע:
+{intro}
 
 החזר JSON במבנה הבא בלבד:
 {{
@@ -311,36 +794,19 @@ class OllamaSummarizer:
 
 כללים חשובים:
 1. חלץ רק מידע שמופיע בטקסט - אל תמציא נתונים
-2. אם מידע לא מופיע, כתוב "לא צוין"
+{missing_rule}
 3. שמור על דיוק מספרי - העתק מספרים בדיוק כפי שמופיעים
 4. כלול הקשר למספרים (לדוגמה: "עד 500,000 ש"ח לעסק קטן")
 5. חפש במיוחד אחר: אחוזי מימון (LTV), הון עצמי, ריביות, עמלות, תקופות
 6. אם יש טבלאות או רשימות עם נתונים - חלץ את כל המידע מהן
 
 החזר רק את ה-JSON, ללא טקסט נוסף."""
-
-        response = self._generate(prompt, json_mode=True)
-        parsed = self._parse_json_response(response)
-        
-        if parsed:
-            return {
-                "success": True,
-                "summary": parsed,
-                "model": self.model,
-                "timestamp": datetime.now().isoformat(),
-                "content_hash": hashlib.sha256(content.encode()).hexdigest()[:16]
-            }
-        else:
-            return {
-                "success": False,
-                "error": "Failed to parse AI response",
-                "raw_response": response[:500] if response else None
-            }
     
     def compare_versions(self, old_content: str, new_content: str, 
                          old_summary: Optional[Dict] = None) -> Dict[str, Any]:
         """
         השוואת שתי גרסאות של תוכן וזיהוי שינויים
+        ל-AI נשלחים רק המקטעים שהשתנו (diff_hunks) עם מעט הקשר, מכל מקום בדף
         
         Returns:
             {
@@ -367,17 +833,33 @@ class OllamaSummarizer:
                 "summary": "אין שינויים"
             }
         
-        # Truncate contents for comparison
-        old_truncated = old_content[:3000] if len(old_content) > 3000 else old_content
-        new_truncated = new_content[:3000] if len(new_content) > 3000 else new_content
+        # Send only the changed lines/sentences (with a little context), wherever they are in the page
+        hunks = diff_hunks(old_content, new_content)
+        if not hunks:
+            return {
+                "success": True,
+                "has_changes": False,
+                "changes": [],
+                "importance": "none",
+                "summary": "אין שינויים (שינויי רווחים/עיצוב בלבד)"
+            }
+        
+        diff_text, included = format_hunks(hunks)
+        omitted_note = f"\n\n(הוצגו {included} מתוך {len(hunks)} שינויים)" if included < len(hunks) else ""
+        diff_stats = {
+            "hunks": len(hunks),
+            "hunks_sent": included,
+            "removed_segments": sum(len(h['removed']) for h in hunks),
+            "added_segments": sum(len(h['added']) for h in hunks),
+            "diff_chars": len(diff_text)
+        }
         
-        prompt = f"""השווה בין שני הטקסטים הבאים מאותו מקור מידע פיננסי וזהה שינויים.
+        prompt = f"""להלן השינויים שזוהו בין שתי גרסאות של אותו מקור מידע פיננסי.
+שורות שמתחילות ב-"-" הוסרו, שורות שמתחילות ב-"+" נוספו, ושורות שמתחילות ברווח הן הקשר שלא השתנה.
 
-טקסט קודם:
-{old_truncated}
+{diff_text}{omitted_note}
 
-טקסט חדש:
-{new_truncated}
+נתח את השינויים.
 
 החזר JSON במבנה הבא:
 {{
@@ -412,16 +894,25 @@ class OllamaSummarizer:
                 "importance": parsed.get("overall_importance", "medium"),
                 "summary": parsed.get("summary", "זוהו שינויים"),
                 "model": self.model,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now().isoformat(),
+                "diff_stats": diff_stats,
+                "metrics": self.last_metrics
             }
         else:
-            # Fallback - we know there are changes based on hash
+            # Fallback - report the raw diff hunks
             return {
                 "success": True,
                 "has_changes": True,
-                "changes": [{"type": "content_updated", "description": "התוכן השתנה", "importance": "medium"}],
+                "changes": [{
+                    "type": "content_updated",
+                    "description": "התוכן השתנה",
+                    "previous_value": ' '.join(hunk['removed'])[:300],
+                    "new_value": ' '.join(hunk['added'])[:300],
+                    "importance": "medium"
+                } for hunk in hunks[:20]],
                 "importance": "medium",
-                "summary": "התוכן השתנה (ניתוח AI לא זמין)",
+                "summary": f"התוכן השתנה ב-{len(hunks)} מקומות (ניתוח AI לא זמין)",
+                "diff_stats": diff_stats,
                 "fallback": True
             }
     
@@ -493,56 +984,112 @@ class OllamaSummarizer:
                 "suggestions": []
             }
     
-    def extract_financial_data(self, content: str) -> Dict[str, Any]:
+    def extract_financial_data(self, content: str, use_llm: bool = True,
+                               min_confidence: float = RULE_CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
         """
-        חילוץ נתונים פיננסיים ספציפיים מתוכן
-        משלים את ContentSummarizer עם ניתוח AI
+        חילוץ נתונים פיננסיים ספציפיים מתוכן - בשכבות:
+        1. כללים (financial_rules) - ריביות, פריים+X, סכומים, תקופות, עמלות, תאריך עדכון
+        2. LLM - רק אם שדה ליבה (ריבית/סכום/תקופה) נשאר מתחת ל-min_confidence
+           למרות שיש בדף ערכים מסוגו; המודל נשאל רק על השדות הפתוחים
+        
+        Returns:
+            {
+                "success": bool,
+                "data": {"interest_rates": [...], "amounts": [...], "periods": [...], "fees": [...],
+                         "conditions": [...], "last_updated": str},
+                "confidence": {field: 0..1},
+                "sources": {field: "rules" | "llm" | "rules+llm" | "none"},
+                "llm_used": bool,
+                "unresolved": [fields still below min_confidence]
+            }
         """
         if not content:
             return {"success": False, "error": "No content"}
         
-        truncated = content[:5000] if len(content) > 5000 else content
+        rules = extract_financial_rules(content)
+        data = dict(rules['data'], conditions=[])
+        confidence = dict(rules['confidence'], conditions=0.0)
+        sources = {field: 'rules' if confidence[field] else 'none' for field in data}
+        
+        llm_used, llm_error = False, None
+        unresolved = [field for field in FINANCIAL_CORE_FIELDS
+                      if confidence[field] < min_confidence and rules['candidates'][field]]
+        if unresolved and use_llm:
+            # The open core fields, plus optional fields the rules left empty (the call is paid for anyway)
+            fields = unresolved + [field for field in FINANCIAL_OPTIONAL_FIELDS if confidence[field] < min_confidence]
+            parsed = self._parse_json_response(self._generate(self._financial_prompt(content, fields), json_mode=True))
+            if parsed is None:
+                llm_error = "Failed to extract data"
+            else:
+                llm_used = True
+                for field in fields:
+                    value = parsed.get(field)
+                    if _is_empty(value):
+                        continue
+                    if isinstance(value, list):
+                        kept = [item for item in data[field] if item.get('confidence', 0) >= min_confidence]
+                        added = [dict(item, confidence=LLM_FIELD_CONFIDENCE) if isinstance(item, dict) else item
+                                 for item in value if not _is_empty(item)]
+                        data[field] = kept + added
+                        sources[field] = 'rules+llm' if kept else 'llm'
+                        confidence[field] = max((item['confidence'] for item in kept), default=LLM_FIELD_CONFIDENCE)
+                    else:
+                        data[field] = value
+                        sources[field] = 'llm'
+                        confidence[field] = LLM_FIELD_CONFIDENCE
         
-        prompt = f"""חלץ את כל הנתונים הפיננסיים מהטקסט הבא.
+        result = {
+            "success": True,
+            "data": data,
+            "confidence": confidence,
+            "sources": sources,
+            "llm_used": llm_used,
+            "unresolved": [field for field in unresolved if sources[field] in ('rules', 'none')],
+            "model": self.model if llm_used else None,
+            "timestamp": datetime.now().isoformat()
+        }
+        if llm_error:
+            result["llm_error"] = llm_error
+        return result
+    
+    def _financial_prompt(self, content: str, fields: List[str]) -> str:
+        """prompt חילוץ לשדות המבוקשים בלבד"""
+        truncated = content[:5000] if len(content) > 5000 else content
+        schema = ',\n'.join(f'    "{field}": {FINANCIAL_FIELD_SCHEMAS[field]}' for field in fields)
+        return f"""חלץ את הנתונים הפיננסיים הבאים מהטקסט.
 
 הטקסט:
 {truncated}
 
 החזר JSON במבנה הבא:
 {{
-    "interest_rates": [
-        {{"value": "X%", "type": "שם סוג הריבית", "context": "הקשר קצר"}}
-    ],
-    "amounts": [
-        {{"value": "XXX ש\"ח", "type": "מינימום/מקסימום/דוגמה", "context": "הקשר"}}
-    ],
-    "periods": [
-        {{"value": "X חודשים/שנים", "type": "מינימום/מקסימום", "context": "הקשר"}}
-    ],
-    "fees": [
-        {{"value": "XXX", "description": "תיאור העמלה"}}
-    ],
-    "conditions": [
-        "תנאי 1",
-        "תנאי 2"
-    ],
-    "last_updated": "תאריך עדכון אם מוזכר"
+{schema}
 }}
 
-החזר רק את ה-JSON."""
-
-        response = self._generate(prompt, json_mode=True)
-        parsed = self._parse_json_response(response)
-        
-        if parsed:
-            return {
-                "success": True,
-                "data": parsed,
-                "model": self.model,
-                "timestamp": datetime.now().isoformat()
-            }
-        else:
-            return {"success": False, "error": "Failed to extract data"}
+אם נתון לא מופיע בטקסט, החזר רשימה ריקה. החזר רק את ה-JSON."""
+    
+    # ============ Batch (through the shared request queue) ============
+    
+    def _run_batch(self, method: Callable, arg_lists: List[Tuple]) -> List[Dict[str, Any]]:
+        """הרצת method על כל פריט דרך תור הלקוח - שגיאה בפריט אחד לא עוצרת את השאר"""
+        def run(*args):
+            try:
+                return method(*args)
+            except Exception as e:
+                print(f"[AI] Batch job failed: {e}")
+                return {"success": False, "error": str(e)}
+        return self.client.map(run, arg_lists)
+    
+    def summarize_many(self, items: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        סיכום מספר מקורות במקביל (עד num_parallel בקשות ל-Ollama בו זמנית)
+        items: [{'content': ..., 'url': ...}, ...] - תוצאות לפי סדר הקלט
+        """
+        return self._run_batch(self.summarize, [(item.get('content', ''), item.get('url', '')) for item in items])
+    
+    def compare_many(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """השוואת מספר זוגות (old_content, new_content) במקביל - תוצאות לפי סדר הקלט"""
+        return self._run_batch(self.compare_versions, [(old, new) for old, new in pairs])
 
 
 # Cache for summarizer instances by model
@@ -581,12 +1128,79 @@ def check_ollama_status(model: str = None) -> Dict[str, Any]:
         "base_url": summarizer.base_url,
         "available_models": models,
         "installed_count": len(installed_models),
+        "num_parallel": summarizer.client.num_parallel,
+        "llm_cache": get_llm_cache().stats(),
         "message": f"Ollama ready with {summarizer.model}" if available else "Ollama not available. Run: ollama serve"
     }
 
 
+_BENCH_FACT_PATTERN = re.compile(r'\d+(?:\.\d+)?%|\d{1,3}(?:,\d{3})+')
+
+
+def _benchmark_page(filler_paragraphs: int = 40) -> str:
+    """דף בנק סינתטי ארוך: תנאים בראש הדף וטבלת ריביות בסופו (אחרי 12,000 התווים הראשונים)"""
+    rng = random.Random(7)
+    filler = ('הבנק מציע מגוון פתרונות מימון ללקוחות פרטיים ועסקיים בהתאם לצרכים האישיים '
+              'ולמדיניות האשראי של הבנק ובכפוף לאישור הבנק ולתנאים המפורטים בהסכם ההלוואה').split()
+    paragraphs = ['הלוואה לכל מטרה מבנק לדוגמה. ריבית החל מ-5.9% לשנה, סכום הלוואה עד 500,000 ש"ח לתקופה של עד 84 חודשים.']
+    for _ in range(filler_paragraphs):
+        paragraphs.append(' '.join(rng.choice(filler) for _ in range(60)) + '.')
+    paragraphs.append('טבלת ריביות לפי תקופה:')
+    for months, rate, amount in ((12, '4.2%', '50,000'), (36, '6.4%', '150,000'), (60, '7.1%', '250,000'), (120, '8.3%', '1,200,000')):
+        paragraphs.append(f'הלוואה ל-{months} חודשים: ריבית {rate}, סכום מקסימלי {amount} ש"ח.')
+    paragraphs.append('עמלת פתיחת תיק 0.25% מסכום ההלוואה, מינימום 1,000 ש"ח.')
+    return '\n'.join(paragraphs)
+
+
+def benchmark_summarize(content: Optional[str] = None, model: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Latency and fact recall of map-reduce vs the single-shot (truncated) prompt on a long page.
+    Recall = share of the page's percentages and amounts that appear in the summary. Needs a running Ollama.
+    """
+    # Uncached, so both paths really call the model on every run
+    summarizer = OllamaSummarizer(model=model or DEFAULT_MODEL, use_cache=False)
+    if not summarizer.is_available(refresh=True):
+        print(f"[AI] Ollama / {summarizer.model} not available - start Ollama to run the benchmark")
+        return []
+    
+    content = content or _benchmark_page()
+    facts = set(_BENCH_FACT_PATTERN.findall(content))
+    print(f"[AI] Page: {len(content)} chars, {len(facts)} facts, model {summarizer.model}, num_parallel {summarizer.client.num_parallel}")
+    
+    results = []
+    for label, map_reduce in (('single-shot', False), ('map-reduce', True)):
+        started = time.time()
+        result = summarizer.summarize(content, map_reduce=map_reduce)
+        seconds = time.time() - started
+        found = set(_BENCH_FACT_PATTERN.findall(json.dumps(result.get('summary') or {}, ensure_ascii=False))) & facts
+        row = {
+            'mode': label,
+            'success': result.get('success', False),
+            'seconds': round(seconds, 2),
+            'chunks': result.get('chunks', 1),
+            'fact_recall': round(len(found) / len(facts), 2) if facts else None,
+            'missing': sorted(facts - found)
+        }
+        results.append(row)
+        print(f"  {label:<12} {row['seconds']:>7}s  chunks={row['chunks']}  recall={row['fact_recall']}  missing={row['missing']}")
+    return results
+
+
 # Quick test
 if __name__ == "__main__":
+    if '--benchmark' in sys.argv:
+        # python ai_summarizer.py --benchmark [--file page.txt] [--model qwen2.5:7b]
+        args = sys.argv[1:]
+        file_path = args[args.index('--file') + 1] if '--file' in args else None
+        bench_model = args[args.index('--model') + 1] if '--model' in args else None
+        page = None
+        if file_path:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                page = f.read()
+        print("Benchmarking summarization (map-reduce vs single-shot)...")
+        benchmark_summarize(page, bench_model)
+        sys.exit(0)
+    
     print("Testing AI Summarizer...")
     status = check_ollama_status()
     print(f"Status: {json.dumps(status, ensure_ascii=False, indent=2)}")
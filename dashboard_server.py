@@ -17,7 +17,6 @@ import threading
 import uuid
 from datetime import datetime
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 def get_python_command():
     """Get the correct Python command for this system"""
@@ -120,8 +119,8 @@ class DataSourceScraper:
         """Scrape a single URL - try local Chrome first, fallback to Apify"""
         
         # Check if we have cached data (unless force_refresh)
+        cached = self.storage.get_cached_source(url)
         if not force_refresh:
-            cached = self.storage.get_cached_source(url)
             if cached:
                 print(f"[DataScraper] Using cached source for {url}")
                 return {
@@ -133,23 +132,169 @@ class DataSourceScraper:
                     'scraped_at': cached['scraped_at']
                 }
         
+        # Step 0: Plain HTTP GET with stored validators - skips the browser for unchanged/static pages
+        http_result = {}
+        if config.get('scraping', {}).get('http_tier', True):
+            http_result = self._scrape_with_http(url, page_path, cached)
+            if http_result.get('success'):
+                return http_result
+        
         # Step 1: Try local Chrome scraper first (faster, free)
-        local_result = self._scrape_with_local_chrome(url, page_path)
-        if local_result.get('success'):
-            return local_result
+        result = self._scrape_with_local_chrome(url, page_path)
         
         # Step 2: If local failed, fallback to Apify
-        print(f"[DataScraper] Local scrape failed, falling back to Apify...")
-        return self._scrape_with_apify(url, page_path)
+        if not result.get('success'):
+            print(f"[DataScraper] Local scrape failed, falling back to Apify...")
+            result = self._scrape_with_apify(url, page_path)
+        
+        if result.get('success'):
+            # Static hash of the page the browser just extracted - next time an equal hash skips the browser
+            if http_result.get('validators'):
+                self.storage.save_http_validators(url, http_result['validators'])
+            # Stored text came from the HTTP tier - the switch to browser extraction is not a content change
+            if self._extraction_family(cached) == 'http':
+                result['extraction_changed'] = True
+        return result
+    
+    @staticmethod
+    def _extraction_family(cached):
+        """'http' (trafilatura) / 'browser' (Chrome, Apify) for a stored source, None if not stored"""
+        if not cached:
+            return None
+        method = (cached.get('scraper_metadata') or {}).get('method')
+        return 'http' if method == 'http' else 'browser'
+    
+    def _is_js_only_page(self, html, extracted):
+        """Detect pages that need a browser: empty app shells, 'enable JavaScript' notices, too little text"""
+        if not extracted or len(extracted.strip()) < 200:
+            return True
+        
+        lowered = html.lower()
+        app_shell_markers = ['<div id="root"></div>', '<div id="app"></div>', '<div id="__nuxt"></div>', '<app-root></app-root>']
+        if any(marker in lowered for marker in app_shell_markers):
+            return True
+        
+        if re.search(r'<noscript[^>]*>[^<]*(enable|הפעל)[^<]*javascript', lowered):
+            # Only a JS-only page if the static text is small relative to the markup
+            return len(extracted) < len(html) * 0.02
+        
+        return False
+    
+    def _scrape_with_http(self, url, page_path=None, cached=None):
+        """
+        Lightweight first tier: conditional GET with stored ETag/Last-Modified.
+        304 or an unchanged extracted hash returns the stored content without launching a browser;
+        otherwise the page is extracted statically with trafilatura.
+        
+        Content is only compared like-for-like: a source stored from a browser keeps browser text.
+        For it this tier only detects "unchanged" - a new or missing static hash falls through to the
+        browser, with the validators returned to save once the browser succeeds.
+        """
+        if not REQUESTS_AVAILABLE:
+            return {'success': False, 'error': 'requests not installed', 'method': 'http'}
+        try:
+            import trafilatura
+        except ImportError:
+            return {'success': False, 'error': 'trafilatura not installed', 'method': 'http'}
+        
+        validators = self.storage.get_http_validators(url) if cached else {}
+        
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept-Language': 'he-IL,he;q=0.9,en;q=0.8'
+        }
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        try:
+            response = requests.get(url, headers=headers, timeout=15)
+        except Exception as e:
+            print(f"[DataScraper] HTTP tier failed for {url}: {e}")
+            return {'success': False, 'error': str(e), 'method': 'http'}
+        
+        def unchanged_result(method):
+            self.storage.touch_source(url)
+            return {
+                'success': True,
+                'content': cached['content'],
+                'title': cached.get('title', ''),
+                'url': url,
+                'method': method,
+                'unchanged': True,
+                'scraped_at': cached.get('scraped_at'),
+                'timestamp': datetime.now().isoformat()
+            }
+        
+        if response.status_code == 304 and cached:
+            print(f"[DataScraper] 304 Not Modified for {url} - skipping browser")
+            return unchanged_result('http_not_modified')
+        
+        if response.status_code != 200:
+            print(f"[DataScraper] HTTP tier got {response.status_code} for {url}, falling back to browser")
+            return {'success': False, 'error': f'HTTP {response.status_code}', 'method': 'http'}
+        
+        html = response.text
+        extracted = trafilatura.extract(html, include_tables=True, include_comments=False, favor_recall=True)
+        
+        if self._is_js_only_page(html, extracted):
+            print(f"[DataScraper] Static extraction insufficient for {url} (JS-only page?), using browser")
+            return {'success': False, 'error': 'Static extraction failed', 'method': 'http'}
+        
+        static_hash = hashlib.sha256(extracted.encode()).hexdigest()[:16]
+        new_validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'static_hash': static_hash
+        }
+        
+        if cached and validators.get('static_hash') == static_hash:
+            print(f"[DataScraper] Extracted content unchanged for {url} - skipping browser")
+            self.storage.save_http_validators(url, new_validators)
+            return unchanged_result('http_unchanged')
+        
+        if self._extraction_family(cached) == 'browser':
+            reason = 'changed' if validators.get('static_hash') else 'has no static baseline yet'
+            print(f"[DataScraper] Static content {reason} for {url} - re-scraping with the browser (stored method)")
+            return {'success': False, 'error': f'Static content {reason}', 'method': 'http', 'validators': new_validators}
+        
+        metadata = trafilatura.extract_metadata(html)
+        title = (metadata.title if metadata and metadata.title else '') or (cached or {}).get('title', '')
+        
+        self.storage.save_source(url=url, title=title, content=extracted, page_path=page_path, method='http')
+        self.storage.save_http_validators(url, new_validators)
+        
+        print(f"[DataScraper] HTTP tier success: {len(extracted)} chars (no browser)")
+        return {
+            'success': True,
+            'content': extracted,
+            'title': title,
+            'url': url,
+            'method': 'http',
+            'timestamp': datetime.now().isoformat()
+        }
     
     def _scrape_with_local_chrome(self, url, page_path=None):
         """Try to scrape with local Playwright/Chrome"""
         try:
-            from local_scraper import PlaywrightScraper
+            from local_scraper import PlaywrightScraper, FULL_FETCH_PROFILE, get_profile_domain
             
             print(f"[DataScraper] Trying local Chrome for {url}...")
-            scraper = PlaywrightScraper()
-            result = scraper.scrape(url, headless=False)  # Visible mode
+            # Base profile from config.json (scraping.fetch_profile), per-domain profile from the registry
+            scraper = PlaywrightScraper(config.get('scraping', {}).get('fetch_profile'))
+            domain = get_profile_domain(url)
+            domain_profile = sources_registry.get_fetch_profile(domain)
+            result = scraper.scrape(url, headless=False, fetch_profile=domain_profile)  # Visible mode
+            
+            # Blocking resources broke the page - retry once with a full load and remember it
+            if not result.get('success') and not result.get('blocked') and scraper.fetch_profile.get('block_resources') \
+                    and (domain_profile or {}).get('block_resources', True):
+                print(f"[DataScraper] Retrying {url} without resource blocking...")
+                result = scraper.scrape(url, headless=False, fetch_profile=FULL_FETCH_PROFILE)
+            
+            if result.get('success') and result.get('fetch_stats'):
+                self._learn_fetch_profile(domain, result['fetch_stats'])
             
             if result.get('success') and result.get('content'):
                 # Save to persistent storage
@@ -157,7 +302,8 @@ class DataSourceScraper:
                     url=url,
                     title=result.get('title', ''),
                     content=result['content'],
-                    page_path=page_path
+                    page_path=page_path,
+                    method='local_chrome'
                 )
                 
                 print(f"[DataScraper] Local Chrome success: {len(result['content'])} chars")
@@ -181,6 +327,41 @@ class DataSourceScraper:
             print(f"[DataScraper] Local Chrome error: {e}")
             return {'success': False, 'error': str(e), 'method': 'local_chrome'}
     
+    def _learn_fetch_profile(self, domain, fetch_stats):
+        """Remember what worked for this domain (blocking on/off, readiness selector, timing)"""
+        if not domain:
+            return
+        try:
+            from local_scraper import CONTENT_SELECTORS, NO_SELECTOR_READY_TIMEOUT
+            
+            def learn(previous):
+                previous = previous or {}
+                samples = previous.get('samples', 0) + 1
+                avg_ms = previous.get('avg_elapsed_ms', fetch_stats['elapsed_ms'])
+                
+                profile = {
+                    'block_resources': fetch_stats.get('block_resources', True),
+                    'block_trackers': fetch_stats.get('block_trackers', True),
+                    'wait_until': fetch_stats.get('wait_until', 'domcontentloaded'),
+                    'samples': samples,
+                    'last_elapsed_ms': fetch_stats['elapsed_ms'],
+                    'avg_elapsed_ms': int(avg_ms + (fetch_stats['elapsed_ms'] - avg_ms) / samples),
+                    'last_blocked_requests': fetch_stats.get('blocked_requests', 0)
+                }
+                # Learned selector is tried first; the defaults stay as a fallback if the layout changes
+                if fetch_stats.get('ready_selector'):
+                    profile['ready_selectors'] = [fetch_stats['ready_selector']] + [
+                        s for s in CONTENT_SELECTORS if s != fetch_stats['ready_selector']]
+                else:
+                    # No selector matched - don't block the next fetch for the full ready_timeout
+                    profile['no_ready_selector'] = True
+                    profile['ready_timeout'] = NO_SELECTOR_READY_TIMEOUT
+                return profile
+            
+            sources_registry.update_fetch_profile(domain, learn)
+        except Exception as e:
+            print(f"[DataScraper] Could not save fetch profile for {domain}: {e}")
+    
     def _scrape_with_apify(self, url, page_path=None):
         """Fallback: Scrape with Apify Web Scraper API"""
         try:
@@ -329,6 +510,8 @@ class DataSourceScraper:
 # ============ Source Storage Manager ============
 
 import hashlib
+from history_store import DeltaHistoryStore, MANIFEST_FILE
+from json_store import JsonDocumentStore
 
 class SourceStorageManager:
     """
@@ -344,27 +527,24 @@ class SourceStorageManager:
     def _ensure_structure(self):
         """יצירת תיקיות אם לא קיימות"""
         self.sources_path.mkdir(parents=True, exist_ok=True)
-        if not self.index_path.exists():
-            self._save_index({
-                "version": "1.0",
-                "last_updated": datetime.now().isoformat(),
-                "sources": {}
-            })
+        # index.json is held in memory (shared by all instances) - writes go to index.json.wal
+        self._store = JsonDocumentStore.open(self.index_path, lambda: {
+            "version": "1.0",
+            "last_updated": datetime.now().isoformat(),
+            "sources": {}
+        })
     
     def _load_index(self):
-        """טעינת קובץ index.json"""
-        try:
-            with open(self.index_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"[Storage] Error loading index: {e}")
-            return {"version": "1.0", "sources": {}}
+        """עותק מלא של index.json (מהזיכרון)"""
+        return self._store.snapshot()
     
     def _save_index(self, index):
-        """שמירת קובץ index.json"""
-        index["last_updated"] = datetime.now().isoformat()
-        with open(self.index_path, 'w', encoding='utf-8') as f:
-            json.dump(index, f, ensure_ascii=False, indent=2)
+        """שמירת index.json מלא (מחליף גם שינויים של תהליכים אחרים - לשינוי רשומה השתמשו ב-_store.update)"""
+        self._store.replace(index)
+    
+    def get_source_entry(self, source_id):
+        """קבלת רשומת מקור מה-index לפי ID"""
+        return self._store.get("sources", source_id)
     
     def get_source_id(self, url):
         """יצירת ID ייחודי מ-URL (hash)"""
@@ -384,11 +564,9 @@ class SourceStorageManager:
     
     def get_cached_source(self, url):
         """קבלת מקור שמור אם קיים"""
-        source_id = self.get_source_id(url)
-        index = self._load_index()
+        source_info = self.get_source_entry(self.get_source_id(url))
         
-        if source_id in index["sources"]:
-            source_info = index["sources"][source_id]
+        if source_info:
             file_path = self.base_path / source_info["file_path"]
             
             if file_path.exists():
@@ -402,7 +580,7 @@ class SourceStorageManager:
         
         return None
     
-    def save_source(self, url, title, content, page_path=None):
+    def save_source(self, url, title, content, page_path=None, method="apify"):
         """שמירת מקור חדש או עדכון קיים"""
         source_id = self.get_source_id(url)
         domain = self.get_domain_from_url(url)
@@ -417,7 +595,7 @@ class SourceStorageManager:
             "content": content,
             "scraped_at": timestamp,
             "scraper_metadata": {
-                "method": "apify",
+                "method": method,
                 "status": "success"
             }
         }
@@ -431,36 +609,37 @@ class SourceStorageManager:
         
         print(f"[Storage] Saved source: {file_path}")
         
-        # Update index
-        index = self._load_index()
-        
-        if source_id in index["sources"]:
-            # Update existing entry
-            index["sources"][source_id]["last_scraped"] = timestamp
-            index["sources"][source_id]["scrape_count"] = index["sources"][source_id].get("scrape_count", 1) + 1
+        # Update index (file-locked read-modify-write - parallel scans and the CLI scanner share index.json)
+        with self._store.transaction():
+            entry = self.get_source_entry(source_id)
             
-            # Update used_by_pages
-            if page_path and page_path not in index["sources"][source_id].get("used_by_pages", []):
-                index["sources"][source_id].setdefault("used_by_pages", []).append(page_path)
-        else:
-            # Create new entry
-            index["sources"][source_id] = {
-                "id": source_id,
-                "url": url,
-                "domain": domain,
-                "title": title,
-                "first_scraped": timestamp,
-                "last_scraped": timestamp,
-                "scrape_count": 1,
-                "file_path": f"sources/{filename}",
-                "used_by_pages": [page_path] if page_path else [],
-                "metadata": {
-                    "content_length": len(content),
-                    "word_count": len(content.split())
+            if entry:
+                # Update existing entry
+                entry["last_scraped"] = timestamp
+                entry["scrape_count"] = entry.get("scrape_count", 1) + 1
+            
+                # Update used_by_pages
+                if page_path and page_path not in entry.get("used_by_pages", []):
+                    entry.setdefault("used_by_pages", []).append(page_path)
+            else:
+                # Create new entry
+                entry = {
+                    "id": source_id,
+                    "url": url,
+                    "domain": domain,
+                    "title": title,
+                    "first_scraped": timestamp,
+                    "last_scraped": timestamp,
+                    "scrape_count": 1,
+                    "file_path": f"sources/{filename}",
+                    "used_by_pages": [page_path] if page_path else [],
+                    "metadata": {
+                        "content_length": len(content),
+                        "word_count": len(content.split())
+                    }
                 }
-            }
-        
-        self._save_index(index)
+            
+            self._store.put("sources", source_id, entry)
         print(f"[Storage] Updated index for source: {source_id}")
         
         # Add to RAG index for semantic search
@@ -476,6 +655,29 @@ class SourceStorageManager:
         
         return source_data
     
+    def get_http_validators(self, url):
+        """קבלת ETag / Last-Modified / hash סטטי שמורים למקור"""
+        entry = self.get_source_entry(self.get_source_id(url)) or {}
+        return entry.get("http_validators", {})
+    
+    def save_http_validators(self, url, validators):
+        """שמירת ETag / Last-Modified / hash סטטי למקור קיים"""
+        def apply(entry):
+            if entry:
+                entry["http_validators"] = {k: v for k, v in validators.items() if v}
+            return entry
+        
+        self._store.update("sources", self.get_source_id(url), apply)
+    
+    def touch_source(self, url):
+        """עדכון זמן בדיקה אחרון למקור שלא השתנה (ללא שכתוב התוכן)"""
+        def apply(entry):
+            if entry:
+                entry["last_checked"] = datetime.now().isoformat()
+            return entry
+        
+        self._store.update("sources", self.get_source_id(url), apply)
+    
     # ============ History Support Methods ============
     
     def _get_source_dir(self, source_id):
@@ -496,69 +698,51 @@ class SourceStorageManager:
         summaries_dir.mkdir(parents=True, exist_ok=True)
         return summaries_dir
     
+    def _get_history_store(self, source_id):
+        """היסטוריית גרסאות דחוסה (delta) למקור"""
+        return DeltaHistoryStore(self._get_history_dir(source_id), source_id)
+    
     def save_to_history(self, source_id, url, title, content, content_hash=None):
-        """שמירת סריקה להיסטוריה עם תאריך"""
-        history_dir = self._get_history_dir(source_id)
-        date_str = datetime.now().strftime("%Y-%m-%d")
+        """שמירת סריקה להיסטוריה עם תאריך (delta מול הגרסה הקודמת)"""
+        store = self._get_history_store(source_id)
+        entry = store.append(url, title, content, content_hash)
         
-        history_data = {
-            "source_id": source_id,
-            "url": url,
-            "title": title,
-            "content": content,
-            "content_hash": content_hash or hashlib.sha256(content.encode()).hexdigest()[:16],
-            "scraped_at": datetime.now().isoformat(),
-            "word_count": len(content.split())
-        }
-        
-        history_file = history_dir / f"{date_str}.json"
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(history_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"[Storage] Saved to history: {history_file}")
-        return str(history_file)
+        kind = "full" if entry.get("full_file") else ("delta" if entry.get("delta_file") else "unchanged")
+        print(f"[Storage] Saved to history: {source_id} {entry['date']} ({kind}, +{entry['added']}/-{entry['removed']})")
+        return str(store.history_dir / (entry.get("full_file") or entry.get("delta_file") or MANIFEST_FILE))
     
     def get_previous_version(self, source_id):
         """קבלת הגרסה האחרונה מההיסטוריה"""
-        history_dir = self._get_history_dir(source_id)
-        
-        if not history_dir.exists():
-            return None
-        
-        # Get all history files sorted by date (newest first)
-        history_files = sorted(history_dir.glob("*.json"), reverse=True)
-        
-        if not history_files:
-            return None
-        
-        # Get the most recent one
         try:
-            with open(history_files[0], 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self._get_history_store(source_id).latest()
         except Exception as e:
             print(f"[Storage] Error loading previous version: {e}")
             return None
     
-    def get_history(self, source_id, limit=52):
-        """קבלת היסטוריה (עד 52 שבועות = שנה)"""
-        history_dir = self._get_history_dir(source_id)
-        
-        if not history_dir.exists():
+    def get_version(self, source_id, date=None, content_hash=None):
+        """שחזור גרסה מסוימת לפי תאריך או hash"""
+        try:
+            return self._get_history_store(source_id).get_version(date=date, content_hash=content_hash)
+        except Exception as e:
+            print(f"[Storage] Error loading version {date or content_hash}: {e}")
+            return None
+    
+    def get_history(self, source_id, limit=52, include_content=True):
+        """קבלת היסטוריה (עד 52 שבועות = שנה) - include_content=False מחזיר מטא-דאטה בלבד"""
+        try:
+            store = self._get_history_store(source_id)
+            return store.get_history(limit) if include_content else store.list_versions(limit)
+        except Exception as e:
+            print(f"[Storage] Error loading history for {source_id}: {e}")
             return []
-        
-        history_files = sorted(history_dir.glob("*.json"), reverse=True)[:limit]
-        history = []
-        
-        for f in history_files:
-            try:
-                with open(f, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    data['file_name'] = f.name
-                    history.append(data)
-            except Exception as e:
-                print(f"[Storage] Error loading history file {f}: {e}")
-        
-        return history
+    
+    def get_changes(self, source_id, date=None):
+        """מה השתנה בגרסה (ברירת מחדל: האחרונה) מול הגרסה הקודמת"""
+        try:
+            return self._get_history_store(source_id).get_changes(date)
+        except Exception as e:
+            print(f"[Storage] Error loading changes for {source_id}: {e}")
+            return None
     
     def save_ai_summary(self, source_id, summary_data, model="gemma2:9b"):
         """שמירת סיכום AI"""
@@ -604,18 +788,11 @@ class SourceStorageManager:
         cutoff_date = datetime.now() - timedelta(days=max_age_days)
         deleted_count = 0
         
-        # Cleanup history
-        history_dir = self._get_history_dir(source_id)
-        if history_dir.exists():
-            for f in history_dir.glob("*.json"):
-                try:
-                    date_str = f.stem  # e.g., "2025-01-15"
-                    file_date = datetime.strptime(date_str, "%Y-%m-%d")
-                    if file_date < cutoff_date:
-                        f.unlink()
-                        deleted_count += 1
-                except Exception as e:
-                    print(f"[Storage] Error cleaning up {f}: {e}")
+        # Cleanup history (keeps the delta chain reconstructable)
+        try:
+            deleted_count += self._get_history_store(source_id).prune(cutoff_date)
+        except Exception as e:
+            print(f"[Storage] Error cleaning up history for {source_id}: {e}")
         
         # Cleanup summaries
         summaries_dir = self._get_summaries_dir(source_id)
@@ -637,8 +814,7 @@ class SourceStorageManager:
     
     def get_all_source_ids(self):
         """קבלת כל ה-source IDs"""
-        index = self._load_index()
-        return list(index.get("sources", {}).keys())
+        return self._store.keys("sources")
     
     def get_weekly_reports_dir(self):
         """קבלת תיקיית דוחות שבועיים"""
@@ -709,96 +885,128 @@ class SourcesRegistry:
     def _ensure_registry(self):
         """יצירת קובץ רישום אם לא קיים"""
         self.base_path.mkdir(parents=True, exist_ok=True)
-        if not self.registry_path.exists():
-            self._save_registry({
-                "version": "1.0",
-                "last_updated": datetime.now().isoformat(),
-                "sources": {}
-            })
+        # Registry is held in memory - writes go to sources_registry.json.wal, checkpointed periodically
+        self._store = JsonDocumentStore.open(self.registry_path, lambda: {
+            "version": "1.0",
+            "last_updated": datetime.now().isoformat(),
+            "sources": {}
+        })
     
     def _load_registry(self):
-        """טעינת רישום המקורות"""
-        try:
-            with open(self.registry_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"[Registry] Error loading registry: {e}")
-            return {"version": "1.0", "sources": {}}
+        """עותק מלא של רישום המקורות (מהזיכרון)"""
+        return self._store.snapshot()
     
     def _save_registry(self, registry):
-        """שמירת רישום המקורות"""
-        registry["last_updated"] = datetime.now().isoformat()
-        with open(self.registry_path, 'w', encoding='utf-8') as f:
-            json.dump(registry, f, ensure_ascii=False, indent=2)
+        """שמירת רישום המקורות המלא (מחליף גם שינויים של תהליכים אחרים - לשינוי מקור השתמשו ב-update_source)"""
+        self._store.replace(registry)
     
     def _generate_id(self, url):
         """יצירת ID ייחודי מ-URL"""
         return hashlib.md5(url.encode('utf-8')).hexdigest()[:12]
     
+    @staticmethod
+    def normalize_page_path(page_path, pages_dir="דפים לשינוי"):
+        """נתיב עמוד ברישום: יחסי לתיקיית העמודים, עם / גם ב-Windows (main/שם העמוד)"""
+        path = str(page_path).replace('\\', '/').strip('/')
+        if path.startswith(pages_dir + "/"):
+            path = path[len(pages_dir) + 1:]
+        return path
+    
+    def _put_source(self, source):
+        """כתיבת מקור + עדכון האינדקס ההפוך URL → עמודים"""
+        pages = [self.normalize_page_path(p) for p in source.get("linked_pages", [])]
+        source["linked_pages"] = list(dict.fromkeys(pages))
+        self._store.put("sources", source["id"], source)
+        self._index_source(source)
+    
+    def _index_source(self, source):
+        """עדכון האינדקס ההפוך URL → עמודים עבור מקור בודד"""
+        pages = list(source.get("linked_pages", []))
+        if self._store.get("url_index", source["url"]) != pages:
+            self._store.put("url_index", source["url"], pages)
+    
+    def _ensure_url_index(self):
+        """בניית האינדקס ההפוך אם חסר (רישום ישן) או לא מסונכרן"""
+        def rebuild(registry):
+            if len(registry.get("url_index", {})) == len(registry.get("sources", {})):
+                return None
+            registry["url_index"] = {
+                source["url"]: list(source.get("linked_pages", []))
+                for source in registry["sources"].values()
+            }
+            return registry
+        
+        if self._store.count("url_index") != self._store.count("sources"):
+            self._store.update_document(rebuild)
+    
     def add_source(self, url, description="", linked_pages=None):
         """הוספת מקור חדש"""
         if linked_pages is None:
             linked_pages = []
         
-        registry = self._load_registry()
         source_id = self._generate_id(url)
         
-        # Check if already exists
-        if source_id in registry["sources"]:
-            print(f"[Registry] Source already exists: {url}")
-            return registry["sources"][source_id]
-        
-        new_source = {
-            "id": source_id,
-            "url": url,
-            "description": description,
-            "added_at": datetime.now().isoformat(),
-            "last_scraped": None,
-            "scraping_status": "pending",  # pending, scraped, error
-            "linked_pages": linked_pages
-        }
-        
-        registry["sources"][source_id] = new_source
-        self._save_registry(registry)
+        with self._store.transaction():
+            # Check if already exists
+            existing = self._store.get("sources", source_id)
+            if existing:
+                print(f"[Registry] Source already exists: {url}")
+                return existing
+            
+            new_source = {
+                "id": source_id,
+                "url": url,
+                "description": description,
+                "added_at": datetime.now().isoformat(),
+                "last_scraped": None,
+                "scraping_status": "pending",  # pending, scraped, error
+                "linked_pages": linked_pages
+            }
+            
+            self._put_source(new_source)
         
         print(f"[Registry] Added source: {url} (ID: {source_id})")
         return new_source
     
     def update_source(self, source_id, updates):
-        """עדכון מקור קיים"""
-        registry = self._load_registry()
+        """עדכון מקור קיים (read-modify-write אטומי מול תהליכים אחרים, למשל weekly_scanner מה-CLI)"""
+        # Don't allow changing id or url
+        updates = {k: v for k, v in updates.items() if k not in ('id', 'url')}
         
-        if source_id not in registry["sources"]:
-            print(f"[Registry] Source not found: {source_id}")
-            return None
+        def apply(source):
+            if source:
+                source.update(updates)
+            return source
         
-        # Don't allow changing id or url
-        updates.pop('id', None)
-        updates.pop('url', None)
+        with self._store.transaction():
+            source = self._store.update("sources", source_id, apply)
+            if source and "linked_pages" in updates:
+                self._put_source(source)
         
-        registry["sources"][source_id].update(updates)
-        self._save_registry(registry)
+        if not source:
+            print(f"[Registry] Source not found: {source_id}")
+            return None
         
         print(f"[Registry] Updated source: {source_id}")
-        return registry["sources"][source_id]
+        return source
     
     def remove_source(self, source_id):
         """הסרת מקור"""
-        registry = self._load_registry()
-        
-        if source_id not in registry["sources"]:
-            return False
-        
-        del registry["sources"][source_id]
-        self._save_registry(registry)
+        with self._store.transaction():
+            removed = self._store.get("sources", source_id)
+            
+            if not removed:
+                return False
+            
+            self._store.delete("sources", source_id)
+            self._store.delete("url_index", removed.get("url"))
         
         print(f"[Registry] Removed source: {source_id}")
         return True
     
     def get_source(self, source_id):
         """קבלת מקור לפי ID"""
-        registry = self._load_registry()
-        return registry["sources"].get(source_id)
+        return self._store.get("sources", source_id)
     
     def get_source_by_url(self, url):
         """קבלת מקור לפי URL"""
@@ -807,13 +1015,47 @@ class SourcesRegistry:
     
     def get_all_sources(self):
         """קבלת כל המקורות"""
-        registry = self._load_registry()
-        return list(registry["sources"].values())
+        return self._store.values("sources")
     
     def get_sources_for_page(self, page_path):
         """קבלת מקורות משויכים לעמוד"""
+        page_path = self.normalize_page_path(page_path)
         all_sources = self.get_all_sources()
-        return [s for s in all_sources if page_path in s.get("linked_pages", [])]
+        return [s for s in all_sources
+                if page_path in (self.normalize_page_path(p) for p in s.get("linked_pages", []))]
+    
+    def get_pages_by_url(self):
+        """אינדקס הפוך URL → עמודים משויכים (מתוחזק בכל שיוך/ביטול שיוך)"""
+        self._ensure_url_index()
+        return self._store.snapshot().get("url_index", {})
+    
+    def get_scan_targets(self, include_unlinked=False):
+        """
+        כל המקורות לסריקה בקריאה אחת של הרישום - ללא מעבר על תיקיות העמודים
+        מקורות שאינם משויכים לאף עמוד לא נסרקים (כמו הסריקה הישנה לפי page_info.json) אלא אם include_unlinked
+        מחזיר: {url: {url, description, source_id, used_by_pages: [{path, name}]}}
+        """
+        url_index = self.get_pages_by_url()
+        targets = {}
+        
+        for source in self.get_all_sources():
+            url = source.get("url")
+            if not url:
+                continue
+            pages = [self.normalize_page_path(p) for p in url_index.get(url, [])]
+            if not pages and not include_unlinked:
+                continue
+            targets[url] = {
+                "url": url,
+                "source_id": source.get("id"),
+                "description": source.get("description", ""),
+                "used_by_pages": [
+                    {"path": p, "name": p.rstrip('/').split('/')[-1]}
+                    for p in pages
+                ]
+            }
+        
+        return targets
     
     def get_unlinked_sources(self):
         """קבלת מקורות ללא שיוך"""
@@ -827,49 +1069,128 @@ class SourcesRegistry:
     
     def link_to_pages(self, source_id, page_paths):
         """שיוך מקור לעמודים"""
-        registry = self._load_registry()
-        
-        if source_id not in registry["sources"]:
-            return None
-        
-        source = registry["sources"][source_id]
-        current_pages = set(source.get("linked_pages", []))
-        current_pages.update(page_paths)
-        source["linked_pages"] = list(current_pages)
-        
-        self._save_registry(registry)
+        with self._store.transaction():
+            source = self._store.get("sources", source_id)
+            
+            if not source:
+                return None
+            
+            source["linked_pages"] = list(source.get("linked_pages", [])) + list(page_paths)
+            
+            self._put_source(source)
         print(f"[Registry] Linked source {source_id} to pages: {page_paths}")
         return source
     
     def unlink_from_page(self, source_id, page_path):
         """הסרת שיוך מעמוד"""
-        registry = self._load_registry()
-        
-        if source_id not in registry["sources"]:
-            return None
-        
-        source = registry["sources"][source_id]
-        linked = source.get("linked_pages", [])
-        if page_path in linked:
-            linked.remove(page_path)
-        source["linked_pages"] = linked
-        
-        self._save_registry(registry)
+        with self._store.transaction():
+            source = self._store.get("sources", source_id)
+            
+            if not source:
+                return None
+            
+            page_path = self.normalize_page_path(page_path)
+            source["linked_pages"] = [p for p in source.get("linked_pages", [])
+                                      if self.normalize_page_path(p) != page_path]
+            
+            self._put_source(source)
         print(f"[Registry] Unlinked source {source_id} from page: {page_path}")
         return source
     
     def set_linked_pages(self, source_id, page_paths):
         """הגדרת רשימת עמודים משויכים (החלפה מלאה)"""
-        registry = self._load_registry()
+        with self._store.transaction():
+            source = self._store.get("sources", source_id)
+            
+            if not source:
+                return None
+            
+            source["linked_pages"] = page_paths
+            self._put_source(source)
         
-        if source_id not in registry["sources"]:
-            return None
+        print(f"[Registry] Set linked pages for {source_id}: {page_paths}")
+        return source
+    
+    def link_page_source(self, page_path, url, description=""):
+        """שיוך מקור מ-page_info.json של עמוד (יצירה ברישום אם לא קיים)"""
+        source = self.add_source(url, description)
+        page_path = self.normalize_page_path(page_path)
+        if page_path not in source.get("linked_pages", []):
+            source = self.link_to_pages(source["id"], [page_path])
+        return source
+    
+    def unlink_page_source(self, page_path, url):
+        """ביטול שיוך מקור שהוסר מ-page_info.json של עמוד"""
+        source = self.get_source_by_url(url or "")
+        if source:
+            return self.unlink_from_page(source["id"], page_path)
+        return None
+    
+    def _import_page_sources(self, page_path, data_sources):
+        """הוספת מקורות ושיוכים מ-data_sources של עמוד - מחזיר מספר מקורות חדשים"""
+        added = 0
+        for source in data_sources:
+            url = source.get('url')
+            if not url:
+                continue
+            is_new = self.get_source_by_url(url) is None
+            registry_source = self.link_page_source(page_path, url, source.get('description', ''))
+            if is_new:
+                # Copy scraping status
+                if source.get('last_scraped'):
+                    self.update_source(registry_source['id'], {
+                        'last_scraped': source.get('last_scraped'),
+                        'scraping_status': 'scraped'
+                    })
+                added += 1
+        return added
+    
+    def _unlink_removed_page_sources(self, page_path, current_urls):
+        """ביטול שיוך העמוד ממקורות שכבר לא מופיעים ב-page_info.json שלו - מחזיר כמה בוטלו"""
+        removed = [s["url"] for s in self.get_sources_for_page(page_path) if s.get("url") not in current_urls]
+        for url in removed:
+            self.unlink_page_source(page_path, url)
+        return len(removed)
+    
+    def sync_from_pages(self, pages_dir="דפים לשינוי"):
+        """
+        סנכרון הרישום מ-page_info.json שהשתנו מאז הסנכרון הקודם (לפי mtime):
+        מקורות שנוספו לעמוד משויכים אליו, ושיוכים של מקורות שהוסרו (סוכנים / עריכה ידנית) או של עמודים שנמחקו מבוטלים.
+        עובר רק על page_info.json ברמת העמוד (<עמוד>/ או <אתר>/<עמוד>/) - בלי לרדת לתיקיות הסוכנים והארכיון.
+        """
+        pages_path = self.base_path.parent / pages_dir
+        if not pages_path.exists():
+            return {"added": 0, "unlinked": 0}
+        
+        added = unlinked = 0
+        seen = set()
+        for pattern in ("*/page_info.json", "*/*/page_info.json"):
+            for page_info_file in pages_path.glob(pattern):
+                page_path = self.normalize_page_path(page_info_file.parent.relative_to(pages_path), pages_dir)
+                seen.add(page_path)
+                try:
+                    mtime = page_info_file.stat().st_mtime_ns
+                    if self._store.get("page_info_mtimes", page_path) == mtime:
+                        continue
+                    with open(page_info_file, 'r', encoding='utf-8') as f:
+                        info = json.load(f)
+                    data_sources = info.get('data_sources', [])
+                    added += self._import_page_sources(page_path, data_sources)
+                    unlinked += self._unlink_removed_page_sources(
+                        page_path, {s.get('url') for s in data_sources if s.get('url')})
+                    self._store.put("page_info_mtimes", page_path, mtime)
+                except Exception as e:
+                    print(f"[Registry] Error syncing from {page_info_file}: {e}")
         
-        registry["sources"][source_id]["linked_pages"] = page_paths
-        self._save_registry(registry)
+        # Pages whose page_info.json is gone since the last sync
+        for page_path in self._store.keys("page_info_mtimes"):
+            if page_path not in seen:
+                unlinked += self._unlink_removed_page_sources(page_path, set())
+                self._store.delete("page_info_mtimes", page_path)
         
-        print(f"[Registry] Set linked pages for {source_id}: {page_paths}")
-        return registry["sources"][source_id]
+        if added or unlinked:
+            print(f"[Registry] Synced from pages: {added} new sources, {unlinked} removed links")
+        return {"added": added, "unlinked": unlinked}
     
     def mark_as_scraped(self, source_id):
         """סימון מקור כנסרק"""
@@ -896,6 +1217,26 @@ class SourcesRegistry:
             return source.get("ai_summary")
         return None
     
+    def get_fetch_profile(self, domain):
+        """קבלת פרופיל סריקה שנלמד לדומיין"""
+        return self._store.get("fetch_profiles", domain)
+    
+    def save_fetch_profile(self, domain, profile):
+        """שמירת פרופיל סריקה לדומיין (חסימת משאבים, סלקטור מוכנות, זמני סריקה)"""
+        return self.update_fetch_profile(domain, lambda previous: profile)
+    
+    def update_fetch_profile(self, domain, fn):
+        """עדכון פרופיל סריקה מהפרופיל הקודם: fn(previous או None) -> פרופיל חדש (אטומי בין תהליכים)"""
+        def apply(previous):
+            profile = fn(previous)
+            if profile is not None:
+                profile["updated_at"] = datetime.now().isoformat()
+            return profile
+        
+        profile = self._store.update("fetch_profiles", domain, apply)
+        print(f"[Registry] Saved fetch profile for {domain}")
+        return profile
+    
     def mark_as_error(self, source_id, error_message=""):
         """סימון מקור כשגיאה"""
         return self.update_source(source_id, {
@@ -939,37 +1280,9 @@ class SourcesRegistry:
                     continue
                 
                 # Get page path relative to pages_dir
-                page_folder = page_info_file.parent
-                page_path = str(page_folder.relative_to(pages_path))
+                page_path = self.normalize_page_path(page_info_file.parent.relative_to(pages_path), pages_dir)
+                migrated += self._import_page_sources(page_path, data_sources)
                 
-                for source in data_sources:
-                    url = source.get('url')
-                    if not url:
-                        continue
-                    
-                    # Check if already exists
-                    existing = self.get_source_by_url(url)
-                    if existing:
-                        # Just add this page to linked_pages
-                        if page_path not in existing.get('linked_pages', []):
-                            self.link_to_pages(existing['id'], [page_path])
-                    else:
-                        # Add new source
-                        new_source = self.add_source(
-                            url=url,
-                            description=source.get('description', ''),
-                            linked_pages=[page_path]
-                        )
-                        
-                        # Copy scraping status
-                        if source.get('last_scraped'):
-                            self.update_source(new_source['id'], {
-                                'last_scraped': source.get('last_scraped'),
-                                'scraping_status': 'scraped'
-                            })
-                        
-                        migrated += 1
-                        
             except Exception as e:
                 errors.append(f"{page_info_file}: {str(e)}")
                 print(f"[Registry] Error migrating from {page_info_file}: {e}")
@@ -11851,6 +12164,9 @@ def manage_data_sources():
             if 'data_sources' not in info:
                 info['data_sources'] = []
             
+            # Every change is mirrored into the central registry (the scanner's source of truth)
+            registry_page_path = SourcesRegistry.normalize_page_path(page_folder)
+            
             if action == 'add':
                 new_source = {
                     'id': str(uuid.uuid4()),
@@ -11862,16 +12178,32 @@ def manage_data_sources():
                     'scraping_status': 'pending'
                 }
                 info['data_sources'].append(new_source)
+                
+                if new_source['url']:
+                    sources_registry.link_page_source(registry_page_path, new_source['url'], new_source['description'])
             
             elif action == 'remove':
                 source_id = data.get('source_id')
+                removed = [s for s in info['data_sources'] if s['id'] == source_id]
                 info['data_sources'] = [s for s in info['data_sources'] if s['id'] != source_id]
+                
+                for source in removed:
+                    sources_registry.unlink_page_source(registry_page_path, source.get('url'))
             
             elif action == 'update':
                 source_id = data.get('source_id')
                 for source in info['data_sources']:
                     if source['id'] == source_id:
+                        old_url = source.get('url')
                         source.update(data.get('updates', {}))
+                        
+                        if old_url and old_url != source.get('url'):
+                            sources_registry.unlink_page_source(registry_page_path, old_url)
+                        if source.get('url'):
+                            registry_source = sources_registry.link_page_source(
+                                registry_page_path, source['url'], source.get('description', ''))
+                            if 'description' in data.get('updates', {}):
+                                sources_registry.update_source(registry_source['id'], {'description': source.get('description', '')})
                         break
             
             # Save updated info
@@ -12306,17 +12638,13 @@ def migrate_sources_to_registry():
 def reset_registry_errors():
     """איפוס כל המקורות עם שגיאות לסטטוס pending"""
     try:
-        registry = sources_registry._load_registry()
         reset_count = 0
         
-        for source_id, source in registry["sources"].items():
+        for source in sources_registry.get_all_sources():
             if source.get("scraping_status") == "error" or source.get("last_error"):
-                source["scraping_status"] = "pending"
-                source["last_error"] = ""
+                sources_registry.update_source(source["id"], {"scraping_status": "pending", "last_error": ""})
                 reset_count += 1
         
-        sources_registry._save_registry(registry)
-        
         return jsonify({
             "success": True,
             "reset_count": reset_count
@@ -12609,8 +12937,7 @@ def get_source_summary(source_id):
         
         if not source_data:
             # Fallback: try to find source by ID directly in storage
-            index = storage._load_index()
-            source_info = index.get("sources", {}).get(source_id)
+            source_info = storage.get_source_entry(source_id)
             
             if source_info:
                 source_file = storage.base_path / source_info.get("file_path", "")
@@ -12632,6 +12959,7 @@ def get_source_summary(source_id):
         ai_summary = None
         ai_summary_date = None
         ai_model_used = None
+        ai_metrics = None
         use_ai = request.args.get('use_ai', 'false').lower() == 'true'
         force_new = request.args.get('force_new', 'false').lower() == 'true'
         selected_model = request.args.get('model', None)  # User-selected model
@@ -12647,53 +12975,20 @@ def get_source_summary(source_id):
         
         # If use_ai requested and no saved summary (or force_new), generate new one
         if use_ai and (not ai_summary or force_new):
-            print(f"[Summary] Starting AI summary for {source_id}, model={selected_model}, force_new={force_new}")
-            try:
-                from ai_summarizer import get_summarizer, check_ollama_status
-                status = check_ollama_status(selected_model)
-                print(f"[Summary] Ollama status: available={status.get('ollama_available')}, model={status.get('model')}")
-                if status.get('ollama_available'):
-                    if force_new:
-                        print(f"[Summary] Force regenerating AI summary for {source_id} with model {selected_model or 'default'}...")
-                    else:
-                        print(f"[Summary] Generating new AI summary for {source_id} with model {selected_model or 'default'}...")
-                    ai_summarizer = get_summarizer(selected_model)
-                    print(f"[Summary] Calling summarize with {len(content)} chars of content...")
-                    ai_result = ai_summarizer.summarize(content, source_data.get('url', ''))
-                    print(f"[Summary] AI result: success={ai_result.get('success')}, has_summary={bool(ai_result.get('summary'))}")
-                    if ai_result.get('success'):
-                        ai_summary = ai_result.get('summary')
-                        ai_model_used = ai_result.get('model', ai_summarizer.model)
-                        # Save the AI summary for future use (with model info)
-                        sources_registry.save_ai_summary(source_id, ai_summary, model=ai_model_used)
-                        ai_summary_date = datetime.now().isoformat()
-                        print(f"[Summary] AI summary saved for {source_id} (model: {ai_model_used})")
-                    else:
-                        print(f"[Summary] AI failed: {ai_result.get('error')}")
-                else:
-                    print(f"[Summary] Ollama not available: {status.get('message')}")
-            except Exception as ai_err:
-                import traceback
-                print(f"[Summary] AI summarization failed: {ai_err}")
-                traceback.print_exc()
+            if request.args.get('stream', 'false').lower() == 'true':
+                return _stream_source_ai_summary(source_id, source_data, extractive_summary, selected_model, force_new)
+            
+            generated = _generate_source_ai_summary(source_id, source_data, selected_model, force_new)
+            if generated:
+                ai_summary, ai_summary_date, ai_model_used, ai_metrics = generated
         else:
             if ai_summary:
                 print(f"[Summary] Using cached AI summary for {source_id}")
             elif not use_ai:
                 print(f"[Summary] AI not requested for {source_id}")
         
-        return jsonify({
-            "success": True,
-            "source_id": source_id,
-            "url": source_data.get('url', ''),
-            "title": source_data.get('title', ''),
-            "scraped_at": source_data.get('scraped_at', ''),
-            "word_count": len(content.split()),
-            "summary": extractive_summary,
-            "ai_summary": ai_summary,
-            "ai_summary_date": ai_summary_date,
-            "ai_model": ai_model_used
-        })
+        return jsonify(_source_summary_payload(source_id, source_data, extractive_summary,
+                                               ai_summary, ai_summary_date, ai_model_used, ai_metrics))
     
     except Exception as e:
         import traceback
@@ -12701,19 +12996,108 @@ def get_source_summary(source_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-@app.route('/api/sources/content/<source_id>', methods=['GET'])
-def get_source_full_content(source_id):
-    """קבלת התוכן המלא של מקור"""
+def _source_summary_payload(source_id, source_data, extractive_summary, ai_summary=None,
+                            ai_summary_date=None, ai_model_used=None, ai_metrics=None):
+    content = source_data.get('content', '')
+    return {
+        "success": True,
+        "source_id": source_id,
+        "url": source_data.get('url', ''),
+        "title": source_data.get('title', ''),
+        "scraped_at": source_data.get('scraped_at', ''),
+        "word_count": len(content.split()),
+        "summary": extractive_summary,
+        "ai_summary": ai_summary,
+        "ai_summary_date": ai_summary_date,
+        "ai_model": ai_model_used,
+        "ai_metrics": ai_metrics
+    }
+
+
+def _generate_source_ai_summary(source_id, source_data, selected_model, force_new, on_token=None):
+    """
+    יצירת סיכום AI חדש למקור ושמירתו ברישום
+    מחזיר (ai_summary, date, model, metrics) או None אם Ollama לא זמין / הסיכום נכשל
+    """
+    content = source_data.get('content', '')
+    print(f"[Summary] Starting AI summary for {source_id}, model={selected_model}, force_new={force_new}")
     try:
-        storage = SourceStorageManager()
-        source_data = None
+        from ai_summarizer import get_summarizer, check_ollama_status
+        status = check_ollama_status(selected_model)
+        print(f"[Summary] Ollama status: available={status.get('ollama_available')}, model={status.get('model')}")
+        if not status.get('ollama_available'):
+            print(f"[Summary] Ollama not available: {status.get('message')}")
+            return None
         
-        # First try to find in registry and get URL
-        registry_source = sources_registry.get_source(source_id)
-        if registry_source:
-            url = registry_source.get('url')
-            # Get from storage by URL
-            source_data = storage.get_cached_source(url)
+        if force_new:
+            print(f"[Summary] Force regenerating AI summary for {source_id} with model {selected_model or 'default'}...")
+        else:
+            print(f"[Summary] Generating new AI summary for {source_id} with model {selected_model or 'default'}...")
+        ai_summarizer = get_summarizer(selected_model)
+        print(f"[Summary] Calling summarize with {len(content)} chars of content...")
+        ai_result = ai_summarizer.summarize(content, source_data.get('url', ''), on_token=on_token)
+        print(f"[Summary] AI result: success={ai_result.get('success')}, has_summary={bool(ai_result.get('summary'))}")
+        if not ai_result.get('success'):
+            print(f"[Summary] AI failed: {ai_result.get('error')}")
+            return None
+        
+        ai_summary = ai_result.get('summary')
+        ai_model_used = ai_result.get('model', ai_summarizer.model)
+        # Save the AI summary for future use (with model info)
+        sources_registry.save_ai_summary(source_id, ai_summary, model=ai_model_used)
+        print(f"[Summary] AI summary saved for {source_id} (model: {ai_model_used})")
+        return ai_summary, datetime.now().isoformat(), ai_model_used, ai_result.get('metrics')
+    except Exception as ai_err:
+        import traceback
+        print(f"[Summary] AI summarization failed: {ai_err}")
+        traceback.print_exc()
+        return None
+
+
+def _stream_source_ai_summary(source_id, source_data, extractive_summary, selected_model, force_new):
+    """
+    SSE: טוקנים של סיכום ה-AI בזמן שהם נוצרים, ואחריהם אירוע done עם התשובה המלאה
+    Events: {"type": "token", "text"} ... {"type": "done", ...same fields as the JSON response}
+    """
+    from flask import Response
+    import queue
+    
+    events = queue.Queue()
+    
+    def worker():
+        generated = _generate_source_ai_summary(
+            source_id, source_data, selected_model, force_new,
+            on_token=lambda text: events.put({"type": "token", "text": text}))
+        payload = _source_summary_payload(source_id, source_data, extractive_summary, *(generated or ()))
+        if not generated:
+            payload["ai_error"] = "AI summary not available - check that Ollama is running"
+        events.put(dict(payload, type="done"))
+    
+    threading.Thread(target=worker, daemon=True).start()
+    
+    def generate():
+        while True:
+            event = events.get()
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if event["type"] == "done":
+                break
+    
+    return Response(generate(), mimetype='text/event-stream')
+
+
+@app.route('/api/sources/content/<source_id>', methods=['GET'])
+def get_source_full_content(source_id):
+    """קבלת התוכן המלא של מקור"""
+    try:
+        storage = SourceStorageManager()
+        source_data = None
+        
+        # First try to find in registry and get URL
+        registry_source = sources_registry.get_source(source_id)
+        if registry_source:
+            url = registry_source.get('url')
+            # Get from storage by URL
+            source_data = storage.get_cached_source(url)
         
         if not source_data:
             return jsonify({"success": False, "error": "Source not found - try scanning it first"}), 404
@@ -12778,6 +13162,7 @@ scanner_status = {
     "started_at": None,
     "progress": 0,
     "message": "",
+    "stages": {},
     "last_report": None
 }
 
@@ -12816,6 +13201,14 @@ def run_weekly_scan():
         
         data = request.json or {}
         use_ai = data.get("use_ai", True)
+        resume = data.get("resume", True)
+        scrape_workers = int(data.get("workers", 4))
+        llm_workers = int(data["llm_workers"]) if data.get("llm_workers") else None
+        
+        def on_progress(progress):
+            scanner_status["progress"] = progress.get("percent", 0)
+            scanner_status["message"] = progress.get("message", "")
+            scanner_status["stages"] = progress
         
         def run_scan():
             global scanner_status
@@ -12823,15 +13216,17 @@ def run_weekly_scan():
                 scanner_status["running"] = True
                 scanner_status["started_at"] = datetime.now().isoformat()
                 scanner_status["progress"] = 0
+                scanner_status["stages"] = {}
                 scanner_status["message"] = "Starting scan..."
                 
                 from weekly_scanner import WeeklySourceScanner
-                scanner = WeeklySourceScanner(use_ai=use_ai)
+                scanner = WeeklySourceScanner(use_ai=use_ai, scrape_workers=scrape_workers, llm_workers=llm_workers)
                 
                 scanner_status["message"] = "Scanning sources..."
-                report = scanner.run_full_scan()
+                report = scanner.run_full_scan(progress_callback=on_progress, resume=resume)
                 
                 scanner_status["last_report"] = report.get("report_date")
+                scanner_status["timing"] = report.get("timing")
                 scanner_status["progress"] = 100
                 scanner_status["message"] = f"Complete! {report['stats']['changes_detected']} changes found."
                 
@@ -12895,9 +13290,19 @@ def get_source_history_by_id(source_id):
     """קבלת היסטוריית סריקות של מקור"""
     try:
         limit = request.args.get('limit', 52, type=int)
+        include_content = request.args.get('include_content', 'false').lower() == 'true'
+        date = request.args.get('date')
         
         storage = SourceStorageManager()
-        history = storage.get_history(source_id, limit=limit)
+        
+        # Single version - reconstructed from the nearest full snapshot
+        if date:
+            version = storage.get_version(source_id, date=date)
+            if not version:
+                return jsonify({"success": False, "error": "Version not found"}), 404
+            return jsonify({"success": True, "source_id": source_id, "version": version})
+        
+        history = storage.get_history(source_id, limit=limit, include_content=include_content)
         
         return jsonify({
             "success": True,
@@ -12909,6 +13314,21 @@ def get_source_history_by_id(source_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route('/api/source/<source_id>/history/changes', methods=['GET'])
+def get_source_history_changes(source_id):
+    """מה השתנה בגרסה מול הקודמת (?date=YYYY-MM-DD, ברירת מחדל: האחרונה)"""
+    try:
+        storage = SourceStorageManager()
+        changes = storage.get_changes(source_id, request.args.get('date'))
+        
+        if not changes:
+            return jsonify({"success": False, "error": "Version not found"}), 404
+        
+        return jsonify({"success": True, **changes})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @app.route('/api/suggest-update', methods=['POST'])
 def suggest_page_update():
     """יצירת הצעות לעדכון עמוד עם AI"""
@@ -13729,9 +14149,75 @@ def analyze_ai_content():
         
         # Run analysis
         results = ai_detection.analyze(content)
-        
+
         return jsonify(results)
-        
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/ai-detection/batch', methods=['POST'])
+def analyze_ai_content_batch():
+    """
+    AI detection for all pages (or a subset) with a site-level ranking
+    Body: {site?, folder?, paths?, limit=20, min_score=0, stream=true}
+    stream=true: Server-Sent Events - one event per page as it is scored, then a summary event with the ranking
+    """
+    if not AI_DETECTION_AVAILABLE:
+        return jsonify({"success": False, "error": "AI detection module not available"}), 500
+
+    from flask import Response
+    from ai_audit import AIDetectionAudit
+
+    data = request.json or {}
+    site_id = data.get('site')
+    folder = data.get('folder')
+    paths = set(p.replace('\\', '/') for p in data.get('paths') or [])
+    limit = int(data.get('limit', 20))
+    min_score = int(data.get('min_score', 0))
+
+    try:
+        pages = [
+            {'path': p['path'], 'name': p['name'], 'site': p['site']}
+            for p in get_html_files()
+            if (not site_id or p['site'] == site_id)
+            and (not folder or p['folder'] == folder)
+            and (not paths or p['path'] in paths)
+        ]
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    audit = AIDetectionAudit()
+
+    if not data.get('stream', True):
+        return jsonify(audit.run(pages, limit, min_score))
+
+    def generate():
+        started = time.time()
+        results = []
+        for result in audit.iter_results(pages):
+            results.append(result)
+            yield f"data: {json.dumps(dict(result, type='page', done=len(results), total=len(pages)), ensure_ascii=False)}\n\n"
+        summary = audit.summary(results, started, limit, min_score)
+        yield f"data: {json.dumps(dict(summary, type='summary'), ensure_ascii=False)}\n\n"
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/api/ai-detection/ranking', methods=['GET'])
+def get_ai_detection_ranking():
+    """Site ranking from stored scores only (no page is re-read) - as of each page's last batch scan"""
+    if not AI_DETECTION_AVAILABLE:
+        return jsonify({"success": False, "error": "AI detection module not available"}), 500
+
+    try:
+        from ai_audit import AIDetectionAudit
+        limit = int(request.args.get('limit', 20))
+        min_score = int(request.args.get('min_score', 0))
+        return jsonify({"success": True, "ranking": AIDetectionAudit().cached_ranking(limit, min_score)})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -13858,77 +14344,17 @@ def seo_serp():
         # Get Apify config
         apify_config = config.get('apify', {})
         token = apify_config.get('token')
-        actor = apify_config.get('serp_actor', 'nFJndFXA5zjCTuudP')
         
         if not token:
             return jsonify({"success": False, "error": "Apify token not configured"}), 400
         
-        # Common headers with User-Agent
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'application/json'
-        }
-        
-        # Step 1: Start the SERP scraper run - use token as query param
-        start_url = f"https://api.apify.com/v2/acts/{actor}/runs?token={token}"
-        payload = {
-            "aiMode": "aiModeWithSearchResults",
-            "countryCode": "il",
-            "forceExactMatch": False,
-            "includeIcons": False,
-            "includeUnfilteredResults": True,
-            "languageCode": "iw",
-            "maxPagesPerQuery": 1,
-            "mobileResults": False,
-            "queries": keyword,  # Dynamic - based on keyword parameter
-            "resultsPerPage": 10,
-            "saveHtml": False,
-            "saveHtmlToKeyValueStore": True
-        }
-        
+        # Start the run (or use the cache) and wait for it - polling is done by the shared SERP scheduler thread
+        from serp_jobs import SerpJobError
         print(f"[SERP] Starting scrape for: {keyword}")
-        start_response = requests.post(start_url, headers=headers, json=payload, timeout=30)
-        
-        print(f"[SERP] Start response status: {start_response.status_code}")
-        
-        if start_response.status_code not in [200, 201, 202]:
-            print(f"[SERP] Start response text: {start_response.text[:500]}")
-            return jsonify({
-                "success": False, 
-                "error": f"Apify start error: {start_response.status_code}"
-            }), 400
-        
-        run_data = start_response.json()
-        run_id = run_data.get('data', {}).get('id')
-        
-        if not run_id:
-            return jsonify({"success": False, "error": "No run ID returned"}), 400
-        
-        # Step 2: Poll for completion - use token as query param
-        poll_url = f"https://api.apify.com/v2/actor-runs/{run_id}?token={token}"
-        max_polls = 30  # Max 60 seconds
-        
-        for i in range(max_polls):
-            time.sleep(2)
-            poll_response = requests.get(poll_url, headers=headers, timeout=10)
-            poll_data = poll_response.json()
-            status = poll_data.get('data', {}).get('status')
-            
-            print(f"[SERP] Poll {i+1}: {status}")
-            
-            if status == 'SUCCEEDED':
-                dataset_id = poll_data.get('data', {}).get('defaultDatasetId')
-                break
-            elif status in ['FAILED', 'ABORTED', 'TIMED-OUT']:
-                return jsonify({"success": False, "error": f"Run failed: {status}"}), 400
-        else:
-            return jsonify({"success": False, "error": "Timeout waiting for results"}), 400
-        
-        # Step 3: Fetch results - use token as query param
-        results_url = f"https://api.apify.com/v2/datasets/{dataset_id}/items?token={token}"
-        results_response = requests.get(results_url, headers=headers, timeout=30)
-        results = results_response.json()
+        try:
+            results = submit_serp_items(keyword, token).result(timeout=get_serp_manager().timeout + 60)
+        except SerpJobError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
         # Extract organic results
         organic_results = []
@@ -13970,14 +14396,34 @@ def seo_serp():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route('/api/seo/cache/stats', methods=['GET'])
+def get_serp_cache_stats():
+    """סטטיסטיקות מטמון ה-SERP וההשלמות (hits/misses/stale לכל סוג נתונים)"""
+    try:
+        return jsonify({
+            "success": True,
+            "cache": get_serp_cache().stats(),
+            "serp_jobs": get_serp_manager().stats()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 # ============ API Routes - Keyword Research ============
 
+def get_serp_cache():
+    """מטמון תשובות SERP/השלמות המשותף (TTL לכל סוג נתונים מ-apify.cache_ttl בקונפיג)"""
+    from serp_cache import get_serp_cache as _get_cache
+    return _get_cache(config.get('apify', {}).get('cache_ttl'))
+
+
 def get_autocomplete_suggestions(keyword, token):
-    """Helper: Fetch autocomplete suggestions from Apify"""
+    """Helper: Fetch autocomplete suggestions from Apify (cached per normalized keyword)"""
     apify_config = config.get('apify', {})
     actor = apify_config.get('autocomplete_actor', 'afteru7~hshlmvt-gvgl')
     
-    url = f"https://api.apify.com/v2/acts/{actor}/run-sync-get-dataset-items?token={token}"
+    base_url = apify_config.get('base_url', 'https://api.apify.com').rstrip('/')
+    url = f"{base_url}/v2/acts/{actor}/run-sync-get-dataset-items?token={token}"
     headers = {
         'Content-Type': 'application/json',
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -13991,75 +14437,41 @@ def get_autocomplete_suggestions(keyword, token):
         "url": "https://www.google.co.il/"
     }
     
-    response = requests.post(url, headers=headers, json=payload, timeout=120)
-    if response.status_code not in [200, 201]:
-        return []
-    
-    results = response.json()
-    suggestions = []
-    if isinstance(results, list):
-        for item in results:
-            if 'suggestions' in item:
-                suggestions.extend(item['suggestions'])
-            elif 'query' in item:
-                suggestions.append(item['query'])
+    def fetch():
+        response = requests.post(url, headers=headers, json=payload, timeout=120)
+        if response.status_code not in [200, 201]:
+            return []
+        
+        results = response.json()
+        suggestions = []
+        if isinstance(results, list):
+            for item in results:
+                if 'suggestions' in item:
+                    suggestions.extend(item['suggestions'])
+                elif 'query' in item:
+                    suggestions.append(item['query'])
+        
+        return suggestions[:20]
     
-    return suggestions[:20]
+    return get_serp_cache().fetch('autocomplete', keyword, fetch, payload['country'], payload['language'])
 
 
-def save_rank_to_history(page_path, keyword, position, url_checked):
-    """Save rank position to seo_history.json in the page folder"""
+def save_rank_to_history(page_path, keyword, position, url_checked, checked_at=None):
+    """Save rank position to the site-wide rank history store (rank_history_store)
+    
+    checked_at: when the SERP was fetched (ISO) - a cached SERP is recorded on its fetch date, not today
+    """
     try:
-        from datetime import datetime
+        from rank_tracker import record_ranks
         
         page_folder = get_page_folder(page_path)
-        history_path = BASE_DIR / page_folder / 'seo_history.json'
-        
-        # Ensure directory exists
-        history_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Load existing history
-        history = {"rank_history": [], "wordpress_updates": []}
-        if history_path.exists():
-            with open(history_path, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-        
-        # Get today's date (for deduplication)
-        today = datetime.now().strftime('%Y-%m-%d')
-        current_datetime = datetime.now().isoformat()
-        
-        # Check if we already have an entry for this keyword today
-        rank_history = history.get('rank_history', [])
-        entry_updated = False
-        
-        for entry in rank_history:
-            entry_date = entry.get('date', '')[:10]  # Get YYYY-MM-DD part
-            if entry_date == today and entry.get('keyword', '').lower() == keyword.lower():
-                # Update existing entry for today
-                entry['date'] = current_datetime
-                entry['position'] = position
-                entry['url_checked'] = url_checked
-                entry_updated = True
-                print(f"[Rank History] Updated existing entry for '{keyword}' on {today}: #{position}")
-                break
-        
-        if not entry_updated:
-            # Add new entry
-            rank_history.append({
-                "date": current_datetime,
-                "keyword": keyword,
-                "position": position,
-                "url_checked": url_checked
-            })
-            print(f"[Rank History] Added new entry for '{keyword}': #{position}")
-        
-        history['rank_history'] = rank_history
-        
-        # Save back
-        with open(history_path, 'w', encoding='utf-8') as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
-        
-        print(f"[Rank History] Saved to {history_path}")
+        record_ranks(page_folder, [{
+            "keyword": keyword,
+            "position": position,
+            "url_checked": url_checked,
+            "date": checked_at
+        }])
+        print(f"[Rank History] Saved '{keyword}': #{position} for {page_folder}")
         
     except Exception as e:
         print(f"[Rank History] Error saving: {e}")
@@ -14113,7 +14525,55 @@ def save_wordpress_update_to_history(page_path, update_type, changes, triggered_
         traceback.print_exc()
 
 
-def get_serp_related_searches(keyword, token, our_url=None, status_callback=None):
+def get_serp_manager():
+    """מנהל ריצות ה-SERP המשותף (apify.base_url בקונפיג מאפשר להפנות ל-LocalApifyServer)"""
+    from serp_jobs import get_serp_manager as _get_manager
+    return _get_manager(config.get('apify', {}).get('base_url'))
+
+
+def submit_serp_items(keyword, token, status_callback=None, allow_stale=True):
+    """Helper: Future of the SERP dataset items for a keyword.
+    
+    Served from the SERP cache when present (a stale entry is returned at once and refreshed
+    in the background); otherwise a new run on the shared scheduler, cached when it succeeds.
+    allow_stale=False (rank checks) treats a stale entry as a miss. future.fetched_at is the
+    cache entry's fetch time (epoch), or None for a new run.
+    """
+    from concurrent.futures import Future
+    from serp_jobs import build_serp_payload
+    
+    actor = config.get('apify', {}).get('serp_actor', 'nFJndFXA5zjCTuudP')
+    payload = build_serp_payload(keyword)
+    cache = get_serp_cache()
+    
+    entry, state = cache.get_entry('serp', keyword, payload['countryCode'], payload['languageCode'])
+    if state == 'fresh' or (state == 'stale' and allow_stale):
+        print(f"[SERP] Cache {state} hit for '{keyword}'")
+        if state == 'stale':
+            cache.revalidate('serp', keyword, lambda: get_serp_manager().run(actor, payload, token),
+                             payload['countryCode'], payload['languageCode'])
+        future = Future()
+        future.set_result(entry['value'])
+        future.fetched_at = entry['fetched_at']
+        return future
+    
+    def store(done):
+        if not done.exception() and done.result():
+            cache.put('serp', keyword, done.result(), payload['countryCode'], payload['languageCode'])
+    
+    future = get_serp_manager().submit(actor, payload, token, status_callback)
+    future.fetched_at = None
+    future.add_done_callback(store)
+    return future
+
+
+def serp_checked_at(future):
+    """Helper: ISO time the SERP behind a submit_serp_items future was fetched (None = just now)"""
+    fetched_at = getattr(future, 'fetched_at', None)
+    return datetime.fromtimestamp(fetched_at).isoformat() if fetched_at else None
+
+
+def get_serp_related_searches(keyword, token, our_url=None, status_callback=None, allow_stale=True):
     """Helper: Fetch related searches from SERP API and check ranking position.
     
     Args:
@@ -14121,79 +14581,29 @@ def get_serp_related_searches(keyword, token, our_url=None, status_callback=None
         token: Apify API token
         our_url: Optional URL to check ranking position for
         status_callback: Optional callback function(poll_number, total_polls) for progress updates
-    """
-    apify_config = config.get('apify', {})
-    actor = apify_config.get('serp_actor', 'nFJndFXA5zjCTuudP')
+        allow_stale: Pass False when the rank position is recorded (no stale cached SERP)
     
-    headers = {
-        'Content-Type': 'application/json',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Accept': 'application/json'
-    }
-    
-    # Start the SERP scraper run
-    start_url = f"https://api.apify.com/v2/acts/{actor}/runs?token={token}"
-    payload = {
-        "aiMode": "aiModeWithSearchResults",
-        "countryCode": "il",
-        "forceExactMatch": False,
-        "includeIcons": False,
-        "includeUnfilteredResults": True,
-        "languageCode": "iw",
-        "maxPagesPerQuery": 1,
-        "mobileResults": False,
-        "queries": keyword,  # Dynamic - based on keyword parameter
-        "resultsPerPage": 10,
-        "saveHtml": False,
-        "saveHtmlToKeyValueStore": True
-    }
+    The result's 'checked_at' is the fetch time of a cached SERP (None when fetched now).
+    """
+    from serp_jobs import SerpJobError
     
+    # Start the SERP scraper run (or use the cache) - the shared scheduler thread polls it with adaptive backoff
     print(f"[SERP] Starting scrape for '{keyword}' with resultsPerPage=10, aiMode=aiModeWithSearchResults")
-    start_response = requests.post(start_url, headers=headers, json=payload, timeout=30)
     empty_result = {'related': [], 'rank_position': None, 'organic_results': [], 'ai_mode_results': [], 'ai_rank_position': None, 'competitor_data': []}
-    if start_response.status_code not in [200, 201, 202]:
-        return empty_result
-    
-    run_data = start_response.json()
-    run_id = run_data.get('data', {}).get('id')
-    if not run_id:
-        return empty_result
-    
-    # Poll for completion - 5 seconds interval, up to 36 polls (3 minutes max)
-    poll_url = f"https://api.apify.com/v2/actor-runs/{run_id}?token={token}"
-    dataset_id = None
-    total_polls = 36
-    
-    for i in range(total_polls):
-        time.sleep(5)
-        
-        # Call status callback if provided
-        if status_callback:
-            try:
-                status_callback(i + 1, total_polls)
-            except Exception as cb_err:
-                print(f"[SERP] Status callback error: {cb_err}")
-        
-        poll_response = requests.get(poll_url, headers=headers, timeout=10)
-        poll_data = poll_response.json()
-        status = poll_data.get('data', {}).get('status')
-        
-        print(f"[SERP] Poll {i+1}/{total_polls}: {status}")
-        
-        if status == 'SUCCEEDED':
-            dataset_id = poll_data.get('data', {}).get('defaultDatasetId')
-            break
-        elif status in ['FAILED', 'ABORTED', 'TIMED-OUT']:
-            return empty_result
-    
-    if not dataset_id:
+    try:
+        future = submit_serp_items(keyword, token, status_callback, allow_stale)
+        results = future.result(timeout=get_serp_manager().timeout + 60)
+    except SerpJobError as e:
+        print(f"[SERP] Run for '{keyword}' failed: {e}")
         return empty_result
     
-    # Fetch results
-    results_url = f"https://api.apify.com/v2/datasets/{dataset_id}/items?token={token}"
-    results_response = requests.get(results_url, headers=headers, timeout=30)
-    results = results_response.json()
-    
+    serp_result = parse_serp_results(keyword, results, our_url)
+    serp_result['checked_at'] = serp_checked_at(future)
+    return serp_result
+
+
+def parse_serp_results(keyword, results, our_url=None):
+    """Helper: Extract related searches, organic/AI mode results and rank positions from SERP dataset items"""
     # Save full response to debug file
     try:
         import json as json_module
@@ -14416,15 +14826,16 @@ def check_rank():
         
         print(f"[Rank Check] Checking rank for '{keyword}' at URL: {page_url}")
         
-        # Use the SERP function which now checks rank
-        result = get_serp_related_searches(keyword, token, page_url)
+        # Use the SERP function which now checks rank (fresh cache entries only)
+        result = get_serp_related_searches(keyword, token, page_url, allow_stale=False)
         
         return jsonify({
             "success": True,
             "keyword": keyword,
             "page_url": page_url,
             "rank_position": result.get('rank_position'),
-            "found": result.get('rank_position') is not None
+            "found": result.get('rank_position') is not None,
+            "checked_at": result.get('checked_at') or datetime.now().isoformat()
         })
         
     except Exception as e:
@@ -14434,6 +14845,119 @@ def check_rank():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+# Bulk rank tracker status tracking
+rank_tracker_status = {
+    "running": False,
+    "started_at": None,
+    "message": "",
+    "last_report": None
+}
+
+@app.route('/api/rank/bulk', methods=['POST'])
+def run_bulk_rank_check():
+    """בדיקת דירוג לכל הדפים בריצות SERP מרובות שאילתות (ברקע)"""
+    try:
+        if rank_tracker_status["running"]:
+            return jsonify({
+                "success": False,
+                "error": "Rank tracker is already running",
+                "status": rank_tracker_status
+            }), 400
+        
+        data = request.json or {}
+        site = data.get("site")
+        batch_size = int(data.get("batch_size", 25))
+        
+        def run_tracker():
+            try:
+                rank_tracker_status["running"] = True
+                rank_tracker_status["started_at"] = datetime.now().isoformat()
+                rank_tracker_status["message"] = "Checking ranks..."
+                
+                from rank_tracker import BulkRankTracker, collect_pages
+                tracker = BulkRankTracker(config=config, batch_size=batch_size)
+                report = tracker.run(collect_pages(config, site))
+                
+                if report.get("success"):
+                    rank_tracker_status["last_report"] = {k: report[k] for k in ("report_date", "stats", "cost_usd", "timing", "report_file")}
+                    rank_tracker_status["message"] = f"Complete! {report['stats']['ranked']}/{report['stats']['pages']} pages ranked."
+                else:
+                    rank_tracker_status["message"] = f"Error: {report.get('error')}"
+                
+            except Exception as e:
+                rank_tracker_status["message"] = f"Error: {str(e)}"
+            finally:
+                rank_tracker_status["running"] = False
+        
+        thread = threading.Thread(target=run_tracker)
+        thread.daemon = True
+        thread.start()
+        
+        return jsonify({
+            "success": True,
+            "message": "Rank tracking started in background",
+            "status": rank_tracker_status
+        })
+        
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/rank/bulk/status', methods=['GET'])
+def get_bulk_rank_status():
+    """סטטוס מעקב הדירוגים + נתוני ריצות ה-SERP"""
+    try:
+        return jsonify({
+            "success": True,
+            "tracker": rank_tracker_status,
+            "serp_jobs": get_serp_manager().stats()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/rank/history', methods=['GET'])
+def get_rank_history():
+    """היסטוריית דירוגים לדף ו/או מילת מפתח (page_path, keyword, days)"""
+    try:
+        from rank_history_store import get_rank_store
+        page_path = request.args.get('page_path')
+        keyword = request.args.get('keyword')
+        days = int(request.args.get('days', 90))
+        
+        if not page_path and not keyword:
+            return jsonify({"success": False, "error": "Missing page_path or keyword"}), 400
+        
+        page_folder = get_page_folder(page_path) if page_path else None
+        return jsonify({
+            "success": True,
+            "history": get_rank_store().trend(page_folder, keyword, days)
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/rank/trends', methods=['GET'])
+def get_rank_trends():
+    """מגמת דירוגים לכל האתר: ממוצע יומי, מיקום ממוצע לכל דף ו-movers/losers"""
+    try:
+        from rank_history_store import get_rank_store
+        store = get_rank_store()
+        days = int(request.args.get('days', 90))
+        movers_days = int(request.args.get('movers_days', 7))
+        limit = int(request.args.get('limit', 20))
+        
+        return jsonify({
+            "success": True,
+            "site_trend": store.site_trend(days),
+            "averages": store.average_positions(min(days, 30)),
+            "movers": store.movers(movers_days, limit),
+            "stats": store.stats()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @app.route('/api/keywords/fetch', methods=['POST'])
 def fetch_keywords():
     """Fetch both autocomplete AND related searches in one call, with rank tracking"""
@@ -14463,7 +14987,7 @@ def fetch_keywords():
         
         # 2. Get related searches from SERP (with rank checking, AI mode, competitor data)
         print(f"[Keywords] Step 2: Fetching related searches and checking rank...")
-        serp_result = get_serp_related_searches(keyword, token, page_url)
+        serp_result = get_serp_related_searches(keyword, token, page_url, allow_stale=not page_path)
         related = serp_result.get('related', [])
         rank_position = serp_result.get('rank_position')
         organic_results = serp_result.get('organic_results', [])
@@ -14478,9 +15002,9 @@ def fetch_keywords():
         if ai_rank_position:
             print(f"[Keywords] AI Overview position: #{ai_rank_position}")
         
-        # 3. Save rank to history if we have position and page_path
+        # 3. Save rank to history if we have position and page_path (dated by when the SERP was fetched)
         if page_path and rank_position is not None:
-            save_rank_to_history(page_path, keyword, rank_position, page_url)
+            save_rank_to_history(page_path, keyword, rank_position, page_url, serp_result.get('checked_at'))
         
         # 4. Combine and deduplicate (basic)
         all_keywords = []
@@ -14538,46 +15062,43 @@ def fetch_keywords_background(job_id, keyword, page_url, page_path, token):
         autocomplete = []
         serp_result = {}
         
-        # Run autocomplete and SERP in parallel, but update as soon as autocomplete is ready
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            with keywords_jobs_lock:
-                keywords_jobs[job_id]['message'] = 'מביא השלמות אוטומטיות...'
-            
-            autocomplete_future = executor.submit(get_autocomplete_suggestions, keyword, token)
-            serp_future = executor.submit(get_serp_related_searches, keyword, token, page_url, update_serp_status)
-            
-            # Wait for autocomplete first (usually fast)
-            try:
-                autocomplete = autocomplete_future.result(timeout=30)
-                print(f"[Keywords Async] Job {job_id}: Autocomplete ready: {len(autocomplete)} keywords")
-                
-                # Store partial results immediately
-                with keywords_jobs_lock:
-                    keywords_jobs[job_id]['status'] = 'partial'
-                    keywords_jobs[job_id]['progress'] = 35
-                    keywords_jobs[job_id]['message'] = f'נמצאו {len(autocomplete)} השלמות, ממתין לתוצאות SERP...'
-                    keywords_jobs[job_id]['partial_result'] = {
-                        "success": True,
-                        "keyword": keyword,
-                        "autocomplete": autocomplete,
-                        "related": [],
-                        "combined": autocomplete,
-                        "rank_position": None,
-                        "organic_results": [],
-                        "ai_mode_results": [],
-                        "ai_rank_position": None,
-                        "competitor_data": []
-                    }
-            except Exception as e:
-                print(f"[Keywords Async] Job {job_id}: Autocomplete error: {e}")
-                autocomplete = []
+        # Start the SERP run first (cache or shared scheduler thread), then fetch autocomplete meanwhile
+        serp_future = submit_serp_items(keyword, token, update_serp_status, allow_stale=not page_path)
+        
+        with keywords_jobs_lock:
+            keywords_jobs[job_id]['message'] = 'מביא השלמות אוטומטיות...'
+        
+        try:
+            autocomplete = get_autocomplete_suggestions(keyword, token)
+            print(f"[Keywords Async] Job {job_id}: Autocomplete ready: {len(autocomplete)} keywords")
             
-            # Now wait for SERP (slow)
-            try:
-                serp_result = serp_future.result(timeout=180)
-            except Exception as e:
-                print(f"[Keywords Async] Job {job_id}: SERP error: {e}")
-                serp_result = {}
+            # Store partial results immediately
+            with keywords_jobs_lock:
+                keywords_jobs[job_id]['status'] = 'partial'
+                keywords_jobs[job_id]['progress'] = 35
+                keywords_jobs[job_id]['message'] = f'נמצאו {len(autocomplete)} השלמות, ממתין לתוצאות SERP...'
+                keywords_jobs[job_id]['partial_result'] = {
+                    "success": True,
+                    "keyword": keyword,
+                    "autocomplete": autocomplete,
+                    "related": [],
+                    "combined": autocomplete,
+                    "rank_position": None,
+                    "organic_results": [],
+                    "ai_mode_results": [],
+                    "ai_rank_position": None,
+                    "competitor_data": []
+                }
+        except Exception as e:
+            print(f"[Keywords Async] Job {job_id}: Autocomplete error: {e}")
+            autocomplete = []
+        
+        # Now wait for SERP (slow)
+        try:
+            serp_result = parse_serp_results(keyword, serp_future.result(timeout=240), page_url)
+        except Exception as e:
+            print(f"[Keywords Async] Job {job_id}: SERP error: {e}")
+            serp_result = {}
         
         print(f"[Keywords Async] Job {job_id}: All fetches completed")
         
@@ -14593,9 +15114,9 @@ def fetch_keywords_background(job_id, keyword, page_url, page_path, token):
             keywords_jobs[job_id]['progress'] = 85
             keywords_jobs[job_id]['message'] = 'מעבד תוצאות...'
         
-        # Save rank to history if we have position and page_path
+        # Save rank to history if we have position and page_path (dated by when the SERP was fetched)
         if page_path and rank_position is not None:
-            save_rank_to_history(page_path, keyword, rank_position, page_url)
+            save_rank_to_history(page_path, keyword, rank_position, page_url, serp_checked_at(serp_future))
         
         # Combine and deduplicate
         all_keywords = []
@@ -14822,116 +15343,19 @@ def process_keywords():
                 }
             })
         
-        # Hebrew plural/singular suffixes
-        plural_suffixes = ['ות', 'ים', 'יות', 'אות']
-        
-        # Semantic synonym groups (common Hebrew variations)
-        synonym_groups = [
-            ['מיידית', 'מיידי', 'מהירה', 'מהיר', 'בזק', 'דחופה', 'דחוף', 'מידית'],
-            ['זולה', 'זול', 'זולות', 'זולים', 'במחיר נמוך', 'משתלמת'],
-            ['טובה', 'טוב', 'טובות', 'טובים', 'איכותית', 'מומלצת'],
-            ['קלה', 'קל', 'פשוטה', 'פשוט', 'נוחה', 'נוח'],
-            ['ללא', 'בלי', 'אין'],
-            ['עם', 'כולל'],
-        ]
-        
-        def get_base_form(word):
-            """Remove common Hebrew plural suffixes"""
-            for suffix in plural_suffixes:
-                if word.endswith(suffix) and len(word) > len(suffix) + 2:
-                    return word[:-len(suffix)]
-            return word
-        
-        def find_synonym_group(word):
-            """Find which synonym group a word belongs to"""
-            word_lower = word.lower()
-            for i, group in enumerate(synonym_groups):
-                if word_lower in [s.lower() for s in group]:
-                    return i
-            return None
-        
-        def extract_keywords_from_phrase(phrase, main_kw):
-            """Extract the unique part from a keyphrase (removing main keyword)"""
-            main_words = set(main_kw.lower().split())
-            phrase_words = phrase.lower().split()
-            unique_words = [w for w in phrase_words if w not in main_words]
-            return ' '.join(unique_words)
-        
-        # Process keywords
-        clusters = []
-        processed = set()
-        unique_topics = []
-        
-        for kw_item in keywords_with_source:
-            kw = kw_item['keyword']
-            source = kw_item['source']
-            kw_stripped = kw.strip()
-            if not kw_stripped or kw_stripped.lower() in processed:
-                continue
-            
-            # Extract unique part (without main keyword)
-            unique_part = extract_keywords_from_phrase(kw_stripped, main_keyword)
-            
-            # Check if it's a plural variant of something we've seen
-            base_form = get_base_form(unique_part)
-            
-            # Check if semantically similar to existing cluster
-            found_cluster = False
-            for cluster in clusters:
-                cluster_base = get_base_form(cluster['primary'])
-                
-                # Check plural/singular match
-                if base_form == cluster_base or unique_part == cluster_base:
-                    cluster['variants'].append(kw_stripped)
-                    cluster['type'] = 'plural'
-                    found_cluster = True
-                    break
-                
-                # Check synonym match
-                kw_synonym_group = find_synonym_group(unique_part)
-                cluster_synonym_group = find_synonym_group(cluster['primary'])
-                if kw_synonym_group is not None and kw_synonym_group == cluster_synonym_group:
-                    cluster['variants'].append(kw_stripped)
-                    cluster['type'] = 'semantic'
-                    found_cluster = True
-                    break
-            
-            if not found_cluster:
-                # New cluster - include source
-                clusters.append({
-                    'primary': kw_stripped,
-                    'variants': [],
-                    'type': 'unique',
-                    'unique_part': unique_part,
-                    'source': source  # Track if from autocomplete or related
-                })
-                if unique_part:
-                    unique_topics.append(unique_part)
-            
-            processed.add(kw_stripped.lower())
-        
-        # Build final keyword list (primaries only)
-        final_keywords = [c['primary'] for c in clusters]
-        
-        # Count by source
-        autocomplete_count = len([c for c in clusters if c.get('source') == 'autocomplete'])
-        related_count = len([c for c in clusters if c.get('source') == 'related'])
+        # Normalize/stem once per word, char n-gram TF-IDF in one batch, sparse similarity graph
+        from keyword_clustering import cluster_keywords
+        result = cluster_keywords(keywords_with_source, main_keyword)
+        stats = result['stats']
         
-        print(f"[Keywords Process] Input: {len(keywords_with_source)}, Output: {len(final_keywords)} clusters ({autocomplete_count} autocomplete, {related_count} related)")
+        print(f"[Keywords Process] Input: {stats['input_count']}, Output: {stats['output_count']} clusters ({stats['from_autocomplete']} autocomplete, {stats['from_related']} related)")
         
         return jsonify({
             "success": True,
-            "clusters": clusters,
-            "final_keywords": final_keywords,
-            "unique_topics": unique_topics,
-            "stats": {
-                "input_count": len(keywords_with_source),
-                "output_count": len(final_keywords),
-                "plural_merged": len([c for c in clusters if c['type'] == 'plural']),
-                "semantic_merged": len([c for c in clusters if c['type'] == 'semantic']),
-                "from_autocomplete": autocomplete_count,
-                "from_related": related_count
-            }
+            "clusters": result['clusters'],
+            "final_keywords": result['final_keywords'],
+            "unique_topics": result['unique_topics'],
+            "stats": stats
         })
         
     except Exception as e:
@@ -16290,49 +16714,160 @@ def save_duplicate_settings():
     return jsonify({'success': True})
 
 
-@app.route('/api/duplicates/scan', methods=['POST'])
-def scan_duplicates():
-    """
-    Scan for duplicate content - supports multiple directories
-    """
-    if not DUPLICATE_DETECTOR_AVAILABLE:
-        return jsonify({'success': False, 'error': 'Duplicate detector module not available'}), 500
-    
-    data = request.json
+# Duplicate scan jobs - {job_id: {status, progress, message, stage, report, error, started_at, params}}
+duplicate_scan_jobs = {}
+duplicate_scan_jobs_lock = threading.Lock()
+
+
+def run_duplicate_scan(data, progress_callback=None):
+    """Run a duplicate scan (single or cross-directory) and cache the report"""
     directories = data.get('directories', ['main'])
     threshold = data.get('threshold', 0.5)
     include_meta = data.get('include_meta', True)
     include_headings = data.get('include_headings', True)
     cross_directory = data.get('cross_directory', False)
     
-    try:
-        if cross_directory:
-            # Cross-directory scan - check duplicates between directories
-            report = duplicate_detector.scan_cross_directories(
-                directories, threshold, include_meta, include_headings
+    if cross_directory:
+        # Cross-directory scan - check duplicates between directories
+        report = duplicate_detector.scan_cross_directories(
+            directories, threshold, include_meta, include_headings,
+            progress_callback=progress_callback
+        )
+    else:
+        # Scan each directory separately, then merge
+        reports = {}
+        for position, dir_name in enumerate(directories):
+            def directory_progress(progress, position=position, dir_name=dir_name):
+                if progress_callback:
+                    share = 100.0 / len(directories)
+                    progress_callback(dict(
+                        progress,
+                        percent=round(position * share + progress['percent'] * share / 100, 1),
+                        message=f"{dir_name}: {progress['message']}"
+                    ))
+            
+            reports[dir_name] = duplicate_detector.generate_duplicate_report(
+                f"דפים לשינוי/{dir_name}",
+                threshold, include_meta, include_headings,
+                progress_callback=directory_progress
             )
-        else:
-            # Scan each directory separately, then merge
-            reports = {}
-            for dir_name in directories:
-                reports[dir_name] = duplicate_detector.generate_duplicate_report(
-                    f"דפים לשינוי/{dir_name}",
-                    threshold, include_meta, include_headings
-                )
-            report = duplicate_detector.merge_reports(reports)
+        report = duplicate_detector.merge_reports(reports)
+    
+    # Cache the report
+    cache_file = BASE_DIR / "cache" / "duplicates_report_latest.json"
+    cache_file.parent.mkdir(exist_ok=True)
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    
+    return report
+
+
+def duplicate_scan_background(job_id, data):
+    """Background thread for async duplicate scan"""
+    def on_progress(progress):
+        with duplicate_scan_jobs_lock:
+            job = duplicate_scan_jobs.get(job_id)
+            if job:
+                job['progress'] = progress.get('percent', 0)
+                job['message'] = progress.get('message', '')
+                job['stage'] = progress.get('stage')
+    
+    try:
+        with duplicate_scan_jobs_lock:
+            duplicate_scan_jobs[job_id]['status'] = 'running'
+        
+        report = run_duplicate_scan(data, on_progress)
         
-        # Cache the report
-        cache_file = BASE_DIR / "cache" / "duplicates_report_latest.json"
-        cache_file.parent.mkdir(exist_ok=True)
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+        with duplicate_scan_jobs_lock:
+            duplicate_scan_jobs[job_id]['status'] = 'completed'
+            duplicate_scan_jobs[job_id]['progress'] = 100
+            duplicate_scan_jobs[job_id]['message'] = 'Scan complete'
+            duplicate_scan_jobs[job_id]['report'] = report
         
-        return jsonify({'success': True, 'report': report})
+        print(f"[Duplicates] Scan job {job_id}: completed ({report.get('total_pages', 0)} pages)")
         
     except Exception as e:
+        print(f"[Duplicates] Scan job {job_id}: Error - {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({'success': False, 'error': str(e)}), 500
+        
+        with duplicate_scan_jobs_lock:
+            duplicate_scan_jobs[job_id]['status'] = 'failed'
+            duplicate_scan_jobs[job_id]['message'] = f'Error: {str(e)}'
+            duplicate_scan_jobs[job_id]['error'] = str(e)
+
+
+@app.route('/api/duplicates/scan', methods=['POST'])
+def scan_duplicates():
+    """
+    Scan for duplicate content - supports multiple directories
+    Runs as a background job (poll /api/duplicates/scan/<job_id>); "async": false waits for the report
+    """
+    if not DUPLICATE_DETECTOR_AVAILABLE:
+        return jsonify({'success': False, 'error': 'Duplicate detector module not available'}), 500
+    
+    data = request.json or {}
+    
+    if data.get('async', True) is False:
+        try:
+            return jsonify({'success': True, 'report': run_duplicate_scan(data)})
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    params = {key: data.get(key) for key in ('directories', 'threshold', 'include_meta', 'include_headings', 'cross_directory')}
+    
+    with duplicate_scan_jobs_lock:
+        # Same scan already running - attach to it instead of parsing every page twice
+        for jid, job in duplicate_scan_jobs.items():
+            if job['params'] == params and job['status'] in ['pending', 'running']:
+                return jsonify({'success': True, 'job_id': jid, 'status': job['status']})
+        
+        job_id = str(uuid.uuid4())
+        duplicate_scan_jobs[job_id] = {
+            'status': 'pending',
+            'progress': 0,
+            'stage': None,
+            'message': 'Starting scan...',
+            'started_at': datetime.now().isoformat(),
+            'params': params,
+            'report': None,
+            'error': None
+        }
+    
+    thread = threading.Thread(target=duplicate_scan_background, args=(job_id, data), daemon=True)
+    thread.start()
+    
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'pending'})
+
+
+@app.route('/api/duplicates/scan/<job_id>', methods=['GET'])
+def get_duplicate_scan_status(job_id):
+    """Get status (and the report, once completed) of an async duplicate scan"""
+    now = datetime.now()
+    with duplicate_scan_jobs_lock:
+        # Clean up finished jobs older than 10 minutes
+        for jid in [
+            jid for jid, job in duplicate_scan_jobs.items()
+            if job['status'] in ['completed', 'failed']
+            and (now - datetime.fromisoformat(job['started_at'])).total_seconds() > 600
+        ]:
+            del duplicate_scan_jobs[jid]
+        
+        job = duplicate_scan_jobs.get(job_id)
+        if not job:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'status': job['status'],
+            'progress': job['progress'],
+            'stage': job['stage'],
+            'message': job['message'],
+            'report': job['report'] if job['status'] == 'completed' else None,
+            'error': job['error']
+        })
 
 
 @app.route('/api/duplicates/report', methods=['GET'])
@@ -16371,25 +16906,47 @@ def compare_two_pages():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/duplicates/check-page', methods=['POST'])
+def check_page_duplicates():
+    """Check one edited page against its directory (incremental index - only this page is re-scored)"""
+    if not DUPLICATE_DETECTOR_AVAILABLE:
+        return jsonify({'success': False, 'error': 'Duplicate detector not available'}), 500
+
+    data = request.json
+    page_path = data.get('path')
+
+    if not page_path:
+        return jsonify({'success': False, 'error': 'Missing page path'}), 400
+
+    try:
+        result = duplicate_detector.check_page_duplicates(
+            page_path,
+            data.get('threshold', 0.5),
+            data.get('include_meta', True),
+            data.get('include_headings', True)
+        )
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/duplicates/ignore', methods=['GET'])
 def get_ignore_list():
     """Get list of ignore patterns"""
-    ignore_file = BASE_DIR / "ignore_patterns.json"
-    
-    if ignore_file.exists():
-        try:
-            with open(ignore_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return jsonify({'success': True, 'patterns': data.get('patterns', [])})
-        except:
-            pass
+    if not DUPLICATE_DETECTOR_AVAILABLE:
+        return jsonify({'success': False, 'error': 'Duplicate detector not available'}), 500
     
-    return jsonify({'success': True, 'patterns': []})
+    # Served from the detector's cached rules - re-read only when the file changes
+    data = duplicate_detector.load_ignore_patterns()
+    return jsonify({'success': True, 'patterns': data.get('patterns', [])})
 
 
 @app.route('/api/duplicates/ignore', methods=['POST'])
 def add_to_ignore_list():
     """Add pattern to ignore list"""
+    if not DUPLICATE_DETECTOR_AVAILABLE:
+        return jsonify({'success': False, 'error': 'Duplicate detector not available'}), 500
+    
     data = request.json
     pattern = data.get('pattern')
     pattern_type = data.get('type', 'exact')
@@ -16398,17 +16955,17 @@ def add_to_ignore_list():
     if not pattern:
         return jsonify({'success': False, 'error': 'Missing pattern'}), 400
     
-    ignore_file = BASE_DIR / "ignore_patterns.json"
+    if pattern_type == 'regex':
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            return jsonify({'success': False, 'error': f'Invalid regex: {e}'}), 400
     
     # Load existing
-    if ignore_file.exists():
-        with open(ignore_file, 'r', encoding='utf-8') as f:
-            file_data = json.load(f)
-    else:
-        file_data = {'patterns': [], 'html_classes_to_ignore': [], 'html_ids_to_ignore': []}
+    file_data = duplicate_detector.load_ignore_patterns()
     
     # Add new pattern
-    file_data['patterns'].append({
+    file_data.setdefault('patterns', []).append({
         'id': str(int(time.time() * 1000)),
         'text': pattern,
         'type': pattern_type,
@@ -16416,9 +16973,8 @@ def add_to_ignore_list():
         'added_at': datetime.now().isoformat()
     })
     
-    # Save
-    with open(ignore_file, 'w', encoding='utf-8') as f:
-        json.dump(file_data, f, ensure_ascii=False, indent=2)
+    # Save (the scanner recompiles its rules on the next page)
+    duplicate_detector.save_ignore_patterns(file_data)
     
     return jsonify({'success': True})
 
@@ -16426,16 +16982,16 @@ def add_to_ignore_list():
 @app.route('/api/duplicates/ignore/<pattern_id>', methods=['DELETE'])
 def delete_ignore_pattern(pattern_id):
     """Delete an ignore pattern"""
-    ignore_file = BASE_DIR / "ignore_patterns.json"
+    if not DUPLICATE_DETECTOR_AVAILABLE:
+        return jsonify({'success': False, 'error': 'Duplicate detector not available'}), 500
     
-    if ignore_file.exists():
-        with open(ignore_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        data['patterns'] = [p for p in data.get('patterns', []) if p.get('id') != pattern_id]
-        
-        with open(ignore_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    data = duplicate_detector.load_ignore_patterns()
+    patterns = data.get('patterns', [])
+    remaining = [p for p in patterns if p.get('id') != pattern_id]
+    
+    if len(remaining) != len(patterns):
+        data['patterns'] = remaining
+        duplicate_detector.save_ignore_patterns(data)
     
     return jsonify({'success': True})
 
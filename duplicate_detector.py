@@ -5,18 +5,29 @@ Duplicate Content Detector
 """
 
 import os
+import sys
 import json
 import re
+import time
+import zlib
+import random
+import hashlib
+import threading
+from itertools import combinations
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional, Set
 from collections import defaultdict
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from bs4 import BeautifulSoup
 
 try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
     from sklearn.metrics.pairwise import cosine_similarity
+    from sklearn.preprocessing import normalize
+    from scipy import sparse
     import numpy as np
     SKLEARN_AVAILABLE = True
 except ImportError:
@@ -43,39 +54,163 @@ SEO_THRESHOLDS = {
     'medium': 0.50
 }
 
+# MinHash + LSH candidate generation
+# 64 bands x 2 rows: a pair with word-bigram Jaccard 0.3 becomes a candidate with
+# probability 1-(1-0.3^2)^64 > 99.7%. Pairs above cosine 0.5 sit at Jaccard ~0.38+
+SHINGLE_SIZE = 2
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 64
+_TOKEN_PATTERN = re.compile(r'\w\w+')
+_TOKEN_HASH_CACHE_SIZE = 500000
+
+# Below this many pages the exact blocked sparse product is faster than LSH
+LSH_MIN_PAGES = 5000
+
+# Blocked similarity: each block of rows x all pages is at most this many cells (~64MB of float64)
+SIMILARITY_BLOCK_CELLS = 8000000
+
+# Incremental duplicate index (cache/duplicate_index/<scope>.npz - metadata + counts in one file)
+INDEX_DIR = CACHE_DIR / "duplicate_index"
+INDEX_VERSION = 1
+# Neighbours at or above this similarity are stored; lower thresholds are recomputed from stored vectors
+INDEX_MIN_SIMILARITY = 0.3
+# When more than this share of pages changed, all neighbours are recomputed (also refreshes IDF drift)
+INDEX_FULL_REBUILD_RATIO = 0.2
+# Hash space large enough that n-gram collisions are negligible (~0.1% at millions of n-grams);
+# columns are compacted to the features actually present before any matrix product
+HASHING_FEATURES = 2 ** 31 - 1
+# Same document-frequency cut-off as the TfidfVectorizer used for full scans
+TFIDF_MAX_DF = 0.95
+
+# Parallel extraction: HTML parsing runs in a process pool (0 = always in-process).
+# Small batches stay in-process - pool dispatch costs more than parsing a few pages
+EXTRACTION_WORKERS = min(8, os.cpu_count() or 1)
+EXTRACTION_PARALLEL_MIN_PAGES = 24
+# Extracted parts kept in memory per file (invalidated by file / ignore-pattern mtime)
+EXTRACTION_CACHE_SIZE = 20000
+
+# Snippet matching (winnowing): k-gram length in characters; the window is chosen from
+# min_length so every shared passage of min_length+ characters shares a fingerprint
+SNIPPET_KGRAM = 20
+SNIPPET_CACHE_SIZE = 512
+_KGRAM_BASE = np.uint64(1000003) if SKLEARN_AVAILABLE else None
+
 
 # ============ Utility Functions ============
 
-def load_ignore_patterns() -> Dict:
-    """Load ignore patterns from JSON file"""
-    if IGNORE_PATTERNS_FILE.exists():
-        try:
-            with open(IGNORE_PATTERNS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"[Error] Loading ignore patterns: {e}")
-    return {'patterns': [], 'html_classes_to_ignore': [], 'html_ids_to_ignore': []}
-
-
-def should_ignore_text(text: str, patterns: List[Dict]) -> bool:
-    """Check if text should be ignored based on patterns"""
-    for pattern in patterns:
-        pattern_type = pattern.get('type', 'exact')
-        pattern_text = pattern.get('text', '')
-        
-        if pattern_type == 'exact':
-            if pattern_text == text.strip():
-                return True
-        elif pattern_type == 'contains':
-            if pattern_text in text:
-                return True
-        elif pattern_type == 'regex':
+_EMPTY_IGNORE_DATA = {'patterns': [], 'html_classes_to_ignore': [], 'html_ids_to_ignore': []}
+# Regex rules with back-references can't be merged into one alternation (group numbers shift)
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+class IgnoreRules:
+    """
+    Compiled ignore rules - exact texts in a set, contains + regex rules merged into one
+    alternation, so a check is one set lookup + one regex search regardless of rule count
+    """
+    
+    def __init__(self, data: Dict):
+        self.data = data
+        patterns = data.get('patterns', [])
+        self.ignore_classes = set(data.get('html_classes_to_ignore', []))
+        self.ignore_ids = set(data.get('html_ids_to_ignore', []))
+        
+        self.exact = {p.get('text', '') for p in patterns if p.get('type', 'exact') == 'exact'}
+        contains = [re.escape(p['text']) for p in patterns if p.get('type') == 'contains' and p.get('text')]
+        
+        regexes, self.separate_regexes = [], []
+        for pattern in patterns:
+            if pattern.get('type') != 'regex':
+                continue
             try:
-                if re.search(pattern_text, text):
-                    return True
+                compiled = re.compile(pattern.get('text', ''))
             except re.error:
-                pass
-    return False
+                continue  # invalid rules were always skipped
+            if _BACKREFERENCE.search(compiled.pattern):
+                self.separate_regexes.append(compiled)
+            else:
+                regexes.append(compiled.pattern)
+        
+        self.contains_matcher = re.compile('|'.join(contains)) if contains else None
+        self.matcher = self._compile_alternation(contains + regexes)
+    
+    def _compile_alternation(self, parts: List[str]):
+        if not parts:
+            return None
+        try:
+            return re.compile('|'.join(f'(?:{part})' for part in parts))
+        except re.error:
+            # e.g. a rule with inline global flags - fall back to one compiled regex per rule
+            self.separate_regexes.extend(re.compile(part) for part in parts)
+            return None
+    
+    def matches(self, text: str) -> bool:
+        """Same semantics as the per-rule checks: exact (stripped), contains, regex search"""
+        if text.strip() in self.exact:
+            return True
+        if self.matcher is not None and self.matcher.search(text):
+            return True
+        return any(regex.search(text) for regex in self.separate_regexes)
+    
+    def filter_lines(self, text: str) -> str:
+        """Drop lines that contain any 'contains' rule"""
+        if self.contains_matcher is None:
+            return text
+        return '\n'.join(line for line in text.split('\n') if not self.contains_matcher.search(line))
+
+
+_ignore_rules: Optional[IgnoreRules] = None
+_ignore_rules_stamp = None
+_ignore_rules_lock = threading.Lock()
+
+
+def _ignore_file_stamp():
+    try:
+        stat = IGNORE_PATTERNS_FILE.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def get_ignore_rules() -> IgnoreRules:
+    """Compiled ignore rules, reloaded only when ignore_patterns.json changes"""
+    global _ignore_rules, _ignore_rules_stamp
+    stamp = _ignore_file_stamp()
+    with _ignore_rules_lock:
+        if _ignore_rules is None or stamp != _ignore_rules_stamp:
+            data = dict(_EMPTY_IGNORE_DATA)
+            if stamp is not None:
+                try:
+                    with open(IGNORE_PATTERNS_FILE, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except Exception as e:
+                    print(f"[Error] Loading ignore patterns: {e}")
+            _ignore_rules = IgnoreRules(data)
+            _ignore_rules_stamp = stamp
+        return _ignore_rules
+
+
+def load_ignore_patterns() -> Dict:
+    """Load ignore patterns from JSON file (copy - safe to modify and save back)"""
+    return json.loads(json.dumps(get_ignore_rules().data))
+
+
+def save_ignore_patterns(data: Dict):
+    """Write ignore patterns atomically; the compiled rules pick up the change by mtime"""
+    tmp_path = IGNORE_PATTERNS_FILE.with_name(IGNORE_PATTERNS_FILE.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, IGNORE_PATTERNS_FILE)
+    
+    global _ignore_rules
+    with _ignore_rules_lock:
+        _ignore_rules = None  # mtime granularity may hide a same-second rewrite
+
+
+def should_ignore_text(text: str, patterns: Optional[List[Dict]] = None) -> bool:
+    """Check if text should be ignored based on patterns (default: the cached compiled rules)"""
+    rules = get_ignore_rules() if patterns is None else IgnoreRules({'patterns': patterns})
+    return rules.matches(text)
 
 
 def normalize_text(text: str) -> str:
@@ -104,11 +239,10 @@ def extract_content_parts(html_path: Path, page_info_path: Optional[Path] = None
         'url': ''
     }
     
-    # Load ignore patterns
-    ignore_data = load_ignore_patterns()
-    ignore_patterns = ignore_data.get('patterns', [])
-    ignore_classes = set(ignore_data.get('html_classes_to_ignore', []))
-    ignore_ids = set(ignore_data.get('html_ids_to_ignore', []))
+    # Compiled ignore rules (cached until ignore_patterns.json changes)
+    ignore_rules = get_ignore_rules()
+    ignore_classes = ignore_rules.ignore_classes
+    ignore_ids = ignore_rules.ignore_ids
     
     try:
         with open(html_path, 'r', encoding='utf-8-sig') as f:
@@ -134,21 +268,15 @@ def extract_content_parts(html_path: Path, page_info_path: Optional[Path] = None
         headings = []
         for h in soup.find_all(level):
             heading_text = h.get_text(strip=True)
-            if heading_text and not should_ignore_text(heading_text, ignore_patterns):
+            if heading_text and not ignore_rules.matches(heading_text):
                 headings.append(heading_text)
         content_parts['headings'][level] = headings
     
-    # Extract body text
-    body_text = soup.get_text(separator=' ', strip=True)
+    # Extract body text (one line per text node - normalize_text joins them with spaces)
+    body_text = soup.get_text(separator='\n', strip=True)
     
-    # Filter out ignored patterns from body
-    for pattern in ignore_patterns:
-        pattern_text = pattern.get('text', '')
-        if pattern.get('type') == 'contains' and pattern_text:
-            # Remove lines containing the pattern
-            lines = body_text.split('\n')
-            lines = [line for line in lines if pattern_text not in line]
-            body_text = '\n'.join(lines)
+    # Filter out ignored patterns from body: remove lines containing a 'contains' pattern
+    body_text = ignore_rules.filter_lines(body_text)
     
     content_parts['body_text'] = normalize_text(body_text)
     
@@ -193,79 +321,975 @@ def get_page_files(directory: Path) -> List[Tuple[Path, Path]]:
     return pages
 
 
+_extraction_cache: Dict[str, Tuple[tuple, Dict]] = {}
+_extraction_cache_lock = threading.Lock()
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
+
+
+def _report_progress(progress_callback, stage: str, done: int, total: int, start: float, end: float, message: str):
+    """Progress dict in the weekly scanner's format (percent + message) plus stage counters"""
+    if progress_callback:
+        percent = start + (end - start) * (done / total if total else 1.0)
+        progress_callback({'stage': stage, 'done': done, 'total': total, 'percent': round(percent, 1), 'message': message})
+
+
+def _extraction_stamp(html_path: Path, info_path: Optional[Path]) -> tuple:
+    def mtime(path):
+        try:
+            return path.stat().st_mtime_ns if path else None
+        except OSError:
+            return None
+    return (mtime(html_path), mtime(info_path), _ignore_file_stamp())
+
+
+def _extract_worker(batch: List[Tuple[str, Optional[str]]]) -> List[Dict]:
+    """Process-pool entry point: a batch of (html, page_info) paths as strings - cheap to pickle"""
+    return [extract_content_parts(Path(html), Path(info) if info else None) for html, info in batch]
+
+
+def _get_extraction_pool():
+    """
+    Persistent process pool, started on first use
+    (on Windows each worker imports the main module once, so the pool is reused across scans)
+    """
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            _extraction_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+        return _extraction_pool
+
+
+def _reset_extraction_pool():
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is not None:
+            _extraction_pool.shutdown(wait=False, cancel_futures=True)
+        _extraction_pool = None
+
+
+def extract_pages(
+    page_files: List[Tuple[Path, Optional[Path]]],
+    progress_callback=None,
+    progress_range: Tuple[float, float] = (0, 70)
+) -> List[Dict]:
+    """
+    Extract content parts for many pages (same order as page_files)
+    Unchanged files come from the per-file cache; the rest are parsed in the process pool
+    """
+    results: List[Optional[Dict]] = [None] * len(page_files)
+    stamps = [_extraction_stamp(html, info) for html, info in page_files]
+    
+    missing = []
+    with _extraction_cache_lock:
+        for i, (html_path, _) in enumerate(page_files):
+            cached = _extraction_cache.get(str(html_path))
+            if cached and cached[0] == stamps[i]:
+                results[i] = cached[1]
+            else:
+                missing.append(i)
+    
+    total, done = len(page_files), len(page_files) - len(missing)
+    _report_progress(progress_callback, 'extract', done, total, *progress_range, f'Extracting content ({done}/{total})')
+    
+    def store(i, parts):
+        results[i] = parts
+        with _extraction_cache_lock:
+            if len(_extraction_cache) >= EXTRACTION_CACHE_SIZE:
+                # Drop the oldest entries (dicts keep insertion order)
+                for key in list(_extraction_cache)[:EXTRACTION_CACHE_SIZE // 10]:
+                    del _extraction_cache[key]
+            _extraction_cache[str(page_files[i][0])] = (stamps[i], parts)
+    
+    if EXTRACTION_WORKERS > 1 and len(missing) >= EXTRACTION_PARALLEL_MIN_PAGES:
+        try:
+            pool = _get_extraction_pool()
+            # Batches of pages per task: fewer round-trips, still enough tasks to balance workers
+            batch_size = max(1, min(32, len(missing) // (EXTRACTION_WORKERS * 4)))
+            futures = {}
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                paths = [(str(page_files[i][0]), str(page_files[i][1]) if page_files[i][1] else None) for i in batch]
+                futures[pool.submit(_extract_worker, paths)] = batch
+            for future in as_completed(futures):
+                for i, parts in zip(futures[future], future.result()):
+                    store(i, parts)
+                done += len(futures[future])
+                _report_progress(progress_callback, 'extract', done, total, *progress_range, f'Extracting content ({done}/{total})')
+            missing = []
+        except Exception as e:
+            # Broken pool (worker killed, spawn failure) - finish in-process
+            print(f"[Duplicates] Extraction pool failed ({e}) - continuing in-process")
+            _reset_extraction_pool()
+            missing = [i for i in missing if results[i] is None]
+    
+    for i in missing:
+        store(i, extract_content_parts(*page_files[i]))
+        done += 1
+        if done % 20 == 0 or done == total:
+            _report_progress(progress_callback, 'extract', done, total, *progress_range, f'Extracting content ({done}/{total})')
+    
+    # Shallow copies - callers add 'path' / 'folder' keys
+    return [dict(parts) for parts in results]
+
+
 # ============ Similarity Calculation ============
 
-def calculate_text_similarity(texts: List[str]) -> np.ndarray:
+def sparse_similarity(
+    tfidf_matrix,
+    threshold: float = 0.0,
+    top_k: Optional[int] = None,
+    block_size: Optional[int] = None
+):
     """
-    Calculate similarity matrix using TF-IDF + Cosine Similarity
+    Cosine similarity between all rows, computed in row blocks and kept sparse
+    Only pairs >= threshold (and, if top_k is set, each row's k best) are stored;
+    self-similarity is excluded. Memory is bounded by one block, never n x n.
     """
-    if not SKLEARN_AVAILABLE:
-        return np.zeros((len(texts), len(texts)))
+    num_rows = tfidf_matrix.shape[0]
+    if block_size is None:
+        block_size = max(1, min(1024, SIMILARITY_BLOCK_CELLS // max(num_rows, 1)))
+    
+    transposed = tfidf_matrix.T.tocsc()
+    rows, cols, values = [], [], []
+    
+    for start in range(0, num_rows, block_size):
+        block = (tfidf_matrix[start:start + block_size] @ transposed).toarray()
+        block_rows = np.arange(block.shape[0])
+        block[block_rows, block_rows + start] = 0.0
+        
+        if top_k is not None and top_k < num_rows:
+            best = np.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+            best_values = np.take_along_axis(block, best, axis=1)
+            keep = (best_values >= threshold) & (best_values > 0)
+            row_idx = np.broadcast_to(block_rows[:, None], best.shape)[keep]
+            col_idx, vals = best[keep], best_values[keep]
+        else:
+            row_idx, col_idx = np.nonzero((block >= threshold) & (block > 0))
+            vals = block[row_idx, col_idx]
+        
+        rows.append(row_idx + start)
+        cols.append(col_idx)
+        values.append(vals)
+    
+    if not rows:
+        return sparse.csr_matrix((num_rows, num_rows))
+    
+    return sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(num_rows, num_rows)
+    )
+
+
+def calculate_text_similarity(texts: List[str], threshold: float = 0.0, top_k: Optional[int] = None):
+    """
+    Calculate similarity using TF-IDF + Cosine Similarity
+    Returns a sparse n x n matrix holding only pairs >= threshold (or each page's top_k)
+    """
+    num_texts = len(texts)
+    empty = sparse.csr_matrix((num_texts, num_texts)) if SKLEARN_AVAILABLE else None
+    
+    tfidf_matrix, valid_indices = build_tfidf_matrix(texts)
+    if tfidf_matrix is None:
+        return empty
+    
+    try:
+        similarity = sparse_similarity(tfidf_matrix, threshold, top_k).tocoo()
+        
+        # Map back to the full index space (empty texts have no row)
+        index_map = np.array(valid_indices)
+        return sparse.csr_matrix(
+            (similarity.data, (index_map[similarity.row], index_map[similarity.col])),
+            shape=(num_texts, num_texts)
+        )
+    
+    except Exception as e:
+        print(f"[Error] Calculating similarity: {e}")
+        return empty
+
+
+def _kgram_hashes(codes: np.ndarray, k: int) -> np.ndarray:
+    """Polynomial hash of every k-character window (uint64 wrap-around, k vector passes)"""
+    count = len(codes) - k + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(k):
+        hashes = hashes * _KGRAM_BASE + codes[offset:offset + count]
+    return hashes
+
+
+def _sliding_extreme(values: np.ndarray, window: int, func) -> np.ndarray:
+    """func (np.minimum / np.maximum) over every window of values - log2(window) vector passes"""
+    result, span = values, 1
+    while span * 2 <= window:
+        result = func(result[:-span], result[span:])
+        span *= 2
+    # Two overlapping power-of-two spans cover each window
+    return func(result[:len(values) - window + 1], result[window - span:])
+
+
+def winnow_fingerprints(text: str, k: int, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Winnowing fingerprints: the minimal k-gram hash of every window of k-grams
+    Returns: (hashes, positions) - positions are k-gram start offsets in text
+    """
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < k + window - 1:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+    
+    hashes = _kgram_hashes(codes, k)
+    window_min = _sliding_extreme(hashes, window, np.minimum)
+    # A k-gram is selected when it is the minimum of some window containing it, i.e. equals
+    # the largest window minimum over those windows (padded so edge k-grams see fewer windows)
+    padded = np.concatenate([np.zeros(window - 1, dtype=np.uint64), window_min, np.zeros(window - 1, dtype=np.uint64)])
+    positions = np.flatnonzero(_sliding_extreme(padded, window, np.maximum) == hashes)
+    return hashes[positions], positions
+
+
+@lru_cache(maxsize=SNIPPET_CACHE_SIZE)
+def _snippet_index(text: str, k: int, window: int) -> Tuple[np.ndarray, np.ndarray, str]:
+    """Fingerprints + reversed text per page text - a page takes part in many pairs of a report"""
+    hashes, positions = winnow_fingerprints(text, k, window)
+    return hashes, positions, text[::-1]
+
+
+def _common_run(text1: str, start1: int, text2: str, start2: int) -> int:
+    """Length of the common prefix of text1[start1:] and text2[start2:] (growing slice comparisons)"""
+    limit = min(len(text1) - start1, len(text2) - start2)
+    length, chunk = 0, 32
+    while length < limit:
+        size = min(chunk, limit - length)
+        if text1[start1 + length:start1 + length + size] == text2[start2 + length:start2 + length + size]:
+            length += size
+            chunk *= 2
+            continue
+        # Binary search for the first mismatch inside this chunk
+        low, high = 0, size
+        while high - low > 1:
+            middle = (low + high) // 2
+            if text1[start1 + length:start1 + length + middle] == text2[start2 + length:start2 + length + middle]:
+                low = middle
+            else:
+                high = middle
+        return length + low
+    return length
+
+
+def _is_word_break(text: str, pos: int) -> bool:
+    """True when offset pos does not fall inside a word"""
+    return pos <= 0 or pos >= len(text) or not (text[pos - 1].isalnum() and text[pos].isalnum())
+
+
+def _trim_to_words(text1: str, start1: int, end1: int, text2: str, start2: int) -> Tuple[int, int]:
+    """Shrink the shared passage text1[start1:end1] (= text2 at start2) so it doesn't cut a word in either text"""
+    shift = 0
+    while start1 + shift < end1 and not (_is_word_break(text1, start1 + shift) and _is_word_break(text2, start2 + shift)):
+        shift += 1
+    length = end1 - start1
+    while length > shift and not (_is_word_break(text1, start1 + length) and _is_word_break(text2, start2 + length)):
+        length -= 1
+    
+    passage = text1[start1 + shift:start1 + length]
+    stripped = passage.lstrip(' \t\n.,;:!?')
+    start = start1 + shift + len(passage) - len(stripped)
+    return start, start + len(stripped.rstrip())
+
+
+def find_duplicate_snippets(text1: str, text2: str, min_length: int = 100) -> List[Dict]:
+    """
+    Find common text passages (min_length+ characters) between two texts
+    Winnowing: fingerprints shared by both texts anchor candidate matches, which are
+    verified and extended to the full shared passage - time proportional to text length
+    """
+    if not SKLEARN_AVAILABLE or min(len(text1), len(text2)) < min_length:
+        return []
+    
+    k = min(SNIPPET_KGRAM, min_length)
+    window = min_length - k + 1
+    hashes1, positions1, reversed1 = _snippet_index(text1, k, window)
+    hashes2, positions2, reversed2 = _snippet_index(text2, k, window)
+    
+    shared2 = np.isin(hashes2, hashes1)
+    if not shared2.any():
+        return []
+    shared1 = np.isin(hashes1, hashes2[shared2])
+    positions_by_hash = defaultdict(list)
+    for h, pos in zip(hashes2[shared2].tolist(), positions2[shared2].tolist()):
+        positions_by_hash[h].append(pos)
+    
+    snippets = []
+    seen = set()
+    covered_until: Dict[int, int] = {}  # diagonal (pos1 - pos2) -> end of the last passage found on it
+    
+    for h, pos1 in zip(hashes1[shared1].tolist(), positions1[shared1].tolist()):
+        for pos2 in positions_by_hash[h]:
+            diagonal = pos1 - pos2
+            if pos1 < covered_until.get(diagonal, -1):
+                continue
+            if text1[pos1:pos1 + k] != text2[pos2:pos2 + k]:
+                continue  # hash collision
+            
+            # Extend to the full shared passage (backwards via the reversed texts)
+            back = _common_run(reversed1, len(text1) - pos1, reversed2, len(text2) - pos2)
+            end1 = pos1 + k + _common_run(text1, pos1 + k, text2, pos2 + k)
+            covered_until[diagonal] = end1
+            
+            start, end = _trim_to_words(text1, pos1 - back, end1, text2, pos2 - back)
+            passage = text1[start:end]
+            if len(passage) >= min_length and passage not in seen:
+                seen.add(passage)
+                snippets.append({
+                    'text': passage,
+                    'type': 'body',
+                    'length': len(passage)
+                })
+    
+    return snippets
+
+
+# ============ Near-Duplicate Candidates (MinHash + LSH) ============
+
+_minhash_params = None
+_token_hash_cache: Dict[str, int] = {}
+
+
+def _get_minhash_params():
+    """Fixed-seed multiply-shift hash family so signatures are stable across runs"""
+    global _minhash_params
+    if _minhash_params is None:
+        rng = np.random.RandomState(42)
+        _minhash_params = (
+            rng.randint(0, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1),
+            rng.randint(0, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+        )
+    return _minhash_params
+
+
+def _token_hash(token: str) -> int:
+    value = _token_hash_cache.get(token)
+    if value is None:
+        if len(_token_hash_cache) >= _TOKEN_HASH_CACHE_SIZE:
+            _token_hash_cache.clear()
+        value = _token_hash_cache[token] = zlib.crc32(token.encode('utf-8'))
+    return value
+
+
+def text_shingles(text: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    Hashed word k-shingles (same tokenization as the TF-IDF vectorizer)
+    Each token is hashed once; shingle hashes are combined vectorized
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
     
-    if len(texts) < 2:
-        return np.zeros((len(texts), len(texts)))
+    ids = np.fromiter(map(_token_hash, tokens), dtype=np.uint64, count=len(tokens))
     
-    # Filter empty texts
+    k = min(k, len(ids))
+    count = len(ids) - k + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(k):
+        shingles = (shingles * np.uint64(1000003)) ^ ids[offset:offset + count]
+    
+    return np.unique(shingles)
+
+
+def minhash_signature(shingles: np.ndarray, chunk_size: int = 4096) -> np.ndarray:
+    """
+    MinHash signature - min over shingles of each hash function (chunked to bound memory)
+    Multiply-shift hashing: (a*x + b) mod 2^64, top 32 bits - uint64 wraparound, no modulo
+    """
+    perm_a, perm_b = _get_minhash_params()
+    signature = np.full(MINHASH_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint64)
+    
+    with np.errstate(over='ignore'):
+        for start in range(0, len(shingles), chunk_size):
+            x = shingles[start:start + chunk_size]
+            hashed = (np.outer(perm_a, x) + perm_b[:, None]) >> np.uint64(32)
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+    
+    return signature.astype(np.uint32)
+
+
+def lsh_candidate_pairs(signatures: np.ndarray, bands: int = LSH_BANDS) -> Set[Tuple[int, int]]:
+    """
+    LSH banding - pages sharing any band bucket become candidate pairs
+    """
+    num_pages, num_perm = signatures.shape
+    rows = num_perm // bands
+    candidates = set()
+    
+    for band in range(bands):
+        band_values = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        buckets = defaultdict(list)
+        for idx in range(num_pages):
+            buckets[band_values[idx].tobytes()].append(idx)
+        for members in buckets.values():
+            if len(members) > 1:
+                candidates.update(combinations(members, 2))
+    
+    return candidates
+
+
+def verify_candidate_pairs(tfidf_matrix, pairs, threshold: float, batch_size: int = 20000) -> List[Tuple[int, int, float]]:
+    """
+    Exact TF-IDF cosine for candidate pairs only (rows are L2-normalized - cosine is a row dot product)
+    """
+    if not pairs:
+        return []
+    
+    pair_array = np.array(sorted(pairs), dtype=np.int64)
+    verified = []
+    
+    for start in range(0, len(pair_array), batch_size):
+        batch = pair_array[start:start + batch_size]
+        sims = np.asarray(
+            tfidf_matrix[batch[:, 0]].multiply(tfidf_matrix[batch[:, 1]]).sum(axis=1)
+        ).ravel()
+        keep = sims >= threshold
+        verified.extend(
+            (int(i), int(j), float(sim)) for (i, j), sim in zip(batch[keep], sims[keep])
+        )
+    
+    return verified
+
+
+def build_tfidf_matrix(texts: List[str]):
+    """
+    TF-IDF matrix (sparse, L2-normalized rows) for the non-empty texts
+    Returns: (matrix or None, valid_indices)
+    """
     valid_indices = [i for i, t in enumerate(texts) if t.strip()]
-    valid_texts = [texts[i] for i in valid_indices]
     
-    if len(valid_texts) < 2:
-        return np.zeros((len(texts), len(texts)))
+    if not SKLEARN_AVAILABLE or len(valid_indices) < 2:
+        return None, valid_indices
     
     try:
-        # TF-IDF vectorization
         vectorizer = TfidfVectorizer(
             min_df=1,
             max_df=0.95,
             ngram_range=(1, 3),
             analyzer='word'
         )
+        return vectorizer.fit_transform([texts[i] for i in valid_indices]), valid_indices
+    except Exception as e:
+        print(f"[Error] Building TF-IDF matrix: {e}")
+        return None, valid_indices
+
+
+def find_similar_pairs(
+    texts: List[str],
+    tfidf_matrix,
+    valid_indices: List[int],
+    threshold: float,
+    use_lsh: Optional[bool] = None,
+    signatures: Optional[np.ndarray] = None
+) -> List[Tuple[int, int, float]]:
+    """
+    All page pairs with TF-IDF cosine >= threshold
+    Large sites: MinHash/LSH proposes candidates, exact cosine verifies them
+    Smaller sites (< LSH_MIN_PAGES): exact blocked sparse product
+    signatures: precomputed MinHash rows aligned with valid_indices (texts are then not re-shingled)
+    Returns: [(i, j, similarity), ...] in original text indices, i < j
+    """
+    if tfidf_matrix is None:
+        return []
+    
+    if use_lsh is None:
+        use_lsh = len(valid_indices) >= LSH_MIN_PAGES
+    
+    if use_lsh:
+        if signatures is None:
+            signatures = np.vstack([minhash_signature(text_shingles(texts[i])) for i in valid_indices])
+        candidates = lsh_candidate_pairs(signatures)
+        verified = verify_candidate_pairs(tfidf_matrix, candidates, threshold)
+    else:
+        upper = sparse.triu(sparse_similarity(tfidf_matrix, threshold), k=1).tocoo()
+        order = np.lexsort((upper.col, upper.row))
+        verified = [(int(upper.row[k]), int(upper.col[k]), float(upper.data[k])) for k in order]
+    
+    return [(valid_indices[i], valid_indices[j], sim) for i, j, sim in verified]
+
+
+def similarity_submatrix(tfidf_matrix, valid_indices: List[int], size: int) -> np.ndarray:
+    """Dense cosine matrix for the first `size` pages only (heatmap)"""
+    matrix = np.zeros((size, size))
+    positions = [(pos, idx) for pos, idx in enumerate(valid_indices) if idx < size]
+    if tfidf_matrix is None or not positions:
+        return matrix
+    
+    rows = [pos for pos, _ in positions]
+    targets = [idx for _, idx in positions]
+    block = tfidf_matrix[rows]
+    matrix[np.ix_(targets, targets)] = (block @ block.T).toarray()
+    return matrix
+
+
+def build_combined_text(page: Dict, include_headings: bool = True, include_meta: bool = True) -> str:
+    """Combined text used for similarity (body + headings + meta)"""
+    parts = []
+    
+    # Body text (main weight)
+    if page['body_text']:
+        parts.append(page['body_text'])
+    
+    # Headings
+    if include_headings:
+        for level in ['h1', 'h2', 'h3']:
+            parts.extend(page['headings'].get(level, []))
+    
+    # Meta
+    if include_meta:
+        if page['title']:
+            parts.append(page['title'])
+        if page['description']:
+            parts.append(page['description'])
+    
+    return ' '.join(parts)
+
+
+# ============ Incremental Duplicate Index ============
+
+_hashing_vectorizer = None
+
+
+def _get_hashing_vectorizer():
+    """Raw n-gram counts with the TfidfVectorizer tokenization - IDF is applied from stored counts"""
+    global _hashing_vectorizer
+    if _hashing_vectorizer is None:
+        _hashing_vectorizer = HashingVectorizer(
+            ngram_range=(1, 3),
+            analyzer='word',
+            n_features=HASHING_FEATURES,
+            alternate_sign=False,
+            norm=None
+        )
+    return _hashing_vectorizer
+
+
+def _idf(df: np.ndarray, num_docs: int) -> np.ndarray:
+    """Smooth IDF with the max_df cut-off, as in TfidfVectorizer"""
+    idf = np.log((1 + num_docs) / (1 + df)) + 1
+    idf[df > TFIDF_MAX_DF * num_docs] = 0
+    return idf
+
+
+def tfidf_from_counts(counts):
+    """
+    TF-IDF rows from raw hashed counts - same formula as TfidfVectorizer (smooth idf, max_df, L2 norm)
+    Columns are compacted to the features actually present
+    Returns: (tfidf_matrix, features, df) - features are the sorted hashed ids of the columns
+    """
+    num_docs = counts.shape[0]
+    features, columns = np.unique(counts.indices, return_inverse=True)
+    df = np.bincount(columns, minlength=len(features))
+    
+    compact = sparse.csr_matrix(
+        (counts.data * _idf(df, num_docs)[columns], columns.ravel(), counts.indptr.copy()),
+        shape=(num_docs, len(features))
+    )
+    compact.eliminate_zeros()
+    return normalize(compact), features, df
+
+
+def _replace_rows(matrix, rows: List[int], new_rows):
+    """CSR matrix with the given rows swapped for new_rows (array splice, no re-slicing)"""
+    indptr, new_indptr = matrix.indptr, new_rows.indptr
+    lengths = np.diff(indptr)
+    data, indices, last = [], [], 0
+    for k, row in sorted(enumerate(rows), key=lambda item: item[1]):
+        data += [matrix.data[indptr[last]:indptr[row]], new_rows.data[new_indptr[k]:new_indptr[k + 1]]]
+        indices += [matrix.indices[indptr[last]:indptr[row]], new_rows.indices[new_indptr[k]:new_indptr[k + 1]]]
+        lengths[row] = new_indptr[k + 1] - new_indptr[k]
+        last = row + 1
+    data.append(matrix.data[indptr[last]:])
+    indices.append(matrix.indices[indptr[last]:])
+    return sparse.csr_matrix(
+        (np.concatenate(data), np.concatenate(indices), np.concatenate([[0], np.cumsum(lengths)])),
+        shape=matrix.shape
+    )
+
+
+def _file_mtime(path: Optional[Path]) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns if path else None
+    except OSError:
+        return None
+
+
+class DuplicateIndex:
+    """
+    Persistent duplicate index for one scan scope (directories + include flags)
+    Per page: extracted parts, MinHash signature, hashed n-gram counts and neighbours,
+    keyed by HTML / page_info.json mtime - a scan re-extracts only pages that changed,
+    and an edited page is re-scored against the site with one sparse product
+    """
+    
+    _instances: Dict[str, 'DuplicateIndex'] = {}
+    _instances_lock = threading.Lock()
+    
+    @classmethod
+    def for_scope(cls, directories: List[str], include_meta: bool = True, include_headings: bool = True) -> 'DuplicateIndex':
+        """Shared index instance per scope"""
+        scope = {'directories': sorted(directories), 'include_meta': include_meta, 'include_headings': include_headings}
+        key = hashlib.md5(json.dumps(scope, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(key, scope)
+            return cls._instances[key]
+    
+    def __init__(self, key: str, scope: Dict):
+        self.scope = scope
+        self.index_path = INDEX_DIR / f"{key}.npz"
+        self.lock = threading.RLock()
+        
+        self.paths: List[str] = []              # row order of counts / tfidf_matrix
+        self.pages: Dict[str, Dict] = {}        # path -> {html_mtime, info_mtime, parts, signature}
+        self.neighbours: Dict[str, Dict[str, float]] = {}
+        self.ignore_stamp = None
+        self.counts = None                      # hashed n-gram counts (persisted)
+        self.tfidf_matrix = None                # compact TF-IDF rows (in memory)
+        self._features = None                   # hashed id of each tfidf_matrix column
+        self._df = None
+        self._save_thread = None
+        self._dirty = False
+        self.last_update: Dict = {}
+        self._load()
+    
+    # ---------- Persistence ----------
+    
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            # Counts and metadata live in one file, so a crash mid-save can't pair mismatched halves
+            with np.load(self.index_path, allow_pickle=False) as stored:
+                meta = json.loads(str(stored['meta']))
+                if meta.get('version') != INDEX_VERSION:
+                    return
+                counts = sparse.csr_matrix(
+                    (stored['data'], stored['indices'], stored['indptr']), shape=tuple(stored['shape'])
+                )
+            self.paths = meta['paths']
+            self.pages = meta['pages']
+            self.neighbours = meta['neighbours']
+            self.ignore_stamp = meta.get('ignore_stamp')
+            self.counts = counts
+            if self.paths:
+                self._recompute_tfidf()
+        except Exception as e:
+            print(f"[DuplicateIndex] Error loading {self.index_path.name}: {e} - rebuilding")
+            self.paths, self.pages, self.neighbours, self.counts = [], {}, {}, None
+    
+    def _snapshot(self) -> Dict:
+        """Copy of the persisted state (page entries and matrices are replaced, never mutated)"""
+        return {
+            'ignore_stamp': self.ignore_stamp,
+            'paths': list(self.paths),
+            'pages': dict(self.pages),
+            'neighbours': {path: dict(others) for path, others in self.neighbours.items()},
+            'counts': self.counts
+        }
+    
+    def _save(self, state: Dict):
+        INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        counts = state.pop('counts')
+        meta = json.dumps({
+            'version': INDEX_VERSION,
+            'scope': self.scope,
+            'updated_at': datetime.now().isoformat(),
+            **state
+        }, ensure_ascii=False)
+        
+        tmp_path = self.index_path.with_name(self.index_path.stem + '.tmp.npz')
+        np.savez(
+            tmp_path,
+            meta=np.array(meta),
+            data=counts.data,
+            indices=counts.indices,
+            indptr=counts.indptr,
+            shape=np.array(counts.shape)
+        )
+        os.replace(tmp_path, self.index_path)
+    
+    def _schedule_save(self):
+        """Persist in the background - a lost write only means those pages are re-extracted next time"""
+        self._dirty = True
+        if self._save_thread is None:
+            self._save_thread = threading.Thread(target=self._save_worker, daemon=True)
+            self._save_thread.start()
+    
+    def _save_worker(self):
+        while True:
+            with self.lock:
+                if not self._dirty:
+                    self._save_thread = None
+                    return
+                self._dirty = False
+                state = self._snapshot()
+            # Write outside the lock so queries don't wait for the disk
+            try:
+                self._save(state)
+            except Exception as e:
+                print(f"[DuplicateIndex] Error saving {self.index_path.name}: {e}")
+    
+    # ---------- Vectors ----------
+    
+    def _combined_text(self, parts: Dict) -> str:
+        return build_combined_text(parts, self.scope['include_headings'], self.scope['include_meta'])
+    
+    def _vectorize(self, paths: List[str]):
+        return _get_hashing_vectorizer().transform([self._combined_text(self.pages[p]['parts']) for p in paths])
+    
+    def _recompute_tfidf(self):
+        self.tfidf_matrix, self._features, self._df = tfidf_from_counts(self.counts)
+    
+    def _lookup(self, hashed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Compact column of each hashed feature + whether it is in the current vocabulary"""
+        positions = np.searchsorted(self._features, hashed)
+        known = positions < len(self._features)
+        known[known] = self._features[positions[known]] == hashed[known]
+        return positions, known
+    
+    def _rebuild_counts(self, wanted_paths: List[str], changed: Set[str]):
+        """Counts matrix in wanted order - unchanged rows are reused, changed rows re-vectorized"""
+        old_rows = {path: i for i, path in enumerate(self.paths)} if self.counts is not None else {}
+        fresh = [path for path in wanted_paths if path in changed or path not in old_rows]
+        fresh_rows = {path: i for i, path in enumerate(fresh)}
+        fresh_counts = self._vectorize(fresh) if fresh else sparse.csr_matrix((0, HASHING_FEATURES))
         
-        tfidf_matrix = vectorizer.fit_transform(valid_texts)
+        base = self.counts if self.counts is not None else sparse.csr_matrix((0, HASHING_FEATURES))
+        offset = base.shape[0]
+        order = [fresh_rows[path] + offset if path in fresh_rows else old_rows[path] for path in wanted_paths]
         
-        # Calculate cosine similarity
-        similarity = cosine_similarity(tfidf_matrix)
+        self.counts = sparse.vstack([base, fresh_counts]).tocsr()[order]
+        self.paths = list(wanted_paths)
+        self._recompute_tfidf()
+    
+    def _update_rows(self, changed: List[str]) -> np.ndarray:
+        """
+        Swap the vectors of edited pages in place and score them against every page
+        Document frequencies are adjusted for the swapped pages; other rows keep their
+        weights until the next full rebuild (IDF drift from one edit is negligible)
+        Returns: similarity of each changed page to all pages (k x n)
+        """
+        row_of = {path: i for i, path in enumerate(self.paths)}
+        rows = [row_of[path] for path in changed]
+        num_docs = len(self.paths)
         
-        # Map back to full matrix
-        full_matrix = np.zeros((len(texts), len(texts)))
-        for i, idx_i in enumerate(valid_indices):
-            for j, idx_j in enumerate(valid_indices):
-                full_matrix[idx_i][idx_j] = similarity[i][j]
+        old_counts = self.counts[rows]
+        new_counts = self._vectorize(changed)
         
-        return full_matrix
+        positions, known = self._lookup(old_counts.indices)
+        np.subtract.at(self._df, positions[known], 1)
+        positions, known = self._lookup(new_counts.indices)
+        np.add.at(self._df, positions[known], 1)
         
-    except Exception as e:
-        print(f"[Error] Calculating similarity: {e}")
-        return np.zeros((len(texts), len(texts)))
+        # Features outside the vocabulary appear in no unchanged page: df=1, they only affect the norm
+        weights = new_counts.data * np.where(
+            known, _idf(self._df[np.minimum(positions, len(self._df) - 1)], num_docs), _idf(np.ones(1), num_docs)[0]
+        )
+        row_ids = np.repeat(np.arange(len(rows)), np.diff(new_counts.indptr))
+        norms = np.sqrt(np.bincount(row_ids, weights=weights ** 2, minlength=len(rows)))
+        norms[norms == 0] = 1.0
+        
+        new_rows = sparse.csr_matrix(
+            (weights[known] / norms[row_ids[known]], (row_ids[known], positions[known])),
+            shape=(len(rows), self.tfidf_matrix.shape[1])
+        )
+        
+        self.counts = _replace_rows(self.counts, rows, new_counts)
+        self.tfidf_matrix = _replace_rows(self.tfidf_matrix, rows, new_rows)
+        return (self.tfidf_matrix @ new_rows.T).T.toarray()
+    
+    # ---------- Update ----------
+    
+    def update(self, page_files: List[Tuple[Path, Optional[Path]]], partial: bool = False, progress_callback=None) -> List[Dict]:
+        """
+        Sync the index with the given pages (re-extract only new / modified ones)
+        partial: only check these pages - the rest of the index is kept as is
+        Returns the extracted parts per indexed page, in index order (with 'path' set)
+        """
+        with self.lock:
+            started = time.time()
+            
+            # Ignore patterns change what is extracted from every page
+            ignore_stamp = _file_mtime(IGNORE_PATTERNS_FILE)
+            if ignore_stamp != self.ignore_stamp:
+                self.pages, self.neighbours = {}, {}
+                self.ignore_stamp = ignore_stamp
+                partial = False
+            
+            checked = [(str(html.relative_to(BASE_DIR)), html, info) for html, info in page_files]
+            
+            stale = []
+            for path, html_path, info_path in checked:
+                stamp = [_file_mtime(html_path), _file_mtime(info_path)]
+                entry = self.pages.get(path)
+                if not entry or [entry['html_mtime'], entry['info_mtime']] != stamp:
+                    stale.append((path, html_path, info_path, stamp))
+            
+            # New / modified pages: parallel extraction stage
+            extracted = extract_pages([(html, info) for _, html, info, _ in stale], progress_callback)
+            changed = []
+            for (path, _, _, stamp), parts in zip(stale, extracted):
+                self.pages[path] = {
+                    'html_mtime': stamp[0],
+                    'info_mtime': stamp[1],
+                    'parts': parts,
+                    'signature': minhash_signature(text_shingles(self._combined_text(parts))).tolist()
+                }
+                changed.append(path)
+            
+            if partial:
+                known_paths = set(self.paths)
+                wanted_paths = self.paths + [path for path, _, _ in checked if path not in known_paths]
+            else:
+                wanted_paths = [path for path, _, _ in checked]
+            
+            wanted_set = set(wanted_paths)
+            removed = [path for path in self.pages if path not in wanted_set]
+            for path in removed:
+                del self.pages[path]
+            
+            mode = 'unchanged'
+            if changed or removed or wanted_paths != self.paths:
+                mode = self._apply_changes(wanted_paths, changed, removed)
+                self._schedule_save()
+            
+            self.last_update = {
+                'mode': mode,
+                'pages': len(wanted_paths),
+                'extracted': len(changed),
+                'removed': len(removed),
+                'seconds': round(time.time() - started, 3)
+            }
+            
+            results = []
+            for path in self.paths:
+                parts = dict(self.pages[path]['parts'])
+                parts['path'] = path
+                results.append(parts)
+            return results
+    
+    def _apply_changes(self, wanted_paths: List[str], changed: List[str], removed: List[str]) -> str:
+        touched = set(changed) | set(removed)
+        
+        # Large changes: rebuild every vector and all neighbours (also refreshes IDF drift)
+        if not self.neighbours or self.tfidf_matrix is None or len(touched) > INDEX_FULL_REBUILD_RATIO * len(wanted_paths):
+            self._rebuild_counts(wanted_paths, set(changed))
+            self.neighbours = {path: {} for path in self.paths}
+            for i, j, sim in self._all_pairs(INDEX_MIN_SIMILARITY):
+                self.neighbours[self.paths[i]][self.paths[j]] = sim
+                self.neighbours[self.paths[j]][self.paths[i]] = sim
+            return 'full'
+        
+        if set(wanted_paths) == set(self.paths):
+            # Edits only: swap rows in place
+            if wanted_paths != self.paths:
+                order = [self.paths.index(path) for path in wanted_paths]
+                self.counts, self.tfidf_matrix, self.paths = self.counts[order], self.tfidf_matrix[order], list(wanted_paths)
+            sims = self._update_rows(changed) if changed else np.zeros((0, len(self.paths)))
+        else:
+            # Pages added / removed: new vectors for everything, neighbours for the changed pages only
+            self._rebuild_counts(wanted_paths, set(changed))
+            row_of = {path: i for i, path in enumerate(self.paths)}
+            changed_rows = [row_of[path] for path in changed]
+            sims = (self.tfidf_matrix[changed_rows] @ self.tfidf_matrix.T).toarray()
+        
+        # Drop stale edges of changed / removed pages (neighbour lists are symmetric)
+        for path in touched:
+            for other in self.neighbours.pop(path, {}):
+                self.neighbours.get(other, {}).pop(path, None)
+        for path in self.paths:
+            self.neighbours.setdefault(path, {})
+        
+        row_of = {path: i for i, path in enumerate(self.paths)}
+        for k, path in enumerate(changed):
+            sims[k, row_of[path]] = 0.0
+        for k, j in zip(*np.nonzero(sims >= INDEX_MIN_SIMILARITY)):
+            path, other = changed[k], self.paths[j]
+            self.neighbours[path][other] = float(sims[k, j])
+            self.neighbours[other][path] = float(sims[k, j])
+        return 'incremental'
+    
+    # ---------- Queries ----------
+    
+    def _all_pairs(self, threshold: float) -> List[Tuple[int, int, float]]:
+        """All pairs >= threshold from the stored vectors (stored signatures feed LSH on large sites)"""
+        valid = np.flatnonzero(self.tfidf_matrix.getnnz(axis=1)).tolist()
+        if len(valid) < 2:
+            return []
+        signatures = np.array([self.pages[self.paths[i]]['signature'] for i in valid], dtype=np.uint32)
+        return find_similar_pairs([], self.tfidf_matrix[valid], valid, threshold, signatures=signatures)
+    
+    def similar_pairs(self, threshold: float) -> List[Tuple[int, int, float]]:
+        """Pairs >= threshold in current page order (i < j)"""
+        with self.lock:
+            if self.tfidf_matrix is None:
+                return []
+            if threshold < INDEX_MIN_SIMILARITY:
+                return self._all_pairs(threshold)
+            
+            row_of = {path: i for i, path in enumerate(self.paths)}
+            pairs = []
+            for path, others in self.neighbours.items():
+                i = row_of[path]
+                for other, sim in others.items():
+                    j = row_of[other]
+                    if i < j and sim >= threshold:
+                        pairs.append((i, j, sim))
+            pairs.sort()
+            return pairs
+    
+    def neighbours_of(self, path: str, threshold: float) -> List[Tuple[str, float]]:
+        """Stored neighbours of one page, most similar first"""
+        with self.lock:
+            others = self.neighbours.get(path, {})
+            return sorted(((p, s) for p, s in others.items() if s >= threshold), key=lambda x: -x[1])
 
 
-def find_duplicate_snippets(text1: str, text2: str, min_length: int = 100) -> List[Dict]:
+def check_page_duplicates(
+    page_path: str,
+    threshold: float = 0.5,
+    include_meta: bool = True,
+    include_headings: bool = True
+) -> Dict:
     """
-    Find common text snippets between two texts
+    Check one (edited) page against the rest of its directory using the incremental index
+    Only this page is re-extracted and re-scored when the directory is already indexed
     """
-    snippets = []
+    html_path = BASE_DIR / page_path
+    if not html_path.exists():
+        return {'success': False, 'error': f'Page not found: {page_path}'}
     
-    # Split into sentences
-    sentences1 = re.split(r'[.!?]', text1)
-    sentences2 = re.split(r'[.!?]', text2)
+    pages_dir = html_path.parent.parent
+    info_path = html_path.parent / 'page_info.json'
+    page_key = str(html_path.relative_to(BASE_DIR))
     
-    # Find common sentences/paragraphs
-    for s1 in sentences1:
-        s1_clean = s1.strip()
-        if len(s1_clean) < min_length:
-            continue
-            
-        for s2 in sentences2:
-            s2_clean = s2.strip()
-            if s1_clean == s2_clean:
-                snippets.append({
-                    'text': s1_clean,
-                    'type': 'body',
-                    'length': len(s1_clean)
-                })
-                break
+    index = DuplicateIndex.for_scope([pages_dir.relative_to(BASE_DIR).as_posix()], include_meta, include_headings)
+    if page_key in index.pages:
+        index.update([(html_path, info_path if info_path.exists() else None)], partial=True)
+    else:
+        index.update(get_page_files(pages_dir))
     
-    return snippets
+    duplicates = []
+    for other, similarity in index.neighbours_of(page_key, threshold):
+        parts = index.pages.get(other, {}).get('parts', {})
+        duplicates.append({
+            'path': other,
+            'similarity': similarity,
+            'seo_impact': calculate_seo_impact(similarity, [parts, parts])['level'],
+            'keyword': parts.get('keyword') or Path(other).parent.name,
+            'title': parts.get('title', '')
+        })
+    
+    return {
+        'success': True,
+        'path': page_key,
+        'duplicates_found': len(duplicates),
+        'duplicates': duplicates,
+        'index': index.last_update
+    }
 
 
 # ============ SEO Impact Calculation ============
@@ -310,10 +1334,14 @@ def generate_duplicate_report(
     pages_dir: str,
     threshold: float = 0.5,
     include_meta: bool = True,
-    include_headings: bool = True
+    include_headings: bool = True,
+    use_index: bool = True,
+    progress_callback=None
 ) -> Dict:
     """
     Generate comprehensive duplicate content report
+    use_index: reuse the persistent duplicate index (only changed pages are re-extracted)
+    progress_callback: called with {stage, done, total, percent, message}
     """
     pages_path = BASE_DIR / pages_dir
     
@@ -343,115 +1371,101 @@ def generate_duplicate_report(
             'scan_time': datetime.now().isoformat()
         }
     
-    # Extract content from all pages
-    pages_content = []
-    for html_path, info_path in page_files:
-        content = extract_content_parts(html_path, info_path)
-        content['path'] = str(html_path.relative_to(BASE_DIR))
-        content['folder'] = html_path.parent.name
-        pages_content.append(content)
-    
-    # Build combined texts for similarity
-    combined_texts = []
-    for page in pages_content:
-        parts = []
-        
-        # Body text (main weight)
-        if page['body_text']:
-            parts.append(page['body_text'])
+    index_stats = None
+    if use_index:
+        # Extracted parts + neighbours from the index - only changed pages are recomputed
+        index = DuplicateIndex.for_scope([pages_dir], include_meta, include_headings)
+        pages_content = index.update(page_files, progress_callback=progress_callback)
+        for content, (html_path, _) in zip(pages_content, page_files):
+            content['folder'] = html_path.parent.name
+        _report_progress(progress_callback, 'similarity', 0, 1, 70, 80, 'Finding similar pages')
+        similar_pairs = index.similar_pairs(threshold)
+        tfidf_matrix, valid_indices = index.tfidf_matrix, list(range(len(pages_content)))
+        index_stats = index.last_update
+    else:
+        # Extract content from all pages (parallel, cached per file)
+        pages_content = extract_pages(page_files, progress_callback)
+        for content, (html_path, _) in zip(pages_content, page_files):
+            content['path'] = str(html_path.relative_to(BASE_DIR))
+            content['folder'] = html_path.parent.name
         
-        # Headings
-        if include_headings:
-            for level in ['h1', 'h2', 'h3']:
-                parts.extend(page['headings'].get(level, []))
+        _report_progress(progress_callback, 'similarity', 0, 1, 70, 80, 'Finding similar pages')
         
-        # Meta
-        if include_meta:
-            if page['title']:
-                parts.append(page['title'])
-            if page['description']:
-                parts.append(page['description'])
+        # Build combined texts for similarity
+        combined_texts = [build_combined_text(page, include_headings, include_meta) for page in pages_content]
         
-        combined_texts.append(' '.join(parts))
-    
-    # Calculate similarity matrix
-    similarity_matrix = calculate_text_similarity(combined_texts)
+        # Similar pairs: LSH candidates verified by exact TF-IDF cosine
+        tfidf_matrix, valid_indices = build_tfidf_matrix(combined_texts)
+        similar_pairs = find_similar_pairs(combined_texts, tfidf_matrix, valid_indices, threshold)
     
     # Find duplicate groups
     groups = []
-    processed_pairs = set()
     pages_with_duplicates = set()
     total_snippets = 0
     severity_counts = {'critical': 0, 'high': 0, 'medium': 0}
     
-    for i in range(len(pages_content)):
-        for j in range(i + 1, len(pages_content)):
-            similarity = similarity_matrix[i][j]
-            
-            if similarity >= threshold:
-                pair_key = tuple(sorted([i, j]))
-                if pair_key in processed_pairs:
-                    continue
-                processed_pairs.add(pair_key)
-                
-                pages_with_duplicates.add(i)
-                pages_with_duplicates.add(j)
-                
-                page1 = pages_content[i]
-                page2 = pages_content[j]
-                
-                # Find duplicate snippets
-                snippets = find_duplicate_snippets(page1['body_text'], page2['body_text'])
-                
-                # Find duplicate headings
-                headings_duplicates = {}
-                if include_headings:
-                    for level in ['h1', 'h2', 'h3']:
-                        h1_set = set(page1['headings'].get(level, []))
-                        h2_set = set(page2['headings'].get(level, []))
-                        common = list(h1_set & h2_set)
-                        if common:
-                            headings_duplicates[level] = common
-                            for h in common:
-                                snippets.append({
-                                    'text': h,
-                                    'type': level,
-                                    'length': len(h)
-                                })
-                
-                total_snippets += len(snippets)
-                
-                # Calculate SEO impact
-                seo_impact = calculate_seo_impact(similarity, [page1, page2])
-                severity_counts[seo_impact['level']] += 1
-                
-                # Add pages to snippets
-                for snippet in snippets:
-                    snippet['pages'] = [page1['path'], page2['path']]
-                
-                groups.append({
-                    'id': f'group_{len(groups) + 1}',
-                    'similarity': float(similarity),
-                    'seo_impact': seo_impact,
-                    'pages': [
-                        {
-                            'path': page1['path'],
-                            'keyword': page1['keyword'] or page1['folder'],
-                            'url': page1['url'],
-                            'title': page1['title'],
-                            'description': page1['description']
-                        },
-                        {
-                            'path': page2['path'],
-                            'keyword': page2['keyword'] or page2['folder'],
-                            'url': page2['url'],
-                            'title': page2['title'],
-                            'description': page2['description']
-                        }
-                    ],
-                    'duplicate_snippets': snippets,
-                    'headings_duplicates': headings_duplicates
-                })
+    for pair_number, (i, j, similarity) in enumerate(similar_pairs, 1):
+        if pair_number % 50 == 0:
+            _report_progress(progress_callback, 'groups', pair_number, len(similar_pairs), 80, 100,
+                             f'Comparing duplicate pairs ({pair_number}/{len(similar_pairs)})')
+        pages_with_duplicates.add(i)
+        pages_with_duplicates.add(j)
+        
+        page1 = pages_content[i]
+        page2 = pages_content[j]
+        
+        # Find duplicate snippets
+        snippets = find_duplicate_snippets(page1['body_text'], page2['body_text'])
+        
+        # Find duplicate headings
+        headings_duplicates = {}
+        if include_headings:
+            for level in ['h1', 'h2', 'h3']:
+                h1_set = set(page1['headings'].get(level, []))
+                h2_set = set(page2['headings'].get(level, []))
+                common = list(h1_set & h2_set)
+                if common:
+                    headings_duplicates[level] = common
+                    for h in common:
+                        snippets.append({
+                            'text': h,
+                            'type': level,
+                            'length': len(h)
+                        })
+        
+        total_snippets += len(snippets)
+        
+        # Calculate SEO impact
+        seo_impact = calculate_seo_impact(similarity, [page1, page2])
+        severity_counts[seo_impact['level']] += 1
+        
+        # Add pages to snippets
+        for snippet in snippets:
+            snippet['pages'] = [page1['path'], page2['path']]
+        
+        groups.append({
+            'id': f'group_{len(groups) + 1}',
+            'similarity': float(similarity),
+            'seo_impact': seo_impact,
+            'pages': [
+                {
+                    'path': page1['path'],
+                    'keyword': page1['keyword'] or page1['folder'],
+                    'url': page1['url'],
+                    'title': page1['title'],
+                    'description': page1['description']
+                },
+                {
+                    'path': page2['path'],
+                    'keyword': page2['keyword'] or page2['folder'],
+                    'url': page2['url'],
+                    'title': page2['title'],
+                    'description': page2['description']
+                }
+            ],
+            'duplicate_snippets': snippets,
+            'headings_duplicates': headings_duplicates
+        })
     
     # Sort groups by similarity (descending)
     groups.sort(key=lambda g: g['similarity'], reverse=True)
@@ -462,7 +1476,7 @@ def generate_duplicate_report(
     
     # Build similarity matrix for heatmap (simplified - top 20 pages)
     heatmap_size = min(20, len(pages_content))
-    heatmap_matrix = similarity_matrix[:heatmap_size, :heatmap_size].tolist()
+    heatmap_matrix = similarity_submatrix(tfidf_matrix, valid_indices, heatmap_size).tolist()
     heatmap_labels = [p['keyword'] or p['folder'] for p in pages_content[:heatmap_size]]
     
     return {
@@ -478,6 +1492,7 @@ def generate_duplicate_report(
         'similarity_matrix': heatmap_matrix,
         'heatmap_labels': heatmap_labels,
         'groups': groups,
+        'index': index_stats,
         'scan_time': datetime.now().isoformat()
     }
 
@@ -486,12 +1501,17 @@ def scan_cross_directories(
     directories: List[str],
     threshold: float = 0.5,
     include_meta: bool = True,
-    include_headings: bool = True
+    include_headings: bool = True,
+    use_index: bool = True,
+    progress_callback=None
 ) -> Dict:
     """
     Scan for duplicates across multiple directories
+    use_index: reuse the persistent duplicate index (only changed pages are re-extracted)
+    progress_callback: called with {stage, done, total, percent, message}
     """
-    all_pages_content = []
+    all_page_files = []
+    page_directories = []
     
     for dir_name in directories:
         pages_path = BASE_DIR / "דפים לשינוי" / dir_name
@@ -500,13 +1520,21 @@ def scan_cross_directories(
             continue
         
         page_files = get_page_files(pages_path)
-        
-        for html_path, info_path in page_files:
-            content = extract_content_parts(html_path, info_path)
+        all_page_files.extend(page_files)
+        page_directories.extend([dir_name] * len(page_files))
+    
+    index = None
+    if use_index and len(all_page_files) >= 2:
+        index = DuplicateIndex.for_scope([f"דפים לשינוי/{d}" for d in directories], include_meta, include_headings)
+        all_pages_content = index.update(all_page_files, progress_callback=progress_callback)
+    else:
+        all_pages_content = extract_pages(all_page_files, progress_callback)
+        for content, (html_path, _) in zip(all_pages_content, all_page_files):
             content['path'] = str(html_path.relative_to(BASE_DIR))
-            content['folder'] = html_path.parent.name
-            content['directory'] = dir_name
-            all_pages_content.append(content)
+    
+    for content, (html_path, _), dir_name in zip(all_pages_content, all_page_files, page_directories):
+        content['folder'] = html_path.parent.name
+        content['directory'] = dir_name
     
     if len(all_pages_content) < 2:
         return {
@@ -523,97 +1551,80 @@ def scan_cross_directories(
             'scan_time': datetime.now().isoformat()
         }
     
-    # Build combined texts
-    combined_texts = []
-    for page in all_pages_content:
-        parts = []
-        if page['body_text']:
-            parts.append(page['body_text'])
-        if include_headings:
-            for level in ['h1', 'h2', 'h3']:
-                parts.extend(page['headings'].get(level, []))
-        if include_meta:
-            if page['title']:
-                parts.append(page['title'])
-            if page['description']:
-                parts.append(page['description'])
-        combined_texts.append(' '.join(parts))
-    
-    # Calculate similarity
-    similarity_matrix = calculate_text_similarity(combined_texts)
+    _report_progress(progress_callback, 'similarity', 0, 1, 70, 80, 'Finding similar pages')
+    if index is not None:
+        similar_pairs = index.similar_pairs(threshold)
+    else:
+        # Similar pairs: LSH candidates verified by exact TF-IDF cosine
+        combined_texts = [build_combined_text(page, include_headings, include_meta) for page in all_pages_content]
+        tfidf_matrix, valid_indices = build_tfidf_matrix(combined_texts)
+        similar_pairs = find_similar_pairs(combined_texts, tfidf_matrix, valid_indices, threshold)
     
     # Find cross-directory duplicates
     groups = []
-    processed_pairs = set()
     pages_with_duplicates = set()
     total_snippets = 0
     severity_counts = {'critical': 0, 'high': 0, 'medium': 0}
     
-    for i in range(len(all_pages_content)):
-        for j in range(i + 1, len(all_pages_content)):
-            # Only consider cross-directory pairs
-            if all_pages_content[i]['directory'] == all_pages_content[j]['directory']:
-                continue
-            
-            similarity = similarity_matrix[i][j]
-            
-            if similarity >= threshold:
-                pair_key = tuple(sorted([i, j]))
-                if pair_key in processed_pairs:
-                    continue
-                processed_pairs.add(pair_key)
-                
-                pages_with_duplicates.add(i)
-                pages_with_duplicates.add(j)
-                
-                page1 = all_pages_content[i]
-                page2 = all_pages_content[j]
-                
-                snippets = find_duplicate_snippets(page1['body_text'], page2['body_text'])
-                
-                headings_duplicates = {}
-                if include_headings:
-                    for level in ['h1', 'h2', 'h3']:
-                        h1_set = set(page1['headings'].get(level, []))
-                        h2_set = set(page2['headings'].get(level, []))
-                        common = list(h1_set & h2_set)
-                        if common:
-                            headings_duplicates[level] = common
-                
-                total_snippets += len(snippets)
-                
-                seo_impact = calculate_seo_impact(similarity, [page1, page2])
-                severity_counts[seo_impact['level']] += 1
-                
-                for snippet in snippets:
-                    snippet['pages'] = [page1['path'], page2['path']]
-                
-                groups.append({
-                    'id': f'cross_group_{len(groups) + 1}',
-                    'similarity': float(similarity),
-                    'seo_impact': seo_impact,
-                    'cross_directory': True,
-                    'pages': [
-                        {
-                            'path': page1['path'],
-                            'keyword': page1['keyword'] or page1['folder'],
-                            'url': page1['url'],
-                            'title': page1['title'],
-                            'description': page1['description'],
-                            'directory': page1['directory']
-                        },
-                        {
-                            'path': page2['path'],
-                            'keyword': page2['keyword'] or page2['folder'],
-                            'url': page2['url'],
-                            'title': page2['title'],
-                            'description': page2['description'],
-                            'directory': page2['directory']
-                        }
-                    ],
-                    'duplicate_snippets': snippets,
-                    'headings_duplicates': headings_duplicates
-                })
+    for pair_number, (i, j, similarity) in enumerate(similar_pairs, 1):
+        if pair_number % 50 == 0:
+            _report_progress(progress_callback, 'groups', pair_number, len(similar_pairs), 80, 100,
+                             f'Comparing duplicate pairs ({pair_number}/{len(similar_pairs)})')
+        # Only consider cross-directory pairs
+        if all_pages_content[i]['directory'] == all_pages_content[j]['directory']:
+            continue
+        
+        pages_with_duplicates.add(i)
+        pages_with_duplicates.add(j)
+        
+        page1 = all_pages_content[i]
+        page2 = all_pages_content[j]
+        
+        snippets = find_duplicate_snippets(page1['body_text'], page2['body_text'])
+        
+        headings_duplicates = {}
+        if include_headings:
+            for level in ['h1', 'h2', 'h3']:
+                h1_set = set(page1['headings'].get(level, []))
+                h2_set = set(page2['headings'].get(level, []))
+                common = list(h1_set & h2_set)
+                if common:
+                    headings_duplicates[level] = common
+        
+        total_snippets += len(snippets)
+        
+        seo_impact = calculate_seo_impact(similarity, [page1, page2])
+        severity_counts[seo_impact['level']] += 1
+        
+        for snippet in snippets:
+            snippet['pages'] = [page1['path'], page2['path']]
+        
+        groups.append({
+            'id': f'cross_group_{len(groups) + 1}',
+            'similarity': float(similarity),
+            'seo_impact': seo_impact,
+            'cross_directory': True,
+            'pages': [
+                {
+                    'path': page1['path'],
+                    'keyword': page1['keyword'] or page1['folder'],
+                    'url': page1['url'],
+                    'title': page1['title'],
+                    'description': page1['description'],
+                    'directory': page1['directory']
+                },
+                {
+                    'path': page2['path'],
+                    'keyword': page2['keyword'] or page2['folder'],
+                    'url': page2['url'],
+                    'title': page2['title'],
+                    'description': page2['description'],
+                    'directory': page2['directory']
+                }
+            ],
+            'duplicate_snippets': snippets,
+            'headings_duplicates': headings_duplicates
+        })
     
     groups.sort(key=lambda g: g['similarity'], reverse=True)
     
@@ -632,6 +1643,7 @@ def scan_cross_directories(
             'severity_breakdown': severity_counts
         },
         'groups': groups,
+        'index': index.last_update if index is not None else None,
         'scan_time': datetime.now().isoformat()
     }
 
@@ -700,7 +1712,7 @@ def compare_two_pages(page1_path: str, page2_path: str) -> Dict:
     # Calculate similarity
     texts = [content1['body_text'], content2['body_text']]
     similarity_matrix = calculate_text_similarity(texts)
-    similarity = similarity_matrix[0][1] if len(similarity_matrix) > 1 else 0
+    similarity = similarity_matrix[0, 1] if similarity_matrix is not None else 0
     
     # Find matching sections
     snippets = find_duplicate_snippets(content1['body_text'], content2['body_text'], min_length=50)
@@ -730,15 +1742,146 @@ def compare_two_pages(page1_path: str, page2_path: str) -> Dict:
     }
 
 
+# ============ Benchmark ============
+
+def _synthetic_corpus(num_pages: int, seed: int = 7) -> List[str]:
+    """
+    Synthetic site: template-based page families (near-duplicates at varying
+    edit rates) plus unrelated pages - mimics loan pages sharing structure
+    """
+    rng = random.Random(seed)
+    # Letters only - normalize_text strips digits
+    letters = 'אבגדהוזחטיכלמנסעפצקרשת'
+    vocabulary = list({''.join(rng.choice(letters) for _ in range(rng.randint(3, 7))) for _ in range(20000)})
+    texts = []
+    
+    while len(texts) < num_pages:
+        base = [rng.choice(vocabulary) for _ in range(rng.randint(300, 900))]
+        family_size = rng.choice([1, 1, 2, 3, 5])
+        for _ in range(family_size):
+            edit_rate = rng.choice([0.02, 0.1, 0.25, 0.4, 0.6])
+            texts.append(' '.join(w if rng.random() > edit_rate else rng.choice(vocabulary) for w in base))
+    
+    return texts[:num_pages]
+
+
+def benchmark_similarity(sizes=(500, 1000, 2000, 4000), threshold: float = 0.5) -> List[Dict]:
+    """
+    Compare LSH candidates and the blocked sparse product against the legacy
+    dense n x n matrix + pair loop. Reports time per path and whether the same pairs were found
+    """
+    results = []
+    
+    for size in sizes:
+        texts = _synthetic_corpus(size)
+        
+        started = time.time()
+        tfidf_matrix, valid_indices = build_tfidf_matrix(texts)
+        tfidf_time = time.time() - started
+        
+        started = time.time()
+        lsh_pairs = {(i, j) for i, j, _ in find_similar_pairs(texts, tfidf_matrix, valid_indices, threshold, use_lsh=True)}
+        lsh_time = time.time() - started
+        
+        started = time.time()
+        sparse_pairs = {(i, j) for i, j, _ in find_similar_pairs(texts, tfidf_matrix, valid_indices, threshold, use_lsh=False)}
+        sparse_time = time.time() - started
+        
+        # Legacy path: dense n x n matrix + Python loop over every pair (TF-IDF fit excluded)
+        started = time.time()
+        dense = cosine_similarity(tfidf_matrix)
+        exact_pairs = set()
+        for i in range(size):
+            for j in range(i + 1, size):
+                if dense[i][j] >= threshold:
+                    exact_pairs.add((i, j))
+        exact_time = time.time() - started
+        
+        result = {
+            'pages': size,
+            'tfidf_seconds': round(tfidf_time, 3),
+            'lsh_seconds': round(lsh_time, 3),
+            'sparse_seconds': round(sparse_time, 3),
+            'all_pairs_seconds': round(exact_time, 3),
+            'pairs_exact': len(exact_pairs),
+            'pairs_lsh': len(lsh_pairs),
+            'pairs_sparse': len(sparse_pairs),
+            'same_groups': lsh_pairs == exact_pairs == sparse_pairs
+        }
+        results.append(result)
+        print(f"  {size:>6} pages | tfidf {result['tfidf_seconds']:>6}s | lsh {result['lsh_seconds']:>6}s | "
+              f"sparse {result['sparse_seconds']:>6}s | all-pairs {result['all_pairs_seconds']:>6}s | "
+              f"pairs {len(lsh_pairs)}/{len(sparse_pairs)}/{len(exact_pairs)} | same groups: {result['same_groups']}")
+    
+    return results
+
+
+def benchmark_snippets(sentence_counts=(120, 500, 1500), min_length: int = 100) -> List[Dict]:
+    """
+    Winnowing snippet matcher vs the legacy sentence x sentence loop on page pairs
+    sharing 3/4 of their sentences (shuffled)
+    """
+    rng = random.Random(7)
+    vocabulary = ' '.join(_synthetic_corpus(200)).split()
+    
+    def sentence():
+        return ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(6, 30)))
+    
+    results = []
+    for count in sentence_counts:
+        pool = [sentence() for _ in range(count)]
+        text1 = '. '.join(rng.sample(pool, count * 3 // 4) + [sentence() for _ in range(count // 4)])
+        text2 = '. '.join(rng.sample(pool, count * 3 // 4) + [sentence() for _ in range(count // 4)])
+        
+        started = time.time()
+        snippets = find_duplicate_snippets(text1, text2, min_length)
+        winnow_time = time.time() - started
+        
+        # Legacy path: every sentence of page 1 against every sentence of page 2
+        started = time.time()
+        legacy = []
+        sentences2 = re.split(r'[.!?]', text2)
+        for s1 in re.split(r'[.!?]', text1):
+            s1_clean = s1.strip()
+            if len(s1_clean) < min_length:
+                continue
+            for s2 in sentences2:
+                if s1_clean == s2.strip():
+                    legacy.append(s1_clean)
+                    break
+        legacy_time = time.time() - started
+        
+        result = {
+            'characters': len(text1),
+            'winnow_seconds': round(winnow_time, 4),
+            'legacy_seconds': round(legacy_time, 4),
+            'snippets_winnow': len(snippets),
+            'snippets_legacy': len(legacy),
+            'covers_legacy': all(any(s in snippet['text'] for snippet in snippets) for s in legacy)
+        }
+        results.append(result)
+        print(f"  {len(text1):>7} chars | winnow {result['winnow_seconds']:>7}s | legacy {result['legacy_seconds']:>7}s | "
+              f"snippets {len(snippets)}/{len(legacy)} | covers legacy: {result['covers_legacy']}")
+    
+    return results
+
+
 # ============ CLI Testing ============
 
 if __name__ == '__main__':
-    print("Testing Duplicate Detector...")
-    
     if not SKLEARN_AVAILABLE:
         print("ERROR: scikit-learn not installed!")
         exit(1)
     
+    if '--benchmark' in sys.argv:
+        print("Benchmarking duplicate detection (MinHash/LSH, blocked sparse, legacy all-pairs)...")
+        benchmark_similarity()
+        print("Benchmarking snippet matching (winnowing vs sentence loop)...")
+        benchmark_snippets()
+        exit(0)
+    
+    print("Testing Duplicate Detector...")
+    
     # Test with main directory
     report = generate_duplicate_report("דפים לשינוי/main", threshold=0.5)
     
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Financial Rules - regex rule engine for lender pages
+חילוץ נתונים פיננסיים בכללים (ללא מודל): ריביות, פריים+X, סכומים, תקופות, עמלות ותאריך עדכון
+
+כל פריט מקבל confidence לפי עד כמה ההקשר חד-משמעי:
+מילת מפתח צמודה (באותו משפט) - גבוה; מילת מפתח רחוקה יותר (כותרת טבלה למשל) - בינוני.
+מספר בלי הקשר מזהה לא נכלל בכלל - עדיף שדה ריק (שה-LLM ישלים) על פני ערך שגוי.
+המבנה זהה לתשובת ה-LLM ב-OllamaSummarizer.extract_financial_data.
+"""
+
+import re
+from typing import Dict, List, Any, Optional, Tuple
+
+
+# Fields the rules can fill; 'conditions' is free text and left to the LLM
+RULE_FIELDS = ('interest_rates', 'amounts', 'periods', 'fees', 'last_updated')
+
+CONFIDENCE_NEAR = 0.9     # keyword in the same sentence, right before the value
+CONFIDENCE_FAR = 0.6      # keyword further back (e.g. a table header)
+CONFIDENCE_UNTYPED = 0.7  # currency/unit is explicit but min/max is not stated
+
+NEAR_WINDOW = 40
+FAR_WINDOW = 160
+MAX_ITEMS_PER_FIELD = 12
+
+_NUM = r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?'
+_MONTHS = 'ינואר|פברואר|מרץ|אפריל|מאי|יוני|יולי|אוגוסט|ספטמבר|אוקטובר|נובמבר|דצמבר'
+
+PERCENT_RE = re.compile(rf'(?<![\d.,])({_NUM})\s*(?:%|אחוז(?:ים)?)')
+PRIME_RE = re.compile(rf'(?:פריים|prime|(?<![A-Za-z])P(?=\s*[+\-−]))\s*(\+|-|−|פלוס|מינוס|ועוד)\s*({_NUM})\s*%?', re.IGNORECASE)
+MONEY_RE = re.compile(
+    rf'₪\s*({_NUM})(?:\s*(אלף|מיליון))?'
+    rf'|(?<![\d.,])({_NUM})\s*(אלף|מיליון|מיליארד)?\s*(?:ש"ח|ש״ח|ש\'ח|שקלים|שקל|₪|NIS)'
+)
+PERIOD_RE = re.compile(rf'(?<![\d.,])(?:({_NUM})\s*(?:-|–|עד|ל-?)\s*)?({_NUM})\s*(חודשים|חודש|שנים|שנה)(?![֐-׿])')
+FEE_RE = re.compile(r'(ללא\s+|בלי\s+|פטור\s+מ)?(עמל(?:ת|ה|ות))((?:[ \t]+[֐-׿"\'״]+){0,3})')
+UPDATED_RE = re.compile(
+    rf'(?:עודכן|עדכון אחרון|מעודכן ל|נכון ל(?:תאריך|-)?)\s*(?:ב-?|:)?\s*'
+    rf'(\d{{1,2}}[./-]\d{{1,2}}[./-]\d{{2,4}}|(?:{_MONTHS})\s+\d{{4}})'
+)
+
+RATE_KEYWORDS = re.compile(r'ריבית|עלות\s+(?:ה)?אשראי|APR', re.IGNORECASE)
+RATE_TYPES = (('אפקטיבית', 'אפקטיבית'), ('קבועה', 'קבועה'), ('משתנה', 'משתנה'),
+              ('נומינלית', 'נומינלית'), ('צמוד', 'צמודה למדד'), ('עלות', 'עלות אשראי'))
+FEE_KEYWORDS = re.compile(r'עמל(?:ת|ה|ות)')
+# Percentages that are not interest (funding share, equity, discounts) - never reported as rates
+NON_RATE_KEYWORDS = re.compile(r'מימון|LTV|הון\s+עצמי|הנחה|מקדמה|משכורת|הכנסה')
+LOAN_KEYWORDS = re.compile(r'הלוואה|הלוואות|אשראי|מימון|משכנתא|סכום|תקופ|פריסה|החזר|תשלומים')
+GRACE_KEYWORDS = re.compile(r'גרייס|דחיית\s+תשלום|גרס')
+
+MAX_WORDS = re.compile(r'(?:^|[\s(])ו?(?:עד|מקסימום|לכל\s+היותר|מקסימלי(?:ת)?|תקרת|תקרה)\s*$')
+MIN_WORDS = re.compile(r'(?:(?:^|[\s(])(?:החל\s+מ-?|מינימום|לפחות|מינימלי(?:ת)?|מ-?)|(?<=\s)מ-?)\s*$')
+EXAMPLE_WORDS = re.compile(r'לדוגמה|לדוגמא|למשל')
+
+
+def _context(text: str, start: int, end: int, pad: int = 40) -> str:
+    return ' '.join(text[max(0, start - pad):end + pad].split())
+
+
+def _sentence_before(text: str, start: int, window: int) -> str:
+    """הטקסט שלפני המיקום, עד תחילת המשפט/השורה (לכל היותר window תווים)"""
+    chunk = text[max(0, start - window):start]
+    cut = max(chunk.rfind('\n'), chunk.rfind('. '))
+    return chunk[cut + 1:] if cut >= 0 else chunk
+
+
+def _keyword_confidence(text: str, start: int, pattern: re.Pattern) -> Tuple[Optional[float], str]:
+    """confidence לפי המרחק של מילת המפתח מהערך (None אם אין) + הטקסט שלפני הערך במשפט"""
+    near = _sentence_before(text, start, NEAR_WINDOW)
+    if pattern.search(near):
+        return CONFIDENCE_NEAR, near
+    if pattern.search(text[max(0, start - FAR_WINDOW):start]):
+        return CONFIDENCE_FAR, near
+    return None, near
+
+
+def _bound_type(before: str) -> Optional[str]:
+    """מינימום/מקסימום/דוגמה לפי המילים שממש לפני המספר"""
+    tail = before[-14:]
+    if MAX_WORDS.search(tail):
+        return 'מקסימום'
+    if MIN_WORDS.search(tail):
+        return 'מינימום'
+    if EXAMPLE_WORDS.search(before):
+        return 'דוגמה'
+    return None
+
+
+def _add(items: List[Dict], seen: set, item: Dict):
+    key = (item['value'], item.get('type') or item.get('description'))
+    if key in seen or len(items) >= MAX_ITEMS_PER_FIELD:
+        return
+    seen.add(key)
+    items.append(item)
+
+
+def _interest_rates(text: str, fee_spans: List[Tuple[int, int]]) -> Tuple[List[Dict], int]:
+    items, seen, candidates = [], set(), 0
+
+    for match in PRIME_RE.finditer(text):
+        candidates += 1
+        sign = '-' if match.group(1) in ('-', '−', 'מינוס') else '+'
+        _add(items, seen, {
+            'value': f"פריים {sign} {match.group(2)}%",
+            'type': 'פריים',
+            'context': _context(text, match.start(), match.end()),
+            'confidence': 0.95
+        })
+
+    for match in PERCENT_RE.finditer(text):
+        start = match.start()
+        if any(s <= start < e for s, e in fee_spans) or _inside(PRIME_RE, text, start):
+            continue
+        candidates += 1
+        confidence, near = _keyword_confidence(text, start, RATE_KEYWORDS)
+        if confidence is None or NON_RATE_KEYWORDS.search(near[-25:]) or FEE_KEYWORDS.search(near):
+            continue
+        rate_type = next((label for word, label in RATE_TYPES if word in near), 'ריבית')
+        bound = _bound_type(near)
+        _add(items, seen, {
+            'value': f"{match.group(1)}%",
+            'type': f"{rate_type} ({bound})" if bound else rate_type,
+            'context': _context(text, start, match.end()),
+            'confidence': confidence
+        })
+    return items, candidates
+
+
+def _inside(pattern: re.Pattern, text: str, position: int) -> bool:
+    """האם המיקום נמצא בתוך התאמה של pattern בסביבה הקרובה (למשל האחוז של 'פריים + 1.5%')"""
+    window_start = max(0, position - 20)
+    return any(m.start() + window_start <= position < m.end() + window_start
+               for m in pattern.finditer(text[window_start:position + 10]))
+
+
+def _amounts(text: str, fee_spans: List[Tuple[int, int]]) -> Tuple[List[Dict], int]:
+    items, seen, candidates = [], set(), 0
+    for match in MONEY_RE.finditer(text):
+        start = match.start()
+        if any(s <= start < e for s, e in fee_spans):
+            continue
+        candidates += 1
+        number = match.group(1) or match.group(3)
+        scale = match.group(2) or match.group(4)
+        value = f"{number} {scale} ש\"ח" if scale else f"{number} ש\"ח"
+
+        near = _sentence_before(text, start, NEAR_WINDOW)
+        bound = _bound_type(near)
+        loan_context = LOAN_KEYWORDS.search(_sentence_before(text, start, FAR_WINDOW))
+        if not bound and not loan_context:
+            continue
+        _add(items, seen, {
+            'value': value,
+            'type': bound or 'סכום',
+            'context': _context(text, start, match.end()),
+            'confidence': CONFIDENCE_NEAR if bound and loan_context else CONFIDENCE_UNTYPED
+        })
+    return items, candidates
+
+
+def _periods(text: str) -> Tuple[List[Dict], int]:
+    items, seen, candidates = [], set(), 0
+    for match in PERIOD_RE.finditer(text):
+        start = match.start()
+        candidates += 1
+        low, high, unit = match.group(1), match.group(2), match.group(3)
+        near = _sentence_before(text, start, NEAR_WINDOW)
+        context = _context(text, start, match.end())
+        loan_context = LOAN_KEYWORDS.search(_sentence_before(text, start, FAR_WINDOW))
+
+        if GRACE_KEYWORDS.search(near):
+            _add(items, seen, {'value': f"{high} {unit}", 'type': 'גרייס', 'context': context, 'confidence': CONFIDENCE_NEAR})
+            continue
+        if low:
+            # Range: "12-60 חודשים" / "בין 12 ל-60 חודשים"
+            confidence = CONFIDENCE_NEAR if loan_context else CONFIDENCE_UNTYPED
+            _add(items, seen, {'value': f"{low} {unit}", 'type': 'מינימום', 'context': context, 'confidence': confidence})
+            _add(items, seen, {'value': f"{high} {unit}", 'type': 'מקסימום', 'context': context, 'confidence': confidence})
+            continue
+
+        bound = _bound_type(near)
+        if not bound and not loan_context:
+            continue
+        _add(items, seen, {
+            'value': f"{high} {unit}",
+            'type': bound or 'תקופה',
+            'context': context,
+            'confidence': CONFIDENCE_NEAR if bound and loan_context else CONFIDENCE_UNTYPED
+        })
+    return items, candidates
+
+
+def _fees(text: str) -> Tuple[List[Dict], List[Tuple[int, int]]]:
+    """עמלות + הטווחים שהן תופסות בטקסט (כדי שהאחוז/הסכום שלהן לא ייספר כריבית/סכום הלוואה)"""
+    items, seen, spans = [], set(), []
+    for match in FEE_RE.finditer(text):
+        description = ' '.join((match.group(2) + match.group(3)).split())
+        if match.group(1):
+            _add(items, seen, {'value': 'ללא', 'description': description,
+                               'context': _context(text, match.start(), match.end()), 'confidence': CONFIDENCE_NEAR})
+            continue
+
+        # First percentage / amount on the same line, shortly after the fee name
+        tail_end = text.find('\n', match.end())
+        tail_end = min(tail_end if tail_end >= 0 else len(text), match.end() + 60)
+        tail = text[match.end():tail_end]
+        value_match = min((m for m in (PERCENT_RE.search(tail), MONEY_RE.search(tail)) if m),
+                          key=lambda m: m.start(), default=None)
+        if not value_match:
+            continue
+        value_start, value_end = match.end() + value_match.start(), match.end() + value_match.end()
+        spans.append((match.start(), value_end))
+        _add(items, seen, {
+            'value': ' '.join(text[value_start:value_end].split()),
+            'description': description,
+            'context': _context(text, match.start(), value_end),
+            'confidence': CONFIDENCE_NEAR
+        })
+    return items, spans
+
+
+def extract_financial_rules(text: str) -> Dict[str, Any]:
+    """
+    חילוץ בכללים בלבד
+    מחזיר:
+        data: {field: [...] / str}
+        confidence: {field: 0..1} - הגבוה מבין הפריטים של השדה
+        candidates: {field: n} - ערכים מסוג השדה שנמצאו בטקסט (כולל כאלה שלא סווגו בביטחון);
+                    0 = אין בדף מה לחלץ לשדה, כך שגם מודל לא ימצא
+    """
+    fees, fee_spans = _fees(text)
+    rates, rate_candidates = _interest_rates(text, fee_spans)
+    amounts, amount_candidates = _amounts(text, fee_spans)
+    periods, period_candidates = _periods(text)
+    data = {
+        'interest_rates': rates,
+        'amounts': amounts,
+        'periods': periods,
+        'fees': fees,
+    }
+    updated = UPDATED_RE.search(text)
+    data['last_updated'] = updated.group(1) if updated else ''
+
+    confidence = {field: max((item['confidence'] for item in items), default=0.0)
+                  for field, items in data.items() if isinstance(items, list)}
+    confidence['last_updated'] = CONFIDENCE_NEAR if updated else 0.0
+    candidates = {
+        'interest_rates': rate_candidates,
+        'amounts': amount_candidates,
+        'periods': period_candidates,
+        'fees': len(FEE_KEYWORDS.findall(text)),
+        'last_updated': 1 if updated else 0
+    }
+    return {'data': data, 'confidence': confidence, 'candidates': candidates}
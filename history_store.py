@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Delta History Store - Compressed version history for scraped sources
+היסטוריית גרסאות דחוסה למקורות סרוקים - שמירת הפרשים במקום עותק מלא לכל סריקה
+"""
+
+import os
+import re
+import json
+import gzip
+import difflib
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from json_store import file_lock
+
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "manifest.lock"
+
+# Full snapshot every N versions - bounds reconstruction to N-1 delta applications
+KEYFRAME_INTERVAL = 10
+
+# Store a full snapshot instead of a delta when the delta is this large relative to the content
+KEYFRAME_DELTA_RATIO = 0.5
+
+# Legacy history files: one full JSON document per day (YYYY-MM-DD.json)
+LEGACY_FILE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}\.json$')
+
+# Split points: end of line, or end of sentence followed by a space.
+# Apify content is whitespace-collapsed into one line, so sentences keep diffs small there too.
+_UNIT_SPLIT = re.compile(r'(?<=\n)|(?<=[.!?] )')
+
+
+def split_units(content: str) -> List[str]:
+    """פיצול תוכן ליחידות השוואה (שורות / משפטים) - ''.join(units) == content"""
+    if not content:
+        return []
+    return [u for u in _UNIT_SPLIT.split(content) if u]
+
+
+def make_delta(old_units: List[str], new_units: List[str]) -> List[list]:
+    """
+    יצירת delta בין שתי גרסאות
+    פעולות: ["=", n] העתקת n יחידות, ["-", [...]] הסרה, ["+", [...]] הוספה
+    """
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_units, new_units, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(["=", i2 - i1])
+            continue
+        if tag in ('delete', 'replace'):
+            ops.append(["-", old_units[i1:i2]])
+        if tag in ('insert', 'replace'):
+            ops.append(["+", new_units[j1:j2]])
+    return ops
+
+
+def apply_delta(old_units: List[str], ops: List[list]) -> List[str]:
+    """שחזור גרסה חדשה מגרסה קודמת + delta"""
+    result = []
+    pos = 0
+    for op, value in ops:
+        if op == "=":
+            result.extend(old_units[pos:pos + value])
+            pos += value
+        elif op == "-":
+            pos += len(value)
+        elif op == "+":
+            result.extend(value)
+    return result
+
+
+def _delta_size(ops: List[list]) -> int:
+    return sum(sum(len(u) for u in value) for op, value in ops if op != "=")
+
+
+def _replace_file(path: Path, write):
+    """כתיבה לקובץ זמני והחלפה אטומית - קורא מקביל רואה את הגרסה הישנה או החדשה, לא חצי קובץ"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class CorruptManifestError(Exception):
+    """manifest.json קיים אך לא קריא - לא מתחילים היסטוריה ריקה מעל קבצי ה-delta הקיימים"""
+
+
+class DeltaHistoryStore:
+    """
+    היסטוריית גרסאות למקור בודד
+    - manifest.json: מטא-דאטה של כל הגרסאות (ללא תוכן) - שאילתות רשימה זולות
+    - <date>.delta.json.gz: הפרש מול הגרסה הקודמת (משמש גם לשאילתת "מה השתנה")
+    - <date>.full.json.gz: snapshot מלא כל KEYFRAME_INTERVAL גרסאות
+    """
+
+    def __init__(self, history_dir: Path, source_id: str = ""):
+        self.history_dir = Path(history_dir)
+        self.source_id = source_id
+        self.manifest_path = self.history_dir / MANIFEST_FILE
+        self._manifest = None
+
+    # ============ Manifest ============
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {"versions": []}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[History] Error loading manifest {self.manifest_path}: {e}")
+            raise CorruptManifestError(f"Cannot read {self.manifest_path}: {e}") from e
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if self._manifest is None:
+            self.history_dir.mkdir(parents=True, exist_ok=True)
+            if any(LEGACY_FILE_PATTERN.match(f.name) for f in self.history_dir.glob("*.json")):
+                with self._locked():
+                    pass  # migrates the legacy files
+            else:
+                self._manifest = self._read_manifest()
+        return self._manifest
+
+    @contextmanager
+    def _locked(self):
+        """נעילה למקור (בין תהליכים) לכל read-modify-write - טוען את ה-manifest מחדש מהדיסק"""
+        self.history_dir.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.history_dir / LOCK_FILE):
+            self._manifest = self._read_manifest()
+            self._migrate_legacy_files()
+            yield self._manifest
+
+    def _save_manifest(self):
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+        _replace_file(self.manifest_path, write)
+
+    def _migrate_legacy_files(self):
+        """המרת קבצי היסטוריה ישנים (עותק מלא ליום) לאחסון delta"""
+        legacy_files = sorted(f for f in self.history_dir.glob("*.json") if LEGACY_FILE_PATTERN.match(f.name))
+        if not legacy_files:
+            return
+
+        print(f"[History] Migrating {len(legacy_files)} legacy history files in {self.history_dir}")
+        for legacy_file in legacy_files:
+            try:
+                with open(legacy_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._append(
+                    url=data.get("url", ""),
+                    title=data.get("title", ""),
+                    content=data.get("content", ""),
+                    content_hash=data.get("content_hash"),
+                    scraped_at=data.get("scraped_at"),
+                    date_str=legacy_file.stem
+                )
+                legacy_file.unlink()
+            except Exception as e:
+                print(f"[History] Error migrating {legacy_file}: {e}")
+        self._save_manifest()
+
+    # ============ Payload files ============
+
+    def _write_payload(self, name: str, payload: Any):
+        def write(tmp_path):
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+        _replace_file(self.history_dir / name, write)
+
+    def _read_payload(self, name: str) -> Any:
+        with gzip.open(self.history_dir / name, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _remove_payloads(self, entry: Dict[str, Any]) -> int:
+        removed = 0
+        for key in ("full_file", "delta_file"):
+            name = entry.get(key)
+            if name and (self.history_dir / name).exists():
+                (self.history_dir / name).unlink()
+                removed += 1
+        return removed
+
+    # ============ Reconstruction ============
+
+    def _units_at(self, index: int) -> List[str]:
+        """שחזור יחידות התוכן של גרסה לפי אינדקס (מה-keyframe הקרוב)"""
+        versions = self._manifest["versions"]
+        start = index
+        while start > 0 and not versions[start].get("full_file"):
+            start -= 1
+
+        units = split_units(self._read_payload(versions[start]["full_file"])) if versions[start].get("full_file") else []
+        for i in range(start + 1, index + 1):
+            units = self._advance(units, versions[i])
+        return units
+
+    def _advance(self, units: List[str], entry: Dict[str, Any]) -> List[str]:
+        if entry.get("full_file"):
+            return split_units(self._read_payload(entry["full_file"]))
+        if entry.get("delta_file"):
+            return apply_delta(units, self._read_payload(entry["delta_file"]))
+        return units  # unchanged version
+
+    def _entry_to_version(self, entry: Dict[str, Any], content: Optional[str] = None) -> Dict[str, Any]:
+        version = {
+            "source_id": self.source_id,
+            "url": entry.get("url", ""),
+            "title": entry.get("title", ""),
+            "content_hash": entry.get("content_hash"),
+            "scraped_at": entry.get("scraped_at"),
+            "word_count": entry.get("word_count", 0),
+            "content_length": entry.get("content_length", 0),
+            "date": entry.get("date"),
+            "file_name": f"{entry.get('date')}.json",
+            "changes": {"added": entry.get("added", 0), "removed": entry.get("removed", 0)}
+        }
+        if content is not None:
+            version["content"] = content
+        return version
+
+    # ============ Public API ============
+
+    def _append(self, url, title, content, content_hash=None, scraped_at=None, date_str=None) -> Dict[str, Any]:
+        versions = self._manifest["versions"]
+        date_str = date_str or datetime.now().strftime("%Y-%m-%d")
+        content_hash = content_hash or hashlib.sha256(content.encode()).hexdigest()[:16]
+
+        # One version per day - a rescan on the same day replaces that day's version
+        if versions and versions[-1]["date"] == date_str:
+            self._remove_payloads(versions.pop())
+
+        new_units = split_units(content)
+        entry = {
+            "date": date_str,
+            "url": url,
+            "title": title,
+            "content_hash": content_hash,
+            "scraped_at": scraped_at or datetime.now().isoformat(),
+            "word_count": len(content.split()),
+            "content_length": len(content),
+            "added": 0,
+            "removed": 0
+        }
+
+        if versions:
+            previous = versions[-1]
+            if previous.get("content_hash") != content_hash:
+                ops = make_delta(self._units_at(len(versions) - 1), new_units)
+                entry["added"] = sum(len(v) for op, v in ops if op == "+")
+                entry["removed"] = sum(len(v) for op, v in ops if op == "-")
+                entry["delta_file"] = f"{date_str}.delta.json.gz"
+                self._write_payload(entry["delta_file"], ops)
+
+                since_keyframe = 0
+                for v in reversed(versions):
+                    since_keyframe += 1
+                    if v.get("full_file"):
+                        break
+                if since_keyframe >= KEYFRAME_INTERVAL or _delta_size(ops) > len(content) * KEYFRAME_DELTA_RATIO:
+                    entry["full_file"] = f"{date_str}.full.json.gz"
+            # else: unchanged - no payload, reconstructed from the previous version
+        else:
+            entry["full_file"] = f"{date_str}.full.json.gz"
+
+        if entry.get("full_file"):
+            self._write_payload(entry["full_file"], content)
+
+        versions.append(entry)
+        return entry
+
+    def append(self, url: str, title: str, content: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+        """הוספת גרסה חדשה להיסטוריה"""
+        with self._locked():
+            entry = self._append(url, title, content, content_hash)
+            self._save_manifest()
+        return entry
+
+    def list_versions(self, limit: int = 52) -> List[Dict[str, Any]]:
+        """רשימת גרסאות (החדשה ראשונה) - מטא-דאטה בלבד, ללא טעינת תוכן"""
+        versions = self._load_manifest()["versions"]
+        return [self._entry_to_version(e) for e in reversed(versions[-limit:] if limit else versions)]
+
+    def _find_index(self, date: Optional[str] = None, content_hash: Optional[str] = None) -> Optional[int]:
+        versions = self._load_manifest()["versions"]
+        if not versions:
+            return None
+        if date is None and content_hash is None:
+            return len(versions) - 1
+        for i in range(len(versions) - 1, -1, -1):
+            if (date and versions[i]["date"] == date) or (content_hash and versions[i]["content_hash"] == content_hash):
+                return i
+        return None
+
+    def get_version(self, date: Optional[str] = None, content_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """שחזור גרסה מלאה לפי תאריך או hash (ברירת מחדל: האחרונה)"""
+        index = self._find_index(date, content_hash)
+        if index is None:
+            return None
+        entry = self._manifest["versions"][index]
+        return self._entry_to_version(entry, ''.join(self._units_at(index)))
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self.get_version()
+
+    def get_history(self, limit: int = 52) -> List[Dict[str, Any]]:
+        """גרסאות מלאות (החדשה ראשונה) - שחזור במעבר אחד מה-keyframe הרלוונטי"""
+        versions = self._load_manifest()["versions"]
+        if not versions:
+            return []
+
+        first = max(0, len(versions) - limit) if limit else 0
+        units = self._units_at(first)
+        history = [self._entry_to_version(versions[first], ''.join(units))]
+        for i in range(first + 1, len(versions)):
+            units = self._advance(units, versions[i])
+            history.append(self._entry_to_version(versions[i], ''.join(units)))
+
+        history.reverse()
+        return history
+
+    def get_changes(self, date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """מה השתנה בגרסה מול הקודמת - קורא רק את קובץ ה-delta הקטן"""
+        index = self._find_index(date)
+        if index is None:
+            return None
+        entry = self._manifest["versions"][index]
+
+        added, removed = [], []
+        if entry.get("delta_file"):
+            for op, value in self._read_payload(entry["delta_file"]):
+                if op == "+":
+                    added.extend(u.strip() for u in value if u.strip())
+                elif op == "-":
+                    removed.extend(u.strip() for u in value if u.strip())
+
+        previous = self._manifest["versions"][index - 1] if index > 0 else None
+        return {
+            "source_id": self.source_id,
+            "date": entry["date"],
+            "previous_date": previous["date"] if previous else None,
+            "content_hash": entry["content_hash"],
+            "previous_hash": previous["content_hash"] if previous else None,
+            "has_changes": bool(previous) and previous["content_hash"] != entry["content_hash"],
+            "added": added,
+            "removed": removed
+        }
+
+    def prune(self, cutoff: datetime) -> int:
+        """מחיקת גרסאות ישנות מתאריך החיתוך - הגרסה הראשונה שנשארת הופכת ל-keyframe"""
+        with self._locked():
+            return self._prune(cutoff)
+
+    def _prune(self, cutoff: datetime) -> int:
+        versions = self._manifest["versions"]
+        keep_from = 0
+        while keep_from < len(versions) and datetime.strptime(versions[keep_from]["date"], "%Y-%m-%d") < cutoff:
+            keep_from += 1
+        if keep_from == 0:
+            return 0
+
+        deleted = 0
+        if keep_from < len(versions):
+            first_kept = versions[keep_from]
+            if not first_kept.get("full_file"):
+                content = ''.join(self._units_at(keep_from))
+                first_kept["full_file"] = f"{first_kept['date']}.full.json.gz"
+                self._write_payload(first_kept["full_file"], content)
+
+        for entry in versions[:keep_from]:
+            self._remove_payloads(entry)
+            deleted += 1
+
+        self._manifest["versions"] = versions[keep_from:]
+        self._save_manifest()
+        return deleted
+
+    def disk_usage(self) -> int:
+        """גודל ההיסטוריה על הדיסק בבתים"""
+        return sum(f.stat().st_size for f in self.history_dir.iterdir() if f.is_file())
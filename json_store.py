@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+JSON Document Store - In-memory JSON index with write-ahead log
+מאגר JSON בזיכרון עם יומן כתיבה (WAL) ו-checkpoint תקופתי
+
+קריאות מוגשות מהזיכרון (O(1) לפי מפתח, ללא קריאת דיסק).
+כל שינוי נרשם כשורה אחת ב-<file>.wal, והקובץ המלא נכתב מחדש רק ב-checkpoint.
+"""
+
+import os
+import copy
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Callable
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+# Rewrite the full JSON file after this many WAL records / seconds since the last checkpoint
+CHECKPOINT_OPS = 200
+CHECKPOINT_SECONDS = 60
+
+# How often reads stat the files for changes made by another process (writes always check)
+EXTERNAL_CHECK_SECONDS = 1.0
+
+
+@contextmanager
+def file_lock(path):
+    """
+    נעילה בלעדית בין תהליכים על קובץ נעילה (נוצר לפי הצורך)
+    הדשבורד ו-weekly_scanner מה-CLI כותבים לאותם קבצים - כל כתיבה עוברת דרכה
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10 seconds - keep waiting
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _file_id(path: Path):
+    try:
+        st = path.stat()
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class JsonDocumentStore:
+    """
+    מסמך JSON בודד עם אוספים ({collection: {key: value}}) המוחזק בזיכרון
+    מופע אחד לכל קובץ בתהליך - כל ה-managers שנוצרים לכל בקשה חולקים אותו
+    כתיבות ו-checkpoint רצים תחת נעילת קובץ, אחרי קריאת רשומות WAL של תהליכים אחרים
+    """
+
+    _instances: Dict[str, "JsonDocumentStore"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path, default_factory: Callable[[], Dict[str, Any]]) -> "JsonDocumentStore":
+        """קבלת המופע המשותף לקובץ (יצירה בפעם הראשונה)"""
+        key = str(Path(path).resolve())
+        with cls._instances_lock:
+            store = cls._instances.get(key)
+            if store is None:
+                store = cls(path, default_factory)
+                cls._instances[key] = store
+            return store
+
+    def __init__(self, path, default_factory: Callable[[], Dict[str, Any]]):
+        self.path = Path(path)
+        self.wal_path = self.path.with_name(self.path.name + ".wal")
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.default_factory = default_factory
+        # Thread lock only - read-modify-write sequences use transaction() / update(), which also lock the file
+        self.lock = threading.RLock()
+
+        self._data: Dict[str, Any] = {}
+        self._wal_ops = 0
+        self._wal_offset = 0  # bytes of the WAL already applied to _data
+        self._snapshot_id = None  # identity of the snapshot file _data was loaded from / written as
+        self._last_checkpoint = time.time()
+        self._last_external_check = 0.0
+        self._transaction_depth = 0  # > 0 while this process holds the file lock (see transaction)
+
+        with self.lock, file_lock(self.lock_path):
+            self._load_from_disk()
+        atexit.register(self.checkpoint)
+
+    # ============ Disk I/O (callers hold self.lock and the file lock) ============
+
+    def _load_from_disk(self):
+        """טעינת הקובץ המלא והרצת ה-WAL מעליו"""
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except Exception as e:
+                print(f"[Store] Error loading {self.path}: {e}")
+                self._data = self.default_factory()
+            self._snapshot_id = _file_id(self.path)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._data = self.default_factory()
+            self._write_checkpoint()
+
+        self._wal_ops = 0
+        self._wal_offset = 0
+        self._read_wal_tail()
+        self._last_external_check = time.time()
+
+    def _read_wal_tail(self):
+        """הרצת רשומות WAL שנוספו מאז הקריאה הקודמת (גם של תהליכים אחרים)"""
+        if not self.wal_path.exists():
+            return
+        with open(self.wal_path, 'rb') as f:
+            f.seek(self._wal_offset)
+            raw = f.read()
+        for line in raw.splitlines(keepends=True):
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete record")
+                self._apply(json.loads(line.decode('utf-8')))
+            except ValueError:
+                # Torn last record from a crash mid-append (no one else appends while we hold the lock)
+                print(f"[Store] Truncating torn record in {self.wal_path.name}")
+                with open(self.wal_path, 'r+b') as f:
+                    f.truncate(self._wal_offset)
+                break
+            self._wal_ops += 1
+            self._wal_offset += len(line)
+
+    def _sync_from_disk(self):
+        """עדכון הזיכרון מול הדיסק: checkpoint של תהליך אחר - טעינה מלאה, אחרת רק זנב ה-WAL"""
+        if _file_id(self.path) != self._snapshot_id:
+            print(f"[Store] {self.path.name} changed on disk - reloading")
+            self._load_from_disk()
+            return
+        wal_size = (_file_id(self.wal_path) or (None, None, 0))[2]
+        if wal_size < self._wal_offset:
+            self._load_from_disk()
+        elif wal_size > self._wal_offset:
+            self._read_wal_tail()
+
+    def _refresh_if_changed(self):
+        """טעינה מחדש אם תהליך אחר (למשל weekly_scanner מה-CLI) שינה את הקבצים - לקריאות בלבד"""
+        if self._transaction_depth:
+            return  # already synced under the file lock
+        now = time.time()
+        if now - self._last_external_check < EXTERNAL_CHECK_SECONDS:
+            return
+        self._last_external_check = now
+        wal_size = (_file_id(self.wal_path) or (None, None, 0))[2]
+        if _file_id(self.path) != self._snapshot_id or wal_size != self._wal_offset:
+            with file_lock(self.lock_path):
+                self._sync_from_disk()
+
+    def _apply(self, record: Dict[str, Any]):
+        op, collection = record["op"], record.get("c")
+        if op == "set":
+            self._data.setdefault(collection, {})[record["k"]] = record["v"]
+        elif op == "del":
+            self._data.get(collection, {}).pop(record["k"], None)
+
+    def _append_wal(self, record: Dict[str, Any]):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        with open(self.wal_path, 'ab') as f:
+            f.write(line)
+        self._wal_ops += 1
+        self._wal_offset += len(line)
+
+        if self._wal_ops >= CHECKPOINT_OPS or time.time() - self._last_checkpoint >= CHECKPOINT_SECONDS:
+            self._checkpoint_locked()
+
+    def _write_checkpoint(self):
+        self._data["last_updated"] = datetime.now().isoformat()
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._snapshot_id = _file_id(self.path)
+
+    def _checkpoint_locked(self):
+        self._write_checkpoint()
+        if self.wal_path.exists():
+            self.wal_path.unlink()
+        self._wal_ops = 0
+        self._wal_offset = 0
+        self._last_checkpoint = time.time()
+
+    @contextmanager
+    def transaction(self):
+        """
+        רצף קריאות וכתיבות (read-modify-write) אטומי בין תהליכים ובין threads:
+        נעילת הקובץ נלקחת פעם אחת והזיכרון מסונכרן מהדיסק לפני הקריאה הראשונה
+        """
+        with self.lock:
+            if self._transaction_depth:
+                self._transaction_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._transaction_depth -= 1
+                return
+            with file_lock(self.lock_path):
+                self._sync_from_disk()
+                self._transaction_depth = 1
+                try:
+                    yield self
+                finally:
+                    self._transaction_depth = 0
+
+    def checkpoint(self):
+        """כתיבת הקובץ המלא וריקון ה-WAL - כולל רשומות של תהליכים אחרים שנקראות קודם"""
+        with self.transaction():
+            if self._wal_ops == 0 and self.path.exists():
+                return
+            self._checkpoint_locked()
+
+    # ============ Reads (memory only) ============
+
+    def get(self, collection: str, key: str, default=None):
+        with self.lock:
+            self._refresh_if_changed()
+            value = self._data.get(collection, {}).get(key)
+            return copy.deepcopy(value) if value is not None else default
+
+    def contains(self, collection: str, key: str) -> bool:
+        with self.lock:
+            self._refresh_if_changed()
+            return key in self._data.get(collection, {})
+
+    def keys(self, collection: str) -> List[str]:
+        with self.lock:
+            self._refresh_if_changed()
+            return list(self._data.get(collection, {}).keys())
+
+    def values(self, collection: str) -> List[Any]:
+        with self.lock:
+            self._refresh_if_changed()
+            return copy.deepcopy(list(self._data.get(collection, {}).values()))
+
+    def count(self, collection: str) -> int:
+        with self.lock:
+            self._refresh_if_changed()
+            return len(self._data.get(collection, {}))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """עותק מלא של המסמך (לתאימות עם קוד שעובד על כל ה-index)"""
+        with self.lock:
+            self._refresh_if_changed()
+            return copy.deepcopy(self._data)
+
+    # ============ Writes (memory + WAL append, under the file lock) ============
+
+    def put(self, collection: str, key: str, value: Any):
+        with self.transaction():
+            value = copy.deepcopy(value)
+            self._data.setdefault(collection, {})[key] = value
+            self._append_wal({"op": "set", "c": collection, "k": key, "v": value})
+
+    def update(self, collection: str, key: str, fn: Callable[[Any], Any]):
+        """
+        read-modify-write של רשומה: fn(עותק הערך הנוכחי או None) -> ערך חדש (None = ללא שינוי)
+        מחזיר את הערך אחרי העדכון (None אם לא קיים ולא נוצר)
+        """
+        with self.transaction():
+            current = self._data.get(collection, {}).get(key)
+            value = fn(copy.deepcopy(current))
+            if value is None:
+                return copy.deepcopy(current)
+            self.put(collection, key, value)
+            return copy.deepcopy(value)
+
+    def delete(self, collection: str, key: str) -> bool:
+        with self.transaction():
+            if key not in self._data.get(collection, {}):
+                return False
+            self._data[collection].pop(key)
+            self._append_wal({"op": "del", "c": collection, "k": key})
+            return True
+
+    def update_document(self, fn: Callable[[Dict[str, Any]], Any]):
+        """read-modify-write של המסמך כולו: fn(עותק המסמך) -> מסמך חדש (None = ללא שינוי), נכתב כ-checkpoint"""
+        with self.transaction():
+            document = fn(copy.deepcopy(self._data))
+            if document is not None:
+                self._data = copy.deepcopy(document)
+                self._checkpoint_locked()
+
+    def replace(self, document: Dict[str, Any]):
+        """החלפת המסמך כולו (כתיבה מלאה מיידית)"""
+        with self.transaction():
+            self._data = copy.deepcopy(document)
+            self._checkpoint_locked()
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Keyword Clustering - vectorized deduplication of keyword research results
+איחוד מילות מפתח: נרמול ו-stemming עברי פעם אחת לכל מילה, וקטורי TF-IDF של n-grams תוויים
+בבת אחת, וגרף דמיון דליל (duplicate_detector.sparse_similarity) במקום השוואת כל זוג בלולאה.
+
+    python keyword_clustering.py --benchmark [--count 2000]
+"""
+
+import re
+import time
+import json
+import random
+import argparse
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List
+
+from nlp_service import HebrewNLPService
+
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from duplicate_detector import sparse_similarity, SKLEARN_AVAILABLE
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+
+BASE_DIR = Path(__file__).parent
+
+# Cosine similarity (char 2-4 gram TF-IDF of the stemmed phrase) for a pair to be a merge candidate.
+# A candidate merges only if the phrases differ by at most one near-identical word (spelling / inflection),
+# so an added or swapped modifier ("... בישראל", "... לרכב") stays its own topic.
+CLUSTER_SIMILARITY = 0.75
+
+# (suffix, replacement) at the end of Hebrew words, longest first (plural / feminine forms -> shared stem).
+# A bare final ה is not stripped ("עסקה" is a deal, "עסק" a business); -ות plurals map back to -ה
+# so "הלוואות" meets "הלוואה", while "עסקאות" stays apart from "עסקה" and "עסק".
+STEM_SUFFIXES = [('יות', ''), ('ים', ''), ('ות', 'ה'), ('ית', '')]
+MIN_STEM_LENGTH = 3
+
+# Fixed phrase pairs the clustering must keep apart / merge (python keyword_clustering.py --check)
+SEPARATE_TOPICS = [
+    ('הלוואה לרכישת עסקאות', 'הלוואה לרכישת עסק'),
+    ('הלוואה לרכישת עסקה', 'הלוואה לרכישת עסק'),
+    ('הלוואה לרכישת עסקאות', 'הלוואה לרכישת עסקה'),
+    ('הלוואה לרכב', 'הלוואה לדירה'),
+]
+SAME_TOPICS = [
+    ('הלוואה לעסקים', 'הלוואה לעסק'),
+    ('הלוואות לעסקים קטנים', 'הלוואה לעסקים קטנים'),
+    ('הלוואה מהירה', 'הלוואות מהירות'),
+]
+
+FINAL_LETTERS = str.maketrans('ךםןףץ', 'כמנפצ')
+
+# Semantic synonym groups (common Hebrew variations) - each group becomes one token
+SYNONYM_GROUPS = [
+    ['מיידית', 'מיידי', 'מהירה', 'מהיר', 'בזק', 'דחופה', 'דחוף', 'מידית'],
+    ['זולה', 'זול', 'זולות', 'זולים', 'במחיר נמוך', 'משתלמת'],
+    ['טובה', 'טוב', 'טובות', 'טובים', 'איכותית', 'מומלצת'],
+    ['קלה', 'קל', 'פשוטה', 'פשוט', 'נוחה', 'נוח'],
+    ['ללא', 'בלי', 'אין'],
+    ['עם', 'כולל'],
+]
+
+_HEBREW_RE = re.compile(r'[א-ת]')
+_TOKEN_RE = re.compile(r'\w+')
+
+_nlp = HebrewNLPService(use_advanced_nlp=False)
+
+_SYNONYM_PHRASES = {}   # multi-word synonyms, replaced before tokenizing
+
+
+@lru_cache(maxsize=50000)
+def stem_word(word: str) -> str:
+    """נרמול (normalize_hebrew) + הסרת סיומת רבים/נקבה + אותיות סופיות - נקרא פעם אחת לכל מילה"""
+    if not _HEBREW_RE.search(word):
+        return word.lower()
+    word = _nlp.normalize_hebrew(word).replace(' ', '')
+    for suffix, replacement in STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            word = word[:-len(suffix)] + replacement
+            break
+    return word.translate(FINAL_LETTERS)
+
+
+_SYNONYM_STEMS = {}     # stem -> group token, so "מהירות" maps like "מהירה"
+for _group_id, _group in enumerate(SYNONYM_GROUPS):
+    for _word in _group:
+        if ' ' in _word:
+            _SYNONYM_PHRASES[_word] = f"syn{_group_id}"
+        else:
+            _SYNONYM_STEMS.setdefault(stem_word(_word), f"syn{_group_id}")
+
+
+def phrase_forms(phrase: str, drop_stems=frozenset()):
+    """
+    (stem_key, canonical) - גזעים ממוינים בלי מילות מילת המפתח הראשית,
+    ו-canonical שבו כל מילה נרדפת מוחלפת בקבוצה שלה
+    """
+    text = phrase.lower()
+    for synonym, token in _SYNONYM_PHRASES.items():
+        if synonym in text:
+            text = text.replace(synonym, f" {token} ")
+    words = [w if w.startswith('syn') else stem_word(w) for w in _TOKEN_RE.findall(text)]
+    words = [w for w in words if w not in drop_stems] or words
+    stems = sorted(words)
+    canonical = sorted(_SYNONYM_STEMS.get(w, w) for w in words)
+    return ' '.join(stems), ' '.join(canonical)
+
+
+def _same_topic(tokens_a: List[str], tokens_b: List[str]) -> bool:
+    """אותן מילים (אחרי stemming ונרדפות), או הבדל של מילה אחת בכתיב קרוב (תו אחד מוחלף)"""
+    if len(tokens_a) != len(tokens_b):
+        return False
+    rest_a, rest_b = list(tokens_a), []
+    for token in tokens_b:
+        if token in rest_a:
+            rest_a.remove(token)
+        else:
+            rest_b.append(token)
+    if not rest_a:
+        return True
+    if len(rest_a) > 1:
+        return False
+    a, b = rest_a[0], rest_b[0]
+    if len(a) != len(b) or len(a) < MIN_STEM_LENGTH + 1:
+        return False
+    return sum(1 for x, y in zip(a, b) if x != y) <= 1
+
+
+def extract_keywords_from_phrase(phrase: str, main_keyword: str) -> str:
+    """Extract the unique part from a keyphrase (removing main keyword)"""
+    main_words = set(main_keyword.lower().split())
+    return ' '.join(w for w in phrase.lower().split() if w not in main_words)
+
+
+def _neighbours(canonical: List[str], threshold: float):
+    """גרף דמיון דליל (CSR) בין הביטויים, או None כש-scikit-learn לא זמין"""
+    if not SKLEARN_AVAILABLE or len(canonical) < 2 or not any(canonical):
+        return None
+    vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True)
+    matrix = vectorizer.fit_transform(canonical)
+    return sparse_similarity(matrix, threshold=threshold).tocsr()
+
+
+def cluster_keywords(keywords_with_source: List[Dict], main_keyword: str = '',
+                     threshold: float = CLUSTER_SIMILARITY) -> Dict:
+    """
+    keywords_with_source: [{'keyword', 'source'}] לפי סדר העדיפות (הראשון בכל קבוצה הוא ה-primary)
+    מחזיר {'clusters', 'final_keywords', 'unique_topics', 'stats'} באותו מבנה של /api/keywords/process
+    """
+    items, seen = [], set()
+    for item in keywords_with_source:
+        keyword = (item.get('keyword') or '').strip()
+        if keyword and keyword.lower() not in seen:
+            seen.add(keyword.lower())
+            items.append((keyword, item.get('source', 'unknown')))
+
+    unique_parts = [extract_keywords_from_phrase(keyword, main_keyword) for keyword, _ in items]
+    # Compared without the main keyword's words (by stem, so "הלוואות" drops for "הלוואה");
+    # a keyword that is only the main keyword is compared by its full form
+    main_stems = frozenset(stem_word(w) for w in _TOKEN_RE.findall(main_keyword.lower()))
+    forms = [phrase_forms(keyword, main_stems) for keyword, _ in items]
+    stem_keys = [form[0] for form in forms]
+    canonical = [form[1] for form in forms]
+    tokens = [form.split() for form in canonical]
+
+    graph = _neighbours(canonical, threshold)
+    clusters, cluster_of = [], {}
+    primary_by_canonical = {}
+
+    # Leader clustering over the sparse graph: each keyword joins the most similar earlier primary of the same topic
+    for i, (keyword, source) in enumerate(items):
+        leader, best = primary_by_canonical.get(canonical[i]), 1.0
+        if leader is None and graph is not None:
+            start, end = graph.indptr[i], graph.indptr[i + 1]
+            best = 0.0
+            for j, similarity in zip(graph.indices[start:end], graph.data[start:end]):
+                if j < i and j in cluster_of and similarity > best and _same_topic(tokens[i], tokens[j]):
+                    leader, best = j, similarity
+
+        if leader is None:
+            cluster_of[i] = len(clusters)
+            primary_by_canonical.setdefault(canonical[i], i)
+            clusters.append({
+                'primary': keyword,
+                'variants': [],
+                'type': 'unique',
+                'unique_part': unique_parts[i],
+                'source': source  # Track if from autocomplete or related
+            })
+            continue
+
+        cluster = clusters[cluster_of[leader]]
+        cluster['variants'].append(keyword)
+        cluster['type'] = 'plural' if stem_keys[i] == stem_keys[leader] else 'semantic'
+
+    final_keywords = [c['primary'] for c in clusters]
+    return {
+        'clusters': clusters,
+        'final_keywords': final_keywords,
+        'unique_topics': [c['unique_part'] for c in clusters if c['unique_part']],
+        'stats': {
+            'input_count': len(keywords_with_source),
+            'output_count': len(final_keywords),
+            'plural_merged': sum(1 for c in clusters if c['type'] == 'plural'),
+            'semantic_merged': sum(1 for c in clusters if c['type'] == 'semantic'),
+            'from_autocomplete': sum(1 for c in clusters if c['source'] == 'autocomplete'),
+            'from_related': sum(1 for c in clusters if c['source'] == 'related')
+        }
+    }
+
+
+# ============ Benchmark ============
+
+def _legacy_cluster(keywords_with_source: List[Dict], main_keyword: str) -> List[Dict]:
+    """The previous pairwise loop of /api/keywords/process (for timing comparison only)"""
+    plural_suffixes = ['ות', 'ים', 'יות', 'אות']
+
+    def get_base_form(word):
+        for suffix in plural_suffixes:
+            if word.endswith(suffix) and len(word) > len(suffix) + 2:
+                return word[:-len(suffix)]
+        return word
+
+    def find_synonym_group(word):
+        for i, group in enumerate(SYNONYM_GROUPS):
+            if word.lower() in [s.lower() for s in group]:
+                return i
+        return None
+
+    clusters, processed = [], set()
+    for item in keywords_with_source:
+        kw = item['keyword'].strip()
+        if not kw or kw.lower() in processed:
+            continue
+        unique_part = extract_keywords_from_phrase(kw, main_keyword)
+        base_form = get_base_form(unique_part)
+        for cluster in clusters:
+            cluster_base = get_base_form(cluster['primary'])
+            if base_form == cluster_base or unique_part == cluster_base:
+                cluster['variants'].append(kw)
+                break
+            group = find_synonym_group(unique_part)
+            if group is not None and group == find_synonym_group(cluster['primary']):
+                cluster['variants'].append(kw)
+                break
+        else:
+            clusters.append({'primary': kw, 'variants': []})
+        processed.add(kw.lower())
+    return clusters
+
+
+def _benchmark_keywords(count: int) -> List[Dict]:
+    """
+    מילות מפתח שנשמרו מסריקות SERP/השלמות (fetched_keywords בכל page_info.json), מורחבות עד count
+    עם וריאציות רבים/נרדפות/סדר מילים כמו שמגיעות מריצות SERP מרובות
+    """
+    keywords = []
+    for info_path in BASE_DIR.glob('דפים לשינוי/*/*/page_info.json'):
+        try:
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except Exception:
+            continue
+        fetched = info.get('fetched_keywords')
+        if info.get('keyword'):
+            keywords.append({'keyword': info['keyword'], 'source': 'related'})
+        if isinstance(fetched, dict):
+            for cluster in fetched.get('clusters', []):
+                for keyword in [cluster.get('primary', '')] + cluster.get('variants', []):
+                    keywords.append({'keyword': keyword, 'source': cluster.get('source', 'autocomplete')})
+
+    rng = random.Random(7)
+    modifiers = ['מהירה', 'מהיר', 'זולה', 'בלי ריבית', 'ללא ריבית', 'לעסקים', 'לעסק', 'בערבות המדינה',
+                 'אונליין', 'מומלצת', 'טובה', 'להון חוזר', 'לרכב', 'לדירה', 'מחשבון', 'תנאים', 'השוואה']
+    base = [item['keyword'] for item in keywords] or ['הלוואה']
+    while len(keywords) < count:
+        words = rng.choice(base).split() + [rng.choice(modifiers)]
+        roll = rng.random()
+        if roll < 0.2:
+            rng.shuffle(words)
+        elif roll < 0.4:
+            words = [w + 'ות' if w.endswith('ה') is False and len(w) > 3 and rng.random() < 0.3 else w for w in words]
+        keywords.append({'keyword': ' '.join(words), 'source': rng.choice(['autocomplete', 'related'])})
+    return keywords[:count]
+
+
+def check_fixed_cases(main_keyword: str = 'הלוואה') -> List[str]:
+    """SEPARATE_TOPICS / SAME_TOPICS מול cluster_keywords - מחזיר רשימת כשלים (ריקה = תקין)"""
+    failures = []
+    for pairs, expect_same in ((SEPARATE_TOPICS, False), (SAME_TOPICS, True)):
+        for first, second in pairs:
+            result = cluster_keywords([{'keyword': first, 'source': 'related'},
+                                       {'keyword': second, 'source': 'related'}], main_keyword)
+            if (len(result['clusters']) == 1) != expect_same:
+                failures.append(f"{'merged' if not expect_same else 'split'}: {first} / {second}")
+    return failures
+
+
+def benchmark(count: int = 2000, main_keyword: str = 'הלוואה'):
+    keywords = _benchmark_keywords(count)
+    print(f"[Keywords] Benchmark on {len(keywords)} keywords (main keyword: {main_keyword})")
+
+    started = time.time()
+    legacy = _legacy_cluster(keywords, main_keyword)
+    legacy_seconds = time.time() - started
+
+    stem_word.cache_clear()
+    started = time.time()
+    result = cluster_keywords(keywords, main_keyword)
+    new_seconds = time.time() - started
+
+    print(f"[Keywords] Legacy pairwise loop: {legacy_seconds:.2f}s -> {len(legacy)} clusters")
+    print(f"[Keywords] Vectorized engine:    {new_seconds:.2f}s -> {result['stats']['output_count']} clusters "
+          f"({result['stats']['plural_merged']} plural, {result['stats']['semantic_merged']} semantic)")
+    merged = [c for c in result['clusters'] if c['variants']]
+    for cluster in merged[:8]:
+        print(f"  {cluster['type']:<8} {cluster['primary']}  <=  {', '.join(cluster['variants'][:4])}")
+    return {'legacy_seconds': legacy_seconds, 'seconds': new_seconds, 'stats': result['stats']}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keyword clustering')
+    parser.add_argument('--benchmark', action='store_true', help='Compare with the legacy pairwise loop')
+    parser.add_argument('--count', type=int, default=2000, help='Number of benchmark keywords')
+    parser.add_argument('--check', action='store_true', help='Verify the fixed same/separate topic pairs')
+    args = parser.parse_args()
+    if args.check:
+        failures = check_fixed_cases()
+        for failure in failures:
+            print(f"[Keywords] FAIL {failure}")
+        print(f"[Keywords] Fixed cases: {len(failures)} failures")
+        raise SystemExit(1 if failures else 0)
+    elif args.benchmark:
+        benchmark(args.count)
+    else:
+        parser.print_help()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+LLM Result Cache - content-addressed cache for Ollama responses
+מטמון תשובות LLM לפי hash של הבקשה המלאה (מודל + prompt + אפשרויות + גרסת prompt)
+
+אותו תוכן עם אותו prompt ואותו מודל מוגש מהזיכרון בלי קריאה ל-Ollama.
+שינוי בתבנית ה-prompt משנה את ה-hash ולכן מבטל את הרשומות הישנות אוטומטית.
+פינוי LRU לפי מספר רשומות ולפי גודל כולל; הרשומות נשמרות ב-cache/llm_results.json.
+"""
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from json_store import JsonDocumentStore
+
+
+BASE_DIR = Path(__file__).parent
+CACHE_FILE = BASE_DIR / "cache" / "llm_results.json"
+
+LLM_CACHE_MAX_ENTRIES = 2000
+LLM_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class LLMResultCache:
+    """
+    מטמון LRU בזיכרון עם שמירה לדיסק דרך JsonDocumentStore
+    מפתח = sha256 של הבקשה (ראו make_key), ערך = טקסט התשובה הגולמי של המודל
+    """
+
+    def __init__(self, path=CACHE_FILE, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, str]" = OrderedDict()  # least recently used first
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+        self._store = JsonDocumentStore.open(path, lambda: {'results': {}})
+        stored = [(key, self._store.get('results', key)) for key in self._store.keys('results')]
+        stored = [(key, entry) for key, entry in stored if entry and isinstance(entry.get('response'), str)]
+        stored.sort(key=lambda item: item[1].get('created_at', ''))
+        with self._lock:
+            for key, entry in stored:
+                self._entries[key] = entry['response']
+                self._bytes += self._size(key, entry['response'])
+            evicted = self._evict()
+        for key in evicted:
+            self._store.delete('results', key)
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any], version: Any = None) -> str:
+        """hash של כל מה שקובע את התשובה - מודל, prompt, format, options וגרסת התבנית"""
+        material = json.dumps({'v': version, 'payload': payload}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _size(key: str, response: str) -> int:
+        return len(key) + len(response.encode('utf-8'))
+
+    def _evict(self):
+        """פינוי הרשומות הישנות ביותר עד שהמטמון בגבולות (נקרא עם ה-lock) - מחזיר את המפתחות שפונו"""
+        evicted = []
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, response = self._entries.popitem(last=False)
+            self._bytes -= self._size(key, response)
+            evicted.append(key)
+        self.evictions += len(evicted)
+        return evicted
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return response
+
+        # Another process (dashboard / weekly_scanner) may have stored it since we loaded
+        entry = self._store.get('results', key)
+        if not entry or not isinstance(entry.get('response'), str):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry['response']
+                self._bytes += self._size(key, entry['response'])
+            self.hits += 1
+            evicted = self._evict()
+        for old_key in evicted:
+            self._store.delete('results', old_key)
+        return entry['response']
+
+    def put(self, key: str, response: str, model: str = None):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._size(key, previous)
+            self._entries[key] = response
+            self._bytes += self._size(key, response)
+            evicted = self._evict()
+
+        self._store.put('results', key, {
+            'response': response,
+            'model': model,
+            'created_at': datetime.now().isoformat()
+        })
+        for old_key in evicted:
+            self._store.delete('results', old_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        self._store.replace({'results': {}})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMResultCache:
+    """המטמון המשותף לכל ה-summarizers בתהליך"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResultCache()
+        return _cache
@@ -5,8 +5,73 @@ Local Scraper with Playwright/Chrome
 """
 
 import re
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+
+# Main-content selectors - used both for extraction and as readiness signals
+CONTENT_SELECTORS = [
+    'main', 'article', '.content', '.main-content',
+    '#content', '#main', '.page-content', '.entry-content',
+    '[role="main"]', '.post-content', '.article-content',
+    '.loan-details', '.product-info', '.terms-conditions'
+]
+
+# Third-party analytics / tracking hosts that never carry page content
+TRACKER_DOMAINS = [
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net',
+    'googlesyndication.com', 'googleadservices.com', 'facebook.net',
+    'facebook.com', 'connect.facebook.net', 'hotjar.com', 'clarity.ms',
+    'mouseflow.com', 'crazyegg.com', 'taboola.com', 'outbrain.com',
+    'criteo.com', 'adnxs.com', 'tiktok.com', 'linkedin.com',
+    'bing.com', 'yandex.ru', 'newrelic.com', 'nr-data.net',
+    'quantserve.com', 'scorecardresearch.com', 'glassboxdigital.io'
+]
+
+# Default fetch profile - block heavy resources and wait on content instead of sleeping
+DEFAULT_FETCH_PROFILE = {
+    'block_resources': True,
+    'blocked_resource_types': ['image', 'media', 'font'],
+    'block_trackers': True,
+    'tracker_domains': TRACKER_DOMAINS,
+    'wait_until': 'domcontentloaded',
+    'ready_selectors': CONTENT_SELECTORS,
+    'ready_min_chars': 100,
+    'ready_timeout': 8000,   # ms to wait for a readiness selector
+    'settle_ms': 300         # short settle after content is ready (was a fixed 2000ms)
+}
+
+# Profile used when a domain does not render properly with blocking enabled
+FULL_FETCH_PROFILE = {
+    'block_resources': False,
+    'block_trackers': False,
+    'wait_until': 'networkidle',
+    'ready_selectors': CONTENT_SELECTORS,
+    'ready_min_chars': 100,
+    'ready_timeout': 8000,
+    'settle_ms': 1000
+}
+
+# Readiness wait (ms) for domains where no readiness selector matched on the last fetch
+NO_SELECTOR_READY_TIMEOUT = 2000
+
+
+def get_profile_domain(url: str) -> str:
+    """מחזיר דומיין (ללא www) לשמירת פרופיל סריקה"""
+    try:
+        return urlparse(url).netloc.lower().replace('www.', '')
+    except Exception:
+        return ''
+
+
+def build_fetch_profile(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """מיזוג פרופיל סריקה עם ברירת המחדל"""
+    profile = dict(DEFAULT_FETCH_PROFILE)
+    if overrides:
+        profile.update({k: v for k, v in overrides.items() if v is not None})
+    return profile
 
 
 class PlaywrightScraper:
@@ -15,10 +80,11 @@ class PlaywrightScraper:
     פותח דפדפן אמיתי עם User-Agent אמיתי
     """
     
-    def __init__(self):
+    def __init__(self, fetch_profile: Optional[Dict[str, Any]] = None):
         self.browser = None
         self.context = None
         self.timeout = 30000  # 30 seconds per page
+        self.fetch_profile = build_fetch_profile(fetch_profile)
     
     def _get_real_user_agent(self) -> str:
         """מחזיר User-Agent אמיתי של Chrome על Windows"""
@@ -57,6 +123,73 @@ class PlaywrightScraper:
         
         return False
     
+    def _install_request_blocking(self, page, url: str, profile: Dict[str, Any], stats: Dict[str, int]):
+        """חסימת תמונות, מדיה, פונטים ו-trackers דרך request interception"""
+        block_types = set(profile.get('blocked_resource_types', [])) if profile.get('block_resources') else set()
+        tracker_domains = profile.get('tracker_domains', []) if profile.get('block_trackers') else []
+        
+        if not block_types and not tracker_domains:
+            return
+        
+        page_domain = get_profile_domain(url)
+        
+        def handle_route(route):
+            request = route.request
+            try:
+                if request.resource_type in block_types:
+                    stats['blocked'] += 1
+                    return route.abort()
+                
+                if tracker_domains:
+                    host = urlparse(request.url).netloc.lower()
+                    # Never block the lender's own domain
+                    if not host.endswith(page_domain) and any(
+                        host == d or host.endswith('.' + d) for d in tracker_domains
+                    ):
+                        stats['blocked'] += 1
+                        return route.abort()
+                
+                stats['allowed'] += 1
+                return route.continue_()
+            except Exception:
+                # Route may already be handled if the page navigated away
+                pass
+        
+        page.route('**/*', handle_route)
+    
+    def _wait_for_content(self, page, profile: Dict[str, Any]) -> Optional[str]:
+        """
+        המתנה לסלקטור תוכן במקום sleep קבוע
+        מחזיר את הסלקטור שהתמלא ראשון (או None אם לא נמצא)
+        """
+        selectors = profile.get('ready_selectors') or CONTENT_SELECTORS
+        min_chars = profile.get('ready_min_chars', 100)
+        
+        try:
+            handle = page.wait_for_function(
+                """([selectors, minChars]) => {
+                    for (const sel of selectors) {
+                        const el = document.querySelector(sel);
+                        if (el && el.innerText && el.innerText.trim().length > minChars) {
+                            return sel;
+                        }
+                    }
+                    return false;
+                }""",
+                arg=[selectors, min_chars],
+                timeout=profile.get('ready_timeout', 8000)
+            )
+            matched = handle.json_value()
+        except Exception as e:
+            print(f"[LocalScraper] No readiness selector matched, continuing: {e}")
+            matched = None
+        
+        settle_ms = profile.get('settle_ms', 0)
+        if settle_ms:
+            page.wait_for_timeout(settle_ms)
+        
+        return matched or None
+    
     def _extract_content(self, page) -> Dict[str, str]:
         """חילוץ תוכן מהדף - משופר לחילוץ נתונים פיננסיים"""
         try:
@@ -122,14 +255,7 @@ class PlaywrightScraper:
             }""")
             
             # Try to get main content first
-            content = page.evaluate("""() => {
-                const mainSelectors = [
-                    'main', 'article', '.content', '.main-content',
-                    '#content', '#main', '.page-content', '.entry-content',
-                    '[role="main"]', '.post-content', '.article-content',
-                    '.loan-details', '.product-info', '.terms-conditions'
-                ];
-                
+            content = page.evaluate("""(mainSelectors) => {
                 for (const sel of mainSelectors) {
                     const el = document.querySelector(sel);
                     if (el && el.innerText.trim().length > 100) {
@@ -139,7 +265,7 @@ class PlaywrightScraper:
                 
                 // Fallback to body
                 return document.body.innerText.trim();
-            }""")
+            }""", CONTENT_SELECTORS)
             
             # Combine structured data with content
             if structured_data:
@@ -159,13 +285,15 @@ class PlaywrightScraper:
             print(f"[LocalScraper] Error extracting content: {e}")
             return {'title': '', 'content': ''}
     
-    def scrape(self, url: str, headless: bool = False) -> Dict[str, Any]:
+    def scrape(self, url: str, headless: bool = False,
+               fetch_profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         סריקת URL עם Chrome מקומי
         
         Args:
             url: הכתובת לסריקה
             headless: True = רקע, False = חלון גלוי
+            fetch_profile: פרופיל סריקה (חסימת משאבים, סלקטורי מוכנות) - דורס את פרופיל ברירת המחדל
             
         Returns:
             {
@@ -175,9 +303,13 @@ class PlaywrightScraper:
                 'url': str,
                 'method': 'local_chrome',
                 'timestamp': str,
+                'fetch_stats': {...},
                 'error': str (if failed)
             }
         """
+        profile = dict(self.fetch_profile)
+        if fetch_profile:
+            profile.update(fetch_profile)
         try:
             from playwright.sync_api import sync_playwright
         except ImportError:
@@ -187,7 +319,10 @@ class PlaywrightScraper:
                 'method': 'local_chrome'
             }
         
-        print(f"[LocalScraper] Scraping {url} (headless={headless})...")
+        print(f"[LocalScraper] Scraping {url} (headless={headless}, block_resources={profile.get('block_resources')})...")
+        
+        started = time.time()
+        stats = {'blocked': 0, 'allowed': 0}
         
         try:
             with sync_playwright() as p:
@@ -212,17 +347,21 @@ class PlaywrightScraper:
                 
                 # Create page
                 page = context.new_page()
+                self._install_request_blocking(page, url, profile, stats)
                 
                 # Navigate to URL
+                wait_until = profile.get('wait_until', 'domcontentloaded')
                 try:
-                    page.goto(url, wait_until='networkidle', timeout=self.timeout)
+                    page.goto(url, wait_until=wait_until, timeout=self.timeout)
                 except Exception as nav_error:
+                    if wait_until == 'domcontentloaded':
+                        raise
                     # Try with domcontentloaded if networkidle times out
-                    print(f"[LocalScraper] networkidle failed, trying domcontentloaded: {nav_error}")
+                    print(f"[LocalScraper] {wait_until} failed, trying domcontentloaded: {nav_error}")
                     page.goto(url, wait_until='domcontentloaded', timeout=self.timeout)
                 
-                # Wait a bit for dynamic content
-                page.wait_for_timeout(2000)
+                # Wait for content readiness instead of a fixed sleep
+                ready_selector = self._wait_for_content(page, profile)
                 
                 # Extract content
                 extracted = self._extract_content(page)
@@ -232,6 +371,16 @@ class PlaywrightScraper:
                 # Close browser
                 browser.close()
                 
+                fetch_stats = {
+                    'elapsed_ms': int((time.time() - started) * 1000),
+                    'blocked_requests': stats['blocked'],
+                    'allowed_requests': stats['allowed'],
+                    'ready_selector': ready_selector,
+                    'block_resources': bool(profile.get('block_resources')),
+                    'block_trackers': bool(profile.get('block_trackers')),
+                    'wait_until': wait_until
+                }
+                
                 # Check if blocked
                 if self._is_blocked(content, title):
                     print(f"[LocalScraper] Detected blocking on {url}")
@@ -239,7 +388,8 @@ class PlaywrightScraper:
                         'success': False,
                         'error': 'הדף חסום או דורש אימות',
                         'method': 'local_chrome',
-                        'blocked': True
+                        'blocked': True,
+                        'fetch_stats': fetch_stats
                     }
                 
                 # Check if we got meaningful content
@@ -247,10 +397,12 @@ class PlaywrightScraper:
                     return {
                         'success': False,
                         'error': 'לא נמצא תוכן בדף',
-                        'method': 'local_chrome'
+                        'method': 'local_chrome',
+                        'fetch_stats': fetch_stats
                     }
                 
-                print(f"[LocalScraper] Success: {len(content)} chars extracted")
+                print(f"[LocalScraper] Success: {len(content)} chars extracted in {fetch_stats['elapsed_ms']}ms "
+                      f"({stats['blocked']} requests blocked)")
                 
                 return {
                     'success': True,
@@ -258,7 +410,8 @@ class PlaywrightScraper:
                     'title': title,
                     'url': url,
                     'method': 'local_chrome',
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': datetime.now().isoformat(),
+                    'fetch_stats': fetch_stats
                 }
                 
         except Exception as e:
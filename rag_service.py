@@ -98,10 +98,12 @@ class ChunkingService:
                 'word_count': len(chunk_words)
             })
             
+            # Last chunk reached the end of the text
+            if end >= len(words):
+                break
+            
             # Move start with overlap
             start = end - self.overlap
-            if start >= len(words):
-                break
             chunk_idx += 1
         
         return chunks
@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+"""
+Rank History Store - site-wide SQLite time series of rank checks
+היסטוריית דירוגים לכל האתר בטבלה אחת: שורה לכל דף + מילת מפתח + יום
+
+מחליף את rank_history שבקבצי seo_history.json של כל דף (שם כל שמירה קראה וכתבה את כל הקובץ).
+שאילתות מגמה, מיקום ממוצע ו-movers/losers רצות על כל הדפים בלי לפתוח תיקיות.
+בפתיחה הראשונה ההיסטוריה הקיימת מיובאת מ-seo_history.json (הקבצים עצמם לא משתנים).
+
+    python rank_history_store.py --movers 7
+    python rank_history_store.py --benchmark
+"""
+
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable
+
+
+BASE_DIR = Path(__file__).parent
+DB_FILE = BASE_DIR / "generated_data" / "rank_history.db"
+CONFIG_FILE = BASE_DIR / "config.json"
+
+# Not ranked (position NULL) counts as this position when computing changes
+UNRANKED_POSITION = 21
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ranks (
+    page TEXT NOT NULL,
+    keyword_norm TEXT NOT NULL,
+    day TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    checked_at TEXT NOT NULL,
+    position INTEGER,
+    ai_position INTEGER,
+    url_checked TEXT,
+    source TEXT,
+    PRIMARY KEY (page, keyword_norm, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ranks_keyword_day ON ranks (keyword_norm, day);
+CREATE INDEX IF NOT EXISTS ranks_day ON ranks (day);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+UPSERT = """
+INSERT INTO ranks (page, keyword_norm, day, keyword, checked_at, position, ai_position, url_checked, source)
+VALUES (:page, :keyword_norm, :day, :keyword, :checked_at, :position, :ai_position, :url_checked, :source)
+ON CONFLICT (page, keyword_norm, day) DO UPDATE SET
+    keyword = excluded.keyword, checked_at = excluded.checked_at, position = excluded.position,
+    ai_position = excluded.ai_position, url_checked = excluded.url_checked, source = excluded.source
+"""
+
+
+def normalize_keyword(keyword: str) -> str:
+    return ' '.join((keyword or '').split()).lower()
+
+
+def page_key(page_folder) -> str:
+    """מזהה דף = תיקיית הדף יחסית לשורש הפרויקט, עם /"""
+    path = Path(page_folder)
+    if path.is_absolute():
+        try:
+            path = path.relative_to(BASE_DIR)
+        except ValueError:
+            pass
+    return str(path).replace('\\', '/')
+
+
+def _row(page: str, entry: Dict) -> Dict:
+    checked_at = entry.get('date') or datetime.now().isoformat()
+    return {
+        'page': page,
+        'keyword_norm': normalize_keyword(entry['keyword']),
+        'day': checked_at[:10],
+        'keyword': entry['keyword'].strip(),
+        'checked_at': checked_at,
+        'position': entry.get('position'),
+        'ai_position': entry.get('ai_position'),
+        'url_checked': entry.get('url_checked'),
+        'source': entry.get('source')
+    }
+
+
+class RankHistoryStore:
+    """
+    טבלת ranks עם מפתח (page, keyword_norm, day) - בדיקה נוספת באותו יום מעדכנת את השורה
+    """
+
+    def __init__(self, path=DB_FILE, migrate: bool = True):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if migrate and self._meta('json_migrated') is None:
+            self.migrate_from_json()
+
+    def _meta(self, key: str, value: str = None) -> Optional[str]:
+        with self._lock, self._conn:
+            if value is not None:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+                return value
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return row['value'] if row else None
+
+    def _query(self, sql: str, params=()) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    # ============ Writes ============
+
+    def record(self, page_folder, entries: List[Dict]) -> Dict[str, Optional[int]]:
+        """
+        שמירת בדיקות דירוג לדף (entries: [{'keyword', 'position', 'ai_position', 'url_checked', 'source'}])
+        מחזיר את המיקום האחרון לפני היום לכל מילת מפתח (keyword_norm -> position)
+        """
+        page = page_key(page_folder)
+        rows = [_row(page, entry) for entry in entries]
+        if not rows:
+            return {}
+        today = rows[0]['day']
+        placeholders = ','.join('?' * len(rows))
+        with self._lock, self._conn:
+            previous = {
+                row['keyword_norm']: row['position'] for row in self._conn.execute(f"""
+                    SELECT r.keyword_norm, r.position FROM ranks r
+                    JOIN (SELECT keyword_norm, MAX(day) AS day FROM ranks
+                          WHERE page = ? AND day < ? AND keyword_norm IN ({placeholders})
+                          GROUP BY keyword_norm) last
+                      ON r.keyword_norm = last.keyword_norm AND r.day = last.day
+                    WHERE r.page = ?""", [page, today] + [row['keyword_norm'] for row in rows] + [page])
+            }
+            self._conn.executemany(UPSERT, rows)
+        return previous
+
+    def record_many(self, rows: Iterable[Dict]) -> int:
+        """הכנסה מרוכזת: rows = [{'page', 'keyword', 'date', 'position', ...}] בטרנזקציה אחת"""
+        prepared = [_row(page_key(row['page']), row) for row in rows]
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT, prepared)
+        return len(prepared)
+
+    def migrate_from_json(self, page_folders: Iterable = None) -> int:
+        """
+        ייבוא rank_history מכל seo_history.json (ברירת מחדל: כל תיקיות הדפים ב-editable_pages)
+        אפשר להריץ שוב - שורות קיימות מתעדכנות לפי (דף, מילת מפתח, יום)
+        """
+        if page_folders is None:
+            page_folders = []
+            try:
+                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                    editable = json.load(f).get('paths', {}).get('editable_pages', {})
+                folders = editable.values() if isinstance(editable, dict) else editable
+                for folder in folders:
+                    page_folders.extend(p.parent for p in (BASE_DIR / folder).glob('*/seo_history.json'))
+            except Exception as e:
+                print(f"[Rank History] Could not list page folders: {e}")
+
+        rows = []
+        for folder in page_folders:
+            history_path = BASE_DIR / folder / 'seo_history.json'
+            if not history_path.exists():
+                continue
+            try:
+                with open(history_path, 'r', encoding='utf-8') as f:
+                    history = json.load(f)
+            except Exception as e:
+                print(f"[Rank History] Skipping {history_path}: {e}")
+                continue
+            # Chronological - the last entry of a day wins, as it did in the JSON files
+            for entry in history.get('rank_history', []):
+                if entry.get('keyword') and entry.get('date'):
+                    rows.append(dict(entry, page=folder))
+
+        count = self.record_many(rows)
+        self._meta('json_migrated', datetime.now().isoformat())
+        print(f"[Rank History] Migrated {count} entries from seo_history.json")
+        return count
+
+    # ============ Queries ============
+
+    def trend(self, page=None, keyword: str = None, days: int = 90) -> List[Dict]:
+        """סדרת מיקומים לפי יום - לדף, למילת מפתח או לשניהם"""
+        since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        where, params = ["day >= ?"], [since]
+        if page is not None:
+            where.append("page = ?")
+            params.append(page_key(page))
+        if keyword:
+            where.append("keyword_norm = ?")
+            params.append(normalize_keyword(keyword))
+        return self._query(f"""
+            SELECT page, keyword, day, position, ai_position FROM ranks
+            WHERE {' AND '.join(where)} ORDER BY page, keyword_norm, day""", params)
+
+    def site_trend(self, days: int = 90) -> List[Dict]:
+        """לכל יום: מיקום ממוצע, כמה נבדקו / דורגו / בטופ 3 / בטופ 10 / ב-AI Mode"""
+        since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        return self._query("""
+            SELECT day,
+                   ROUND(AVG(position), 2) AS average_position,
+                   COUNT(*) AS checked,
+                   COUNT(position) AS ranked,
+                   SUM(position <= 3) AS top3,
+                   SUM(position <= 10) AS top10,
+                   COUNT(ai_position) AS in_ai_mode
+            FROM ranks WHERE day >= ? GROUP BY day ORDER BY day""", (since,))
+
+    def average_positions(self, days: int = 30, page=None) -> List[Dict]:
+        """מיקום ממוצע / הטוב ביותר לכל דף + מילת מפתח בתקופה (הטובים קודם)"""
+        since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        where, params = "day >= ?", [since]
+        if page is not None:
+            where += " AND page = ?"
+            params.append(page_key(page))
+        return self._query(f"""
+            SELECT page, MAX(keyword) AS keyword,
+                   ROUND(AVG(position), 2) AS average_position,
+                   MIN(position) AS best_position,
+                   COUNT(position) AS ranked_checks,
+                   COUNT(*) AS checks
+            FROM ranks WHERE {where}
+            GROUP BY page, keyword_norm
+            ORDER BY average_position IS NULL, average_position""", params)
+
+    def movers(self, days: int = 7, limit: int = 20) -> Dict[str, List[Dict]]:
+        """
+        השוואת הבדיקה האחרונה לבדיקה האחרונה שלפני `days` ימים, לכל דף + מילת מפתח
+        change חיובי = עלייה בדירוג; דף שלא דורג נחשב UNRANKED_POSITION
+        """
+        baseline = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        unranked = UNRANKED_POSITION
+        rows = self._query(f"""
+            WITH cur_day AS (
+                SELECT page, keyword_norm, MAX(day) AS day FROM ranks GROUP BY page, keyword_norm
+            ), base_day AS (
+                SELECT page, keyword_norm, MAX(day) AS day FROM ranks WHERE day <= ? GROUP BY page, keyword_norm
+            )
+            SELECT cur.page, cur.keyword, base.day AS previous_day, cur.day,
+                   base.position AS previous_position, cur.position,
+                   COALESCE(base.position, {unranked}) - COALESCE(cur.position, {unranked}) AS change
+            FROM cur_day c
+            JOIN base_day b ON b.page = c.page AND b.keyword_norm = c.keyword_norm AND b.day < c.day
+            JOIN ranks cur ON cur.page = c.page AND cur.keyword_norm = c.keyword_norm AND cur.day = c.day
+            JOIN ranks base ON base.page = b.page AND base.keyword_norm = b.keyword_norm AND base.day = b.day
+            WHERE COALESCE(base.position, {unranked}) != COALESCE(cur.position, {unranked})
+            ORDER BY change DESC""", (baseline,))
+        winners = [row for row in rows if row['change'] > 0]
+        losers = sorted((row for row in rows if row['change'] < 0), key=lambda row: row['change'])
+        return {'winners': winners[:limit], 'losers': losers[:limit], 'changed': len(rows)}
+
+    def latest(self, page=None) -> List[Dict]:
+        """הבדיקה האחרונה לכל דף + מילת מפתח"""
+        where, params = "", []
+        if page is not None:
+            where, params = "WHERE page = ?", [page_key(page)]
+        return self._query(f"""
+            SELECT r.page, r.keyword, r.day, r.checked_at, r.position, r.ai_position, r.url_checked
+            FROM ranks r JOIN (
+                SELECT page, keyword_norm, MAX(day) AS day FROM ranks {where} GROUP BY page, keyword_norm
+            ) last ON r.page = last.page AND r.keyword_norm = last.keyword_norm AND r.day = last.day
+            ORDER BY r.page, r.keyword_norm""", params)
+
+    def stats(self) -> Dict[str, Any]:
+        row = self._query("""
+            SELECT COUNT(*) AS entries, COUNT(DISTINCT page) AS pages,
+                   COUNT(DISTINCT keyword_norm) AS keywords, MIN(day) AS first_day, MAX(day) AS last_day
+            FROM ranks""")[0]
+        row['migrated_at'] = self._meta('json_migrated')
+        return row
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_rank_store() -> RankHistoryStore:
+    """המאגר המשותף בתהליך (מייבא את seo_history.json בפתיחה הראשונה)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RankHistoryStore()
+        return _store
+
+
+def benchmark(pages: int = 200, keywords_per_page: int = 3, days: int = 365, path: str = None):
+    """Synthetic site history (pages x keywords x daily checks) - write and query timings"""
+    import random
+    import tempfile
+
+    path = Path(path or tempfile.mkdtemp()) / 'rank_history_bench.db'
+    if path.exists():
+        path.unlink()
+    store = RankHistoryStore(path, migrate=False)
+    rng = random.Random(1)
+    start_day = datetime.now() - timedelta(days=days - 1)
+
+    rows = []
+    for p in range(pages):
+        for k in range(keywords_per_page):
+            position = rng.randint(1, 30)
+            for d in range(days):
+                position = max(1, min(30, position + rng.randint(-2, 2)))
+                rows.append({
+                    'page': f"דפים לשינוי/main/page {p}",
+                    'keyword': f"מילת מפתח {p}-{k}",
+                    'date': (start_day + timedelta(days=d)).isoformat(),
+                    'position': position if position <= 20 else None
+                })
+
+    timings = {}
+    started = time.time()
+    store.record_many(rows)
+    timings['insert'] = time.time() - started
+
+    queries = {
+        'site_trend_90d': lambda: store.site_trend(90),
+        'average_positions_30d': lambda: store.average_positions(30),
+        'movers_7d': lambda: store.movers(7),
+        'page_trend_365d': lambda: store.trend("דפים לשינוי/main/page 7", days=365),
+        'keyword_trend_365d': lambda: store.trend(keyword="מילת מפתח 7-1", days=365),
+        'latest': lambda: store.latest(),
+        'record_one_page': lambda: store.record("דפים לשינוי/main/page 3", [
+            {'keyword': f"מילת מפתח 3-{k}", 'position': 5} for k in range(keywords_per_page)])
+    }
+    for name, query in queries.items():
+        started = time.time()
+        result = query()
+        timings[name] = time.time() - started
+        size = len(result) if isinstance(result, list) else sum(len(v) for v in result.values() if isinstance(v, list))
+        print(f"[Rank History] {name:<22} {timings[name] * 1000:8.1f} ms  ({size} rows)")
+
+    print(f"[Rank History] Inserted {len(rows)} checks in {timings['insert']:.2f}s "
+          f"({path.stat().st_size / 1024 / 1024:.1f} MB)")
+    store.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rank History Store')
+    parser.add_argument('--migrate', action='store_true', help='Re-import rank_history from every seo_history.json')
+    parser.add_argument('--movers', type=int, metavar='DAYS', help='Biggest rank changes over DAYS days')
+    parser.add_argument('--stats', action='store_true', help='Row/page/keyword counts')
+    parser.add_argument('--benchmark', action='store_true', help='Write/query timings on synthetic history')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+
+    store = get_rank_store()
+    if args.migrate:
+        store.migrate_from_json()
+    if args.movers:
+        result = store.movers(args.movers)
+        for label in ('winners', 'losers'):
+            print(f"\n{label.upper()}:")
+            for row in result[label]:
+                print(f"  {row['change']:+3}  {row['previous_position'] or '-'} -> {row['position'] or '-'}  "
+                      f"{row['keyword']} ({row['page']})")
+    if args.stats or not (args.migrate or args.movers):
+        print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
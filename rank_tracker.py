@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk Rank Tracker - rank checks for all pages in batched multi-query SERP runs
+מעקב דירוגים לכל הדפים: מילת המפתח הראשית של כל דף, ריצות SERP עם כמה שאילתות בכל ריצה,
+מיפוי תוצאות אורגניות ו-AI Mode חזרה לדפים לפי URL מנורמל, ושמירת הדירוגים של כל הדפים במעבר אחד.
+
+הרצה מתוזמנת (Windows Task Scheduler) דרך run_rank_tracker.bat, או:
+    python rank_tracker.py --run [--batch-size 25] [--site business]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from serp_jobs import get_serp_manager, build_serp_payload
+from serp_cache import get_serp_cache
+from rank_history_store import get_rank_store
+
+
+BASE_DIR = Path(__file__).parent
+CONFIG_FILE = BASE_DIR / "config.json"
+REPORTS_DIR = BASE_DIR / "generated_data" / "rank_reports"
+
+RANK_BATCH_SIZE = 25   # queries per SERP run
+RANK_DEPTH = 20        # organic results requested (resultsPerPage) and checked per query
+DEFAULT_SERP_ACTOR = 'nFJndFXA5zjCTuudP'
+
+
+def load_config() -> Dict:
+    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def normalize_url(url: str) -> str:
+    """השוואת URLs: בלי פרוטוקול, www, query/fragment ו-/ בסוף, מפוענח ובאותיות קטנות"""
+    url = unquote((url or '').strip()).lower()
+    if '://' not in url:
+        url = 'http://' + url
+    parts = urlsplit(url)
+    host = parts.netloc[4:] if parts.netloc.startswith('www.') else parts.netloc
+    return (host + parts.path).rstrip('/')
+
+
+def normalize_keyword(keyword: str) -> str:
+    return ' '.join((keyword or '').split()).lower()
+
+
+def collect_pages(config: Dict, site: str = None) -> List[Dict]:
+    """
+    כל הדפים בתיקיות editable_pages שיש להם מילת מפתח ו-URL ב-page_info.json
+    -> [{'folder', 'name', 'site', 'keyword', 'url'}]
+    """
+    editable = config.get('paths', {}).get('editable_pages', {})
+    folders = editable.items() if isinstance(editable, dict) else [('main', folder) for folder in editable]
+    pages = []
+    for site_id, folder in folders:
+        if site and site_id != site:
+            continue
+        folder_path = BASE_DIR / folder
+        if not folder_path.exists():
+            continue
+        for page_folder in sorted(folder_path.iterdir()):
+            info_path = page_folder / 'page_info.json'
+            if not info_path.exists():
+                continue
+            try:
+                with open(info_path, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+            except Exception as e:
+                print(f"[Rank Tracker] Skipping {info_path}: {e}")
+                continue
+            keyword = (info.get('keyword') or '').strip()
+            url = (info.get('url') or '').strip()
+            if keyword and url:
+                pages.append({
+                    'folder': str(page_folder.relative_to(BASE_DIR)).replace('\\', '/'),
+                    'name': page_folder.name,
+                    'site': site_id,
+                    'keyword': keyword,
+                    'url': url
+                })
+    return pages
+
+
+def record_ranks(page_folder, entries: List[Dict]) -> Optional[Dict]:
+    """
+    שמירת דירוגים של דף במאגר ההיסטוריה (rank_history_store) - בדיקה חוזרת באותו יום מעדכנת את הרשומה
+    entries: [{'keyword', 'position', 'url_checked', ...}] - מחזיר את המיקום הקודם לכל מילת מפתח
+    """
+    return get_rank_store().record(page_folder, entries)
+
+
+class BulkRankTracker:
+    """
+    בדיקת דירוג לכל הדפים: מילות המפתח מקובצות ל-batches, כל batch הוא ריצת SERP אחת,
+    וכל הריצות נעקבות במקביל ע"י ה-SerpJobManager המשותף
+    """
+
+    def __init__(self, config: Dict = None, batch_size: int = RANK_BATCH_SIZE, manager=None, cache=None):
+        self.config = config or load_config()
+        apify_config = self.config.get('apify', {})
+        self.token = apify_config.get('token') or os.getenv('APIFY_TOKEN', '')
+        self.actor = apify_config.get('serp_actor', DEFAULT_SERP_ACTOR)
+        self.batch_size = max(1, batch_size)
+        self.manager = manager or get_serp_manager(apify_config.get('base_url'))
+        self.cache = cache or get_serp_cache(apify_config.get('cache_ttl'))
+
+    def _fetch(self, keywords: List[str]):
+        """-> ({normalized keyword: SERP item}, [run reports])"""
+        batches = [keywords[i:i + self.batch_size] for i in range(0, len(keywords), self.batch_size)]
+        futures = [(batch, self.manager.submit(
+                        self.actor, build_serp_payload('\n'.join(batch), results_per_page=RANK_DEPTH), self.token))
+                   for batch in batches]
+        print(f"[Rank Tracker] {len(keywords)} keywords in {len(batches)} SERP runs")
+
+        payload = build_serp_payload('')
+        items_by_keyword, runs = {}, []
+        for batch, future in futures:
+            try:
+                items = future.result(timeout=self.manager.timeout + 60)
+                error = None
+            except Exception as e:
+                items, error = [], str(e) or type(e).__name__
+            info = getattr(future, 'run_info', {}) or {}
+            runs.append(dict(info, queries=len(batch), items=len(items), error=error))
+
+            wanted = {normalize_keyword(k): k for k in batch}
+            for index, item in enumerate(items):
+                term = normalize_keyword((item.get('searchQuery') or {}).get('term', ''))
+                if not term and len(items) == len(batch):
+                    term = normalize_keyword(batch[index])  # item without searchQuery - rely on order
+                if term in wanted and term not in items_by_keyword:
+                    items_by_keyword[term] = item
+                    # Same shape as a single-keyword run - keyword research reuses it from the cache
+                    self.cache.put('serp', wanted[term], [item], payload['countryCode'], payload['languageCode'])
+        return items_by_keyword, runs
+
+    @staticmethod
+    def _match(items_by_keyword: Dict[str, Dict], url_index: Dict[str, Dict]) -> Dict:
+        """{(folder, keyword): {'position', 'ai_position'}} לכל דף שמופיע בתוצאות של מילת מפתח כלשהי"""
+        hits = {}
+        for term, item in items_by_keyword.items():
+            for i, result in enumerate((item.get('organicResults') or [])[:RANK_DEPTH]):
+                page = url_index.get(normalize_url(result.get('url', '')))
+                if page:
+                    hits.setdefault((page['folder'], term), {}).setdefault('position', i + 1)
+            ai_mode = item.get('aiModeResult') or {}
+            for i, source in enumerate(ai_mode.get('sources', ai_mode.get('results', [])) or []):
+                page = url_index.get(normalize_url(source.get('url', '')))
+                if page:
+                    hits.setdefault((page['folder'], term), {}).setdefault('ai_position', i + 1)
+        return hits
+
+    def run(self, pages: List[Dict] = None, save: bool = True) -> Dict:
+        started = time.time()
+        report_date = datetime.now().isoformat()
+        if pages is None:
+            pages = collect_pages(self.config)
+        if not self.token:
+            return {'success': False, 'error': 'Apify token not configured'}
+        if not pages:
+            return {'success': False, 'error': 'No pages with keyword and url'}
+
+        keywords, seen = [], set()
+        for page in pages:
+            key = normalize_keyword(page['keyword'])
+            if key not in seen:
+                seen.add(key)
+                keywords.append(page['keyword'])
+
+        items_by_keyword, runs = self._fetch(keywords)
+        fetch_seconds = time.time() - started
+
+        url_index = {normalize_url(page['url']): page for page in pages}
+        hits = self._match(items_by_keyword, url_index)
+        keyword_labels = {normalize_keyword(k): k for k in keywords}
+
+        rankings, errors = [], []
+        for page in pages:
+            main_key = normalize_keyword(page['keyword'])
+            if main_key not in items_by_keyword:
+                errors.append({'folder': page['folder'], 'keyword': page['keyword'], 'error': 'no SERP result'})
+                continue
+            # Main keyword is always recorded (None = not in the top RANK_DEPTH); other keywords only when found
+            page_hits = {term: hit for (folder, term), hit in hits.items() if folder == page['folder']}
+            page_hits.setdefault(main_key, {})
+            entries = [{
+                'keyword': keyword_labels.get(term, term),
+                'position': hit.get('position'),
+                'ai_position': hit.get('ai_position'),
+                'url_checked': page['url'],
+                'source': 'bulk'
+            } for term, hit in page_hits.items()]
+
+            previous = {}
+            if save:
+                try:
+                    previous = record_ranks(page['folder'], entries) or {}
+                except Exception as e:
+                    errors.append({'folder': page['folder'], 'keyword': page['keyword'], 'error': str(e)})
+
+            for entry in entries:
+                term = normalize_keyword(entry['keyword'])
+                before = previous.get(term)
+                rankings.append({
+                    'folder': page['folder'],
+                    'name': page['name'],
+                    'site': page['site'],
+                    'keyword': entry['keyword'],
+                    'main_keyword': term == main_key,
+                    'position': entry['position'],
+                    'ai_position': entry['ai_position'],
+                    'previous_position': before,
+                    'change': (before - entry['position']) if before and entry['position'] else None
+                })
+
+        costs = [run['cost_usd'] for run in runs if run.get('cost_usd') is not None]
+        main_rankings = [r for r in rankings if r['main_keyword']]
+        report = {
+            'success': True,
+            'report_date': report_date,
+            'stats': {
+                'pages': len(pages),
+                'keywords': len(keywords),
+                'runs': len(runs),
+                'failed_runs': sum(1 for run in runs if run.get('error')),
+                'ranked': sum(1 for r in main_rankings if r['position']),
+                'not_ranked': sum(1 for r in main_rankings if not r['position']),
+                'in_ai_mode': sum(1 for r in main_rankings if r['ai_position']),
+                'extra_keyword_hits': len(rankings) - len(main_rankings),
+                'errors': len(errors)
+            },
+            'cost_usd': round(sum(costs), 4) if costs else None,
+            'timing': {
+                'total_seconds': round(time.time() - started, 1),
+                'fetch_seconds': round(fetch_seconds, 1)
+            },
+            'runs': runs,
+            'rankings': rankings,
+            'errors': errors
+        }
+        if save:
+            report['report_file'] = self.save_report(report)
+        return report
+
+    @staticmethod
+    def save_report(report: Dict) -> str:
+        REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+        report_file = REPORTS_DIR / f"{datetime.now().strftime('%Y-%m-%d_%H%M')}_ranks.json"
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[Rank Tracker] Saved report: {report_file}")
+        return str(report_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk Rank Tracker')
+    parser.add_argument('--run', action='store_true', help='Check the main keyword rank of every page')
+    parser.add_argument('--site', type=str, help='Only pages of this site (e.g. main, business)')
+    parser.add_argument('--batch-size', type=int, default=RANK_BATCH_SIZE, help='Queries per SERP run')
+    parser.add_argument('--dry-run', action='store_true', help='Do not save the ranks or a report')
+    args = parser.parse_args()
+
+    if not args.run:
+        parser.print_help()
+        return
+
+    tracker = BulkRankTracker(batch_size=args.batch_size)
+    report = tracker.run(collect_pages(tracker.config, args.site), save=not args.dry_run)
+    if not report.get('success'):
+        print(f"[Rank Tracker] Error: {report.get('error')}")
+        sys.exit(1)
+
+    stats = report['stats']
+    print("\n" + "=" * 60)
+    print("RANK TRACKING SUMMARY")
+    print("=" * 60)
+    print(f"Pages: {stats['pages']}, keywords: {stats['keywords']}, SERP runs: {stats['runs']} ({stats['failed_runs']} failed)")
+    print(f"Ranked: {stats['ranked']}, not in top {RANK_DEPTH}: {stats['not_ranked']}, in AI Mode: {stats['in_ai_mode']}")
+    print(f"Duration: {report['timing']['total_seconds']}s")
+    print(f"Cost: {'$%.4f' % report['cost_usd'] if report['cost_usd'] is not None else 'n/a'}")
+    movers = sorted((r for r in report['rankings'] if r['change']), key=lambda r: -abs(r['change']))
+    for r in movers[:10]:
+        print(f"  {'+' if r['change'] > 0 else ''}{r['change']:>3}  #{r['position']:<3} {r['keyword']} ({r['name']})")
+
+
+if __name__ == "__main__":
+    main()
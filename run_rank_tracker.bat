@@ -0,0 +1,18 @@
+@echo off
+REM Bulk Rank Tracker - Quick Run Script
+REM Run this manually or schedule with Windows Task Scheduler, e.g. weekly:
+REM   schtasks /create /tn "Rank Tracker" /tr "\"%~dp0run_rank_tracker.bat\"" /sc weekly /d SUN /st 06:00
+
+cd /d "%~dp0"
+
+echo ========================================
+echo Bulk Rank Tracker
+echo ========================================
+echo.
+
+py -3 rank_tracker.py --run
+
+echo.
+echo ========================================
+echo Rank Check Complete!
+echo ========================================
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+SERP Cache - persistent cache for Apify SERP and autocomplete responses
+מטמון תשובות SERP והשלמות אוטומטיות לפי מילת מפתח מנורמלת + מדינה + שפה
+
+לכל סוג נתונים TTL משלו (השלמות אוטומטיות משתנות לאט, דירוגים מהר).
+אחרי ה-TTL הרשומה "ישנה": היא מוגשת מיד וריענון רץ ברקע (stale-while-revalidate),
+עד STALE_FACTOR * TTL - אחרי זה נחשבת החמצה ונשלפת מחדש לפני שמחזירים תשובה.
+הרשומות נשמרות ב-cache/serp_cache.json.
+"""
+
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from json_store import JsonDocumentStore
+
+
+BASE_DIR = Path(__file__).parent
+CACHE_FILE = BASE_DIR / "cache" / "serp_cache.json"
+
+# Seconds; overridable with config.json apify.cache_ttl {"autocomplete": ..., "serp": ...}
+DEFAULT_TTLS = {
+    'autocomplete': 7 * 24 * 3600,
+    'serp': 12 * 3600
+}
+STALE_FACTOR = 4
+REFRESH_WORKERS = 2
+
+_EMPTY_COUNTERS = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+_NIQQUD_RE = re.compile(r'[\u0591-\u05C7]')
+_GERESH_RE = re.compile(r"['\u2018\u2019\u05F3]")
+_GERSHAYIM_RE = re.compile(r'["\u201C\u201D\u05F4]')
+_PUNCT_RE = re.compile(r'[^\w\s\u05F3\u05F4]')
+
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    מפתח מטמון למילת מפתח: בלי ניקוד, גרש/גרשיים אחידים, בלי פיסוק, רווחים מנורמלים, אותיות קטנות
+    (כמו HebrewNLPService.normalize_hebrew, אבל שומר ספרות ואותיות לטיניות)
+    """
+    text = _NIQQUD_RE.sub('', keyword or '')
+    text = _GERESH_RE.sub('\u05F3', text)
+    text = _GERSHAYIM_RE.sub('\u05F4', text)
+    text = _PUNCT_RE.sub(' ', text)
+    return ' '.join(text.split()).lower()
+
+
+class SerpCache:
+    """
+    get() מחזיר (value, 'fresh'|'stale'|None); fetch() עוטף get + שליפה/ריענון
+    """
+
+    def __init__(self, path=CACHE_FILE, ttls: Dict[str, int] = None):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._store = JsonDocumentStore.open(path, lambda: {data_type: {} for data_type in DEFAULT_TTLS})
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = None
+        self._stats = {}
+        self.prune()
+
+    @staticmethod
+    def make_key(keyword: str, country: str = 'il', language: str = 'iw') -> str:
+        return f"{country.lower()}|{language.lower()}|{normalize_keyword(keyword)}"
+
+    def _count(self, data_type: str, field: str):
+        with self._lock:
+            counters = self._stats.setdefault(data_type, dict(_EMPTY_COUNTERS))
+            counters[field] += 1
+
+    def get_entry(self, data_type: str, keyword: str, country: str = 'il',
+                  language: str = 'iw') -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """כמו get, אבל מחזיר את הרשומה המלאה ({keyword, value, fetched_at}) - לדעת מתי נשלפה"""
+        entry = self._store.get(data_type, self.make_key(keyword, country, language))
+        age = time.time() - entry['fetched_at'] if entry else None
+        ttl = self.ttls.get(data_type, DEFAULT_TTLS['serp'])
+        if entry is None or age > ttl * STALE_FACTOR:
+            self._count(data_type, 'misses')
+            return None, None
+        if age > ttl:
+            self._count(data_type, 'stale_hits')
+            return entry, 'stale'
+        self._count(data_type, 'hits')
+        return entry, 'fresh'
+
+    def get(self, data_type: str, keyword: str, country: str = 'il', language: str = 'iw') -> Tuple[Any, Optional[str]]:
+        entry, state = self.get_entry(data_type, keyword, country, language)
+        return (entry['value'] if entry else None), state
+
+    def put(self, data_type: str, keyword: str, value: Any, country: str = 'il', language: str = 'iw'):
+        self._store.put(data_type, self.make_key(keyword, country, language), {
+            'keyword': keyword,
+            'value': value,
+            'fetched_at': time.time()
+        })
+
+    def invalidate(self, data_type: str, keyword: str, country: str = 'il', language: str = 'iw') -> bool:
+        return self._store.delete(data_type, self.make_key(keyword, country, language))
+
+    def revalidate(self, data_type: str, keyword: str, fetch_fn: Callable[[], Any],
+                   country: str = 'il', language: str = 'iw'):
+        """ריענון ברקע (פעם אחת למפתח בכל רגע נתון); ערך ריק או חריגה לא דורסים את הרשומה"""
+        key = (data_type, self.make_key(keyword, country, language))
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='serp-cache')
+
+        def refresh():
+            try:
+                value = fetch_fn()
+                if value:
+                    self.put(data_type, keyword, value, country, language)
+                self._count(data_type, 'refreshes')
+            except Exception as e:
+                self._count(data_type, 'refresh_errors')
+                print(f"[SERP Cache] Refresh failed for {data_type} '{keyword}': {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+    def fetch(self, data_type: str, keyword: str, fetch_fn: Callable[[], Any],
+              country: str = 'il', language: str = 'iw') -> Any:
+        """ערך טרי מהמטמון, ערך ישן + ריענון ברקע, או שליפה עכשיו (ערך ריק לא נשמר)"""
+        value, state = self.get(data_type, keyword, country, language)
+        if state == 'stale':
+            self.revalidate(data_type, keyword, fetch_fn, country, language)
+        if state:
+            return value
+        value = fetch_fn()
+        if value:
+            self.put(data_type, keyword, value, country, language)
+        return value
+
+    def prune(self) -> int:
+        """מחיקת רשומות שעברו את חלון ה-stale"""
+        removed = 0
+        now = time.time()
+        for data_type in self.ttls:
+            max_age = self.ttls[data_type] * STALE_FACTOR
+            for key in self._store.keys(data_type):
+                with self._store.transaction():  # a refresh in another process must not be deleted
+                    entry = self._store.get(data_type, key)
+                    if not entry or now - entry.get('fetched_at', 0) > max_age:
+                        self._store.delete(data_type, key)
+                        removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for data_type in self.ttls:
+                counters = dict(self._stats.get(data_type, _EMPTY_COUNTERS))
+                lookups = counters['hits'] + counters['stale_hits'] + counters['misses']
+                counters['hit_rate'] = round((counters['hits'] + counters['stale_hits']) / lookups, 3) if lookups else 0.0
+                counters['ttl_seconds'] = self.ttls[data_type]
+                result[data_type] = counters
+        for data_type in result:
+            result[data_type]['entries'] = self._store.count(data_type)
+        return result
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_serp_cache(ttls: Dict[str, int] = None) -> SerpCache:
+    """המטמון המשותף בתהליך (ה-TTLs נקבעים בקריאה הראשונה)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SerpCache(ttls=ttls)
+        return _cache
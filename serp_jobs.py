@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""
+SERP Job Manager - multiplexed tracking of Apify SERP runs
+מנהל ריצות SERP: thread מתזמן יחיד שמתחיל ריצות Apify, בודק את כולן ב-backoff מסתגל ומחלק תוצאות לממתינים
+
+במקום thread חסום ב-time.sleep(5) לכל מילת מפתח, כל הבקשות נרשמות כאן ומקבלות Future.
+בקשה זהה (אותו actor ואותו payload) שכבר בריצה לא מתחילה ריצה חדשה - הממתין מצטרף לריצה הקיימת.
+
+LocalApifyServer הוא תחליף מקומי ל-Apify (אותם endpoints) לבדיקות בלי token ובלי עלות:
+    python serp_jobs.py --selftest --checks 40
+"""
+
+import sys
+import json
+import time
+import heapq
+import random
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, List, Callable
+
+import requests
+
+
+APIFY_BASE_URL = "https://api.apify.com"
+
+# Adaptive backoff: first poll is scheduled near the typical run duration, then grows by FACTOR
+POLL_MIN_DELAY = 1.0
+POLL_MAX_DELAY = 10.0
+POLL_BACKOFF_FACTOR = 1.5
+RUN_TIMEOUT = 180           # seconds from start until the run is abandoned
+TYPICAL_RUN_SECONDS = 20.0  # initial guess, replaced by an average of observed runs
+
+FAILED_STATUSES = ('FAILED', 'ABORTED', 'TIMED-OUT')
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'application/json'
+}
+
+
+def build_serp_payload(queries: str, results_per_page: int = 10) -> Dict[str, Any]:
+    """קלט ל-actor ה-SERP (queries = שאילתה אחת או כמה מופרדות בשורה חדשה)"""
+    return {
+        "aiMode": "aiModeWithSearchResults",
+        "countryCode": "il",
+        "forceExactMatch": False,
+        "includeIcons": False,
+        "includeUnfilteredResults": True,
+        "languageCode": "iw",
+        "maxPagesPerQuery": 1,
+        "mobileResults": False,
+        "queries": queries,
+        "resultsPerPage": results_per_page,
+        "saveHtml": False,
+        "saveHtmlToKeyValueStore": True
+    }
+
+
+class SerpJobError(Exception):
+    """ריצה שלא הסתיימה בהצלחה (שגיאת התחלה, FAILED/ABORTED, timeout)"""
+
+
+class _Run:
+    """ריצת Apify אחת והממתינים לה"""
+
+    def __init__(self, key, actor, payload, token):
+        self.key = key
+        self.actor = actor
+        self.payload = payload
+        self.token = token
+        self.future = Future()
+        self.callbacks: List[Callable] = []
+        self.state = 'start'     # start -> poll -> fetch
+        self.run_id = None
+        self.dataset_id = None
+        self.polls = 0
+        self.delay = POLL_MIN_DELAY
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.errors = 0
+        self.cost_usd = None
+
+
+class SerpJobManager:
+    """
+    thread מתזמן יחיד לכל ריצות ה-SERP בתהליך
+    submit() מחזיר Future שתוצאתו רשימת ה-dataset items של הריצה (או SerpJobError)
+    future.run_info מכיל את נתוני הריצה (run_id, seconds, polls, cost_usd) אחרי שהיא מסתיימת
+    """
+
+    def __init__(self, base_url: str = APIFY_BASE_URL, timeout: float = RUN_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self._cond = threading.Condition()
+        self._queue = []          # heap of (due, seq, run)
+        self._seq = 0
+        self._active: Dict[str, _Run] = {}
+        self._thread = None
+        self._avg_run_seconds = TYPICAL_RUN_SECONDS
+        self.stats_counters = {'submitted': 0, 'joined': 0, 'succeeded': 0, 'failed': 0, 'http_calls': 0}
+
+    # ---------- public API ----------
+
+    def submit(self, actor: str, payload: Dict[str, Any], token: str,
+               status_callback: Callable = None) -> Future:
+        """
+        התחלת ריצה (או הצטרפות לריצה זהה שכבר פעילה)
+        status_callback(poll_number, total_polls) נקרא מה-thread המתזמן אחרי כל בדיקת סטטוס
+        """
+        key = hashlib.sha1(json.dumps([actor, payload], ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+        with self._cond:
+            run = self._active.get(key)
+            if run is not None:
+                self.stats_counters['joined'] += 1
+            else:
+                run = _Run(key, actor, payload, token)
+                self._active[key] = run
+                self.stats_counters['submitted'] += 1
+                self._schedule(run, 0)
+            if status_callback:
+                run.callbacks.append(status_callback)
+            self._ensure_thread()
+            return run.future
+
+    def run(self, actor: str, payload: Dict[str, Any], token: str,
+            status_callback: Callable = None) -> List[Dict]:
+        """submit + המתנה לתוצאה (זורק SerpJobError)"""
+        return self.submit(actor, payload, token, status_callback).result(timeout=self.timeout + 60)
+
+    def expected_polls(self) -> int:
+        """מספר הבדיקות הצפוי עד ה-timeout (לחישוב התקדמות ב-status_callback)"""
+        elapsed, delay, polls = self._first_delay(), POLL_MIN_DELAY, 1
+        while elapsed < self.timeout:
+            delay = min(POLL_MAX_DELAY, delay * POLL_BACKOFF_FACTOR)
+            elapsed += delay
+            polls += 1
+        return polls
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self.stats_counters, active=len(self._active),
+                        avg_run_seconds=round(self._avg_run_seconds, 1))
+
+    # ---------- scheduler ----------
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name='serp-jobs', daemon=True)
+            self._thread.start()
+
+    def _schedule(self, run: _Run, delay: float):
+        """(נקרא עם ה-lock)"""
+        self._seq += 1
+        heapq.heappush(self._queue, (time.time() + delay, self._seq, run))
+        self._cond.notify()
+
+    def _first_delay(self) -> float:
+        # Polling before a run can possibly be done only costs requests - start near the usual duration
+        return max(POLL_MIN_DELAY, self._avg_run_seconds * 0.5)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                due, _, run = self._queue[0]
+                wait = due - time.time()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._queue)
+            try:
+                self._step(run)
+            except Exception as e:
+                # Transient HTTP errors are retried with backoff until the run times out
+                run.errors += 1
+                print(f"[SERP Jobs] {run.state} error for run {run.run_id or '-'}: {e}")
+                if run.state == 'start' and run.errors >= 3:
+                    self._finish(run, error=f"Apify start error: {e}")
+                else:
+                    self._reschedule(run)
+
+    def _step(self, run: _Run):
+        if time.time() - run.submitted_at > self.timeout:
+            self._finish(run, error="Timeout waiting for results")
+            return
+
+        if run.state == 'start':
+            url = f"{self.base_url}/v2/acts/{run.actor}/runs"
+            response = self._request('post', url, run.token, json=run.payload, timeout=30)
+            if response.status_code not in (200, 201, 202):
+                print(f"[SERP Jobs] Start response {response.status_code}: {response.text[:300]}")
+                self._finish(run, error=f"Apify start error: {response.status_code}")
+                return
+            data = response.json().get('data', {})
+            run.run_id = data.get('id')
+            if not run.run_id:
+                self._finish(run, error="No run ID returned")
+                return
+            run.started_at = time.time()
+            run.state = 'poll'
+            run.delay = POLL_MIN_DELAY
+            with self._cond:
+                self._schedule(run, self._first_delay())
+            return
+
+        if run.state == 'poll':
+            url = f"{self.base_url}/v2/actor-runs/{run.run_id}"
+            data = self._request('get', url, run.token, timeout=10).json().get('data', {})
+            status = data.get('status')
+            run.polls += 1
+            self._notify(run)
+            if data.get('usageTotalUsd') is not None:
+                run.cost_usd = data['usageTotalUsd']
+            if status == 'SUCCEEDED':
+                run.dataset_id = data.get('defaultDatasetId')
+                run.state = 'fetch'
+                self._learn(time.time() - run.started_at)
+                with self._cond:
+                    self._schedule(run, 0)
+            elif status in FAILED_STATUSES:
+                self._finish(run, error=f"Run failed: {status}")
+            else:
+                self._reschedule(run)
+            return
+
+        if run.state == 'fetch':
+            url = f"{self.base_url}/v2/datasets/{run.dataset_id}/items"
+            items = self._request('get', url, run.token, timeout=30).json()
+            self._finish(run, result=items if isinstance(items, list) else [])
+
+    def _request(self, method, url, token, **kwargs):
+        self.stats_counters['http_calls'] += 1
+        return self.session.request(method, url, params={'token': token}, **kwargs)
+
+    def _reschedule(self, run: _Run):
+        with self._cond:
+            self._schedule(run, run.delay)
+        run.delay = min(POLL_MAX_DELAY, run.delay * POLL_BACKOFF_FACTOR)
+
+    def _learn(self, seconds: float):
+        # Moving average of how long runs take - sets where the first poll lands
+        self._avg_run_seconds = 0.7 * self._avg_run_seconds + 0.3 * seconds
+
+    def _notify(self, run: _Run):
+        total = self.expected_polls()
+        for callback in list(run.callbacks):
+            try:
+                callback(min(run.polls, total), total)
+            except Exception as e:
+                print(f"[SERP Jobs] Status callback error: {e}")
+
+    def _finish(self, run: _Run, result=None, error: str = None):
+        with self._cond:
+            self._active.pop(run.key, None)
+            self.stats_counters['failed' if error else 'succeeded'] += 1
+        elapsed = time.time() - run.submitted_at
+        run.future.run_info = {
+            'run_id': run.run_id,
+            'seconds': round(elapsed, 1),
+            'polls': run.polls,
+            'cost_usd': run.cost_usd,
+            'error': error
+        }
+        if error:
+            print(f"[SERP Jobs] Run {run.run_id or '-'} failed after {elapsed:.1f}s: {error}")
+            run.future.set_exception(SerpJobError(error))
+        else:
+            print(f"[SERP Jobs] Run {run.run_id} done in {elapsed:.1f}s ({run.polls} polls, {len(result)} items)")
+            run.future.set_result(result)
+
+
+_managers: Dict[str, SerpJobManager] = {}
+_managers_lock = threading.Lock()
+
+def get_serp_manager(base_url: str = None) -> SerpJobManager:
+    """מנהל משותף לכל כתובת Apify (כך שכל הבקשות בתהליך חולקות thread מתזמן אחד)"""
+    base_url = (base_url or APIFY_BASE_URL).rstrip('/')
+    with _managers_lock:
+        if base_url not in _managers:
+            _managers[base_url] = SerpJobManager(base_url)
+        return _managers[base_url]
+
+
+# ============ Local Apify stand-in ============
+
+LOCAL_COST_PER_QUERY = 0.0035  # roughly the SERP actor's per-query price, for cost reports in tests
+
+def fake_serp_item(query: str, results: int = 10) -> Dict[str, Any]:
+    """dataset item בפורמט של actor ה-SERP (דטרמיניסטי לפי השאילתה)"""
+    rng = random.Random(query)
+    domains = ['example.co.il', 'bank.co.il', 'loans.co.il', 'finance.co.il', 'money.co.il',
+               'credit.co.il', 'mortgage.co.il', 'compare.co.il', 'news.co.il', 'wiki.org']
+    rng.shuffle(domains)
+    organic = [{
+        'title': f"{query} - {domain}",
+        'url': f"https://www.{domain}/{rng.randint(1, 999)}",
+        'displayedUrl': domain,
+        'description': f"תוצאה {i + 1} עבור {query}"
+    } for i, domain in enumerate(domains[:results])]
+    return {
+        'searchQuery': {'term': query},
+        'organicResults': organic,
+        'relatedQueries': [{'title': f"{query} {suffix}"} for suffix in ('מחיר', 'השוואה', 'ריבית')],
+        'aiModeResult': {
+            'text': f"סיכום AI עבור {query}",
+            'sources': [{'title': r['title'], 'url': r['url'], 'description': ''} for r in organic[:3]]
+        }
+    }
+
+
+class LocalApifyServer:
+    """
+    תחליף מקומי ל-Apify: runs / actor-runs / datasets / run-sync-get-dataset-items
+    כל ריצה "נמשכת" run_seconds. items_fn(payload) -> list מאפשר להחליף את התוצאות.
+    """
+
+    def __init__(self, port: int = 0, run_seconds: float = 2.0, items_fn: Callable = None, fail_queries=()):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        self.run_seconds = run_seconds
+        self.items_fn = items_fn or self._default_items
+        self.fail_queries = set(fail_queries)
+        self.runs: Dict[str, Dict] = {}
+        self.requests = {'start': 0, 'poll': 0, 'items': 0, 'sync': 0}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code, body):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                path = self.path.split('?')[0]
+                if path.endswith('/run-sync-get-dataset-items'):
+                    server.requests['sync'] += 1
+                    queries = payload.get('queries') or []
+                    self._send(201, [{'query': q, 'suggestions': [f"{q} {i}" for i in range(1, 6)]} for q in queries])
+                elif path.endswith('/runs'):
+                    self._send(201, {'data': server._start(payload)})
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            def do_GET(self):
+                parts = self.path.split('?')[0].strip('/').split('/')
+                if len(parts) == 3 and parts[1] == 'actor-runs':
+                    server.requests['poll'] += 1
+                    run = server.runs.get(parts[2])
+                    self._send(200 if run else 404, {'data': server._status(run)} if run else {'error': 'no run'})
+                elif len(parts) == 4 and parts[1] == 'datasets' and parts[3] == 'items':
+                    server.requests['items'] += 1
+                    run = server.runs.get(parts[2])
+                    self._send(200 if run else 404, run['items'] if run else {'error': 'no dataset'})
+                else:
+                    self._send(404, {'error': 'not found'})
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.port = self._httpd.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def _default_items(payload):
+        queries = [q.strip() for q in str(payload.get('queries', '')).split('\n') if q.strip()]
+        return [fake_serp_item(q, payload.get('resultsPerPage', 10)) for q in queries]
+
+    def _start(self, payload):
+        with self._lock:
+            self.requests['start'] += 1
+            run_id = f"run{len(self.runs) + 1}"
+            failed = str(payload.get('queries', '')) in self.fail_queries
+            self.runs[run_id] = {'id': run_id, 'started': time.time(), 'failed': failed, 'items': self.items_fn(payload)}
+        return {'id': run_id, 'status': 'READY', 'defaultDatasetId': run_id}
+
+    def _status(self, run):
+        if time.time() - run['started'] < self.run_seconds:
+            status = 'RUNNING'
+        else:
+            status = 'FAILED' if run['failed'] else 'SUCCEEDED'
+        return {'id': run['id'], 'status': status, 'defaultDatasetId': run['id'],
+                'usageTotalUsd': round(LOCAL_COST_PER_QUERY * max(1, len(run['items'])), 4)}
+
+    def close(self):
+        self._httpd.shutdown()
+
+
+def selftest(checks: int = 40, run_seconds: float = 3.0):
+    """dozens of concurrent rank checks against the local stand-in, tracked by one scheduler thread"""
+    server = LocalApifyServer(run_seconds=run_seconds, fail_queries={'fail'})
+    manager = SerpJobManager(server.base_url, timeout=60)
+    manager._avg_run_seconds = run_seconds
+    started = time.time()
+    threads_before = threading.active_count()
+
+    futures = {f"הלוואה {i}": manager.submit('actor', {'queries': f"הלוואה {i}"}, 'token') for i in range(checks)}
+    duplicate = manager.submit('actor', {'queries': "הלוואה 0"}, 'token')
+    failing = manager.submit('actor', {'queries': 'fail'}, 'token')
+    threads_during = threading.active_count()
+
+    ok = sum(1 for future in futures.values() if future.result(timeout=60) and future.result()[0]['organicResults'])
+    try:
+        failing.result(timeout=60)
+        failed_ok = False
+    except SerpJobError:
+        failed_ok = True
+
+    print(f"[SERP Jobs] {ok}/{checks} runs succeeded in {time.time() - started:.1f}s "
+          f"(runs take {run_seconds}s each)")
+    print(f"[SERP Jobs] Threads added: {threads_during - threads_before} (scheduler + stand-in server)")
+    print(f"[SERP Jobs] Duplicate submit shared a run: {duplicate is futures['הלוואה 0']}, failed run raised: {failed_ok}")
+    print(f"[SERP Jobs] Stand-in requests: {server.requests}")
+    print(f"[SERP Jobs] Manager stats: {manager.stats()}")
+    server.close()
+
+
+if __name__ == '__main__':
+    if '--selftest' in sys.argv:
+        count = int(sys.argv[sys.argv.index('--checks') + 1]) if '--checks' in sys.argv else 40
+        selftest(count)
+    else:
+        print("Usage: python serp_jobs.py --selftest [--checks N]")
@@ -6,8 +6,11 @@ Weekly Scanner - Automated Source Scanning and Change Detection
 
 import sys
 import json
+import time
 import argparse
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -15,7 +18,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 # Import from project modules
-from ai_summarizer import OllamaSummarizer, check_ollama_status
+from ai_summarizer import OllamaSummarizer, check_ollama_status, OLLAMA_NUM_PARALLEL
 
 # Import SourceStorageManager and DataSourceScraper dynamically
 # to avoid circular imports
@@ -47,87 +50,66 @@ def get_scraper():
     return DataSourceScraper(token)
 
 
+# Checkpoint file for resuming a crashed scan (inside weekly_reports/)
+SCAN_STATE_FILE = "scan_state.json"
+MAX_RESUME_AGE_HOURS = 24
+# The checkpoint is rewritten at most this often (a crash re-scans the sources finished since the last write)
+SCAN_STATE_FLUSH_SECONDS = 5
+
+
 class WeeklySourceScanner:
     """
     סורק שבועי לזיהוי שינויים במקורות מידע
+    צינור עיבוד: סריקה מקבילית → זיהוי שינויים → ניתוח AI (מוגבל במקביליות)
     """
     
-    def __init__(self, use_ai=True):
+    def __init__(self, use_ai=True, scrape_workers=4, llm_workers=None):
         self.storage = get_storage_manager()
         self.scraper = get_scraper()
         self.use_ai = use_ai
         self.summarizer = None
+        self.scrape_workers = max(1, scrape_workers)
+        # Bounded by this scan's own pool - the shared Ollama client's limit is left as is
+        self.llm_workers = min(max(1, llm_workers or OLLAMA_NUM_PARALLEL), OLLAMA_NUM_PARALLEL)
+        self._state_lock = threading.Lock()
+        self._state = None
+        self._state_flushed_at = 0.0
         
         if use_ai:
             self.summarizer = OllamaSummarizer()
-            if not self.summarizer.is_available():
+            if not self.summarizer.is_available(refresh=True):
                 print("[Scanner] Warning: Ollama not available, running without AI analysis")
                 self.use_ai = False
     
     def get_all_data_sources(self):
-        """קבלת כל מקורות המידע מכל העמודים"""
-        from dashboard_server import BASE_DIR
-        
-        sources = {}  # url -> {source info}
-        pages_dir = BASE_DIR / "דפים לשינוי"
+        """
+        קבלת כל מקורות המידע מהמאגר המרכזי (sources_registry.json)
+        קריאה אחת של הרישום עם אינדקס URL → עמודים, ללא מעבר על תיקיות העמודים
+        """
+        from dashboard_server import sources_registry
         
-        if not pages_dir.exists():
-            print(f"[Scanner] Pages directory not found: {pages_dir}")
-            return sources
+        # Import data sources from page_info.json files changed since the last sync (all of them on first run)
+        sources_registry.sync_from_pages()
         
-        # Scan all page folders
-        for page_type in ["main", "business"]:
-            type_dir = pages_dir / page_type
-            if not type_dir.exists():
-                continue
-            
-            for page_dir in type_dir.iterdir():
-                if not page_dir.is_dir():
-                    continue
-                
-                page_info_path = page_dir / "page_info.json"
-                if not page_info_path.exists():
-                    continue
-                
-                try:
-                    with open(page_info_path, 'r', encoding='utf-8') as f:
-                        page_info = json.load(f)
-                    
-                    page_path = f"{page_type}/{page_dir.name}"
-                    data_sources = page_info.get("data_sources", [])
-                    
-                    for ds in data_sources:
-                        url = ds.get("url")
-                        if url:
-                            if url not in sources:
-                                sources[url] = {
-                                    "url": url,
-                                    "description": ds.get("description", ""),
-                                    "used_by_pages": []
-                                }
-                            sources[url]["used_by_pages"].append({
-                                "path": page_path,
-                                "name": page_info.get("name", page_dir.name)
-                            })
-                            
-                except Exception as e:
-                    print(f"[Scanner] Error reading {page_info_path}: {e}")
+        sources = sources_registry.get_scan_targets()
         
         print(f"[Scanner] Found {len(sources)} unique data sources")
         return sources
     
-    def scan_source(self, url, description=""):
-        """סריקת מקור בודד"""
-        source_id = self.storage.get_source_id(url)
-        
-        print(f"[Scanner] Scanning: {url}")
-        
-        # Get previous version for comparison
-        previous = self.storage.get_previous_version(source_id)
-        previous_hash = previous.get("content_hash") if previous else None
-        
-        # Scrape the source
+    # ============ Pipeline Stages ============
+    
+    def _scrape_stage(self, url):
+        """שלב 1: סריקת המקור (רץ במקביל)"""
+        started = time.time()
         result = self.scraper.scrape(url, force_refresh=True)
+        return result, time.time() - started
+    
+    def _detect_stage(self, url, description, result):
+        """
+        שלב 2: זיהוי שינויים מול הגרסה הקודמת ושמירה להיסטוריה
+        מחזיר (scan_result, previous_content) - previous_content נדרש לשלב ה-AI
+        """
+        source_id = self.storage.get_source_id(url)
         
         if not result.get("success"):
             return {
@@ -135,7 +117,11 @@ class WeeklySourceScanner:
                 "url": url,
                 "success": False,
                 "error": result.get("error", "Scraping failed")
-            }
+            }, None
+        
+        # Get previous version for comparison
+        previous = self.storage.get_previous_version(source_id)
+        previous_hash = previous.get("content_hash") if previous else None
         
         content = result.get("content", "")
         title = result.get("title", description)
@@ -148,6 +134,10 @@ class WeeklySourceScanner:
         
         # Check if content changed
         has_changes = previous_hash != content_hash if previous_hash else True
+        if has_changes and previous_hash and result.get("extraction_changed"):
+            # Same page, different extractor (HTTP tier -> browser) - new baseline, not a content change
+            print(f"[Scanner] Extraction method changed for {url}, recording a new baseline")
+            has_changes = False
         
         scan_result = {
             "source_id": source_id,
@@ -158,41 +148,135 @@ class WeeklySourceScanner:
             "content_hash": content_hash,
             "previous_hash": previous_hash,
             "word_count": len(content.split()),
+            "scrape_method": result.get("method"),
+            "extraction_changed": bool(result.get("extraction_changed")),
             "scraped_at": datetime.now().isoformat()
         }
         
-        # If content changed and AI is available, analyze
-        if has_changes and self.use_ai and previous:
-            print(f"[Scanner] Changes detected, analyzing with AI...")
-            
-            # Compare versions
-            comparison = self.summarizer.compare_versions(
-                previous.get("content", ""),
-                content
-            )
+        previous_content = previous.get("content", "") if previous else None
+        return scan_result, previous_content
+    
+    @staticmethod
+    def _count_outcome(progress, scan_result):
+        """עדכון מוני השינויים/שגיאות בהתקדמות - אותם תנאים כמו בדוח הסופי"""
+        if not scan_result.get("success"):
+            progress["errors"] += 1
+        elif scan_result.get("has_changes"):
+            progress["changes"] += 1
+    
+    def _needs_ai(self, scan_result, previous_content):
+        return bool(scan_result.get("success") and scan_result.get("has_changes")
+                    and self.use_ai and previous_content)
+    
+    def _llm_stage(self, scan_result, previous_content, content):
+        """שלב 3: ניתוח השינויים עם AI (מוגבל ל-llm_workers במקביל)"""
+        started = time.time()
+        print(f"[Scanner] Changes detected in {scan_result['url']}, analyzing with AI...")
+        
+        comparison = self.summarizer.compare_versions(previous_content, content)
+        
+        if comparison.get("success"):
+            scan_result["ai_analysis"] = comparison
+            scan_result["changes"] = comparison.get("changes", [])
+            scan_result["importance"] = comparison.get("importance", "medium")
+            scan_result["changes_summary"] = comparison.get("summary", "")
             
-            if comparison.get("success"):
-                scan_result["ai_analysis"] = comparison
-                scan_result["changes"] = comparison.get("changes", [])
-                scan_result["importance"] = comparison.get("importance", "medium")
-                scan_result["changes_summary"] = comparison.get("summary", "")
-                
-                # Save AI summary
-                self.storage.save_ai_summary(source_id, comparison)
-            else:
-                scan_result["ai_analysis"] = None
+            # Save AI summary
+            self.storage.save_ai_summary(scan_result["source_id"], comparison)
+        else:
+            scan_result["ai_analysis"] = None
+        
+        return scan_result, time.time() - started
+    
+    def _load_pending_llm_input(self, scan_result):
+        """טעינת הגרסה הקודמת והנוכחית להמשך שלב ה-AI אחרי קריסה"""
+        source_id = scan_result["source_id"]
+        previous_hash, content_hash = scan_result.get("previous_hash"), scan_result.get("content_hash")
+        previous = self.storage.get_version(source_id, content_hash=previous_hash) if previous_hash else None
+        current = self.storage.get_version(source_id, content_hash=content_hash) if content_hash else None
+        return (previous or {}).get("content"), (current or {}).get("content")
+    
+    def scan_source(self, url, description=""):
+        """סריקת מקור בודד (כל השלבים ברצף)"""
+        print(f"[Scanner] Scanning: {url}")
+        
+        result, _ = self._scrape_stage(url)
+        scan_result, previous_content = self._detect_stage(url, description, result)
+        
+        # If content changed and AI is available, analyze
+        if self._needs_ai(scan_result, previous_content):
+            scan_result, _ = self._llm_stage(scan_result, previous_content, result.get("content", ""))
         
         return scan_result
     
-    def run_full_scan(self):
-        """הרצת סריקה מלאה של כל המקורות"""
+    # ============ Checkpointing ============
+    
+    def _state_path(self):
+        return self.storage.get_weekly_reports_dir() / SCAN_STATE_FILE
+    
+    def _load_scan_state(self):
+        """טעינת מצב סריקה שלא הסתיימה (אם קיימת ועדכנית)"""
+        path = self._state_path()
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            started = datetime.fromisoformat(state.get("started_at"))
+            if state.get("status") != "running" or datetime.now() - started > timedelta(hours=MAX_RESUME_AGE_HOURS):
+                return None
+            return state
+        except Exception as e:
+            print(f"[Scanner] Could not load scan state: {e}")
+            return None
+    
+    def _record_result(self, url, scan_result, stage):
+        """שמירת תוצאה ל-checkpoint (בטוח לקריאה מכל thread) - הקובץ נכתב לכל היותר כל SCAN_STATE_FLUSH_SECONDS"""
+        with self._state_lock:
+            scan_result["stage"] = stage
+            self._state["results"][url] = scan_result
+            self._state["updated_at"] = datetime.now().isoformat()
+            if time.time() - self._state_flushed_at >= SCAN_STATE_FLUSH_SECONDS:
+                self._write_scan_state()
+    
+    def _write_scan_state(self):
+        """כתיבת ה-checkpoint (נקרא עם _state_lock) - קובץ זמני והחלפה, כך שקריסה לא משאירה חצי קובץ"""
+        path = self._state_path()
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False)
+        tmp_path.replace(path)
+        self._state_flushed_at = time.time()
+    
+    def _clear_scan_state(self):
+        try:
+            self._state_path().unlink()
+        except FileNotFoundError:
+            pass
+    
+    # ============ Full Scan ============
+    
+    def run_full_scan(self, progress_callback=None, resume=True):
+        """
+        הרצת סריקה מלאה של כל המקורות כצינור עיבוד:
+        סריקה מקבילית → זיהוי שינויים → ניתוח AI מוגבל במקביליות
+        
+        Args:
+            progress_callback: פונקציה שמקבלת dict עם התקדמות לפי שלבים
+            resume: המשך סריקה שקרסה (מדלג על מקורות שכבר הושלמו)
+        """
         print("=" * 60)
         print("[Scanner] Starting full weekly scan")
         print(f"[Scanner] Time: {datetime.now().isoformat()}")
+        print(f"[Scanner] Workers: scrape={self.scrape_workers}, llm={self.llm_workers}")
         print("=" * 60)
         
+        scan_started = time.time()
+        
         # Get all sources
+        discovery_started = time.time()
         all_sources = self.get_all_data_sources()
+        discovery_seconds = time.time() - discovery_started
         
         if not all_sources:
             print("[Scanner] No data sources found")
@@ -202,50 +286,189 @@ class WeeklySourceScanner:
                 "changes": []
             }
         
-        # Scan each source
-        results = []
-        changes = []
-        errors = []
+        # Resume a crashed scan, or start a fresh checkpoint
+        state = self._load_scan_state() if resume else None
+        if state:
+            print(f"[Scanner] Resuming scan from {state['started_at']} ({len(state['results'])} sources already processed)")
+        else:
+            state = {"status": "running", "started_at": datetime.now().isoformat(), "results": {}}
+        self._state = state
+        
+        done_urls = {u for u, r in state["results"].items() if r.get("stage") == "done"}
+        pending_llm = {u: r for u, r in state["results"].items() if r.get("stage") == "llm_pending"}
+        to_scrape = [u for u in all_sources if u not in done_urls and u not in pending_llm]
+        
+        timings = {"scrape": [], "detect": [], "llm": []}
+        stage_windows = {}
+        progress = {
+            "total": len(all_sources),
+            "resumed": len(done_urls) + len(pending_llm),
+            "scraped": len(done_urls) + len(pending_llm),
+            "analyzed": 0,
+            "llm_queued": 0,
+            "done": len(done_urls),
+            "changes": 0,
+            "errors": 0
+        }
+        for url in done_urls | set(pending_llm):
+            self._count_outcome(progress, state["results"][url])
+        progress_lock = threading.Lock()
+        
+        def mark_window(stage):
+            now = time.time()
+            window = stage_windows.setdefault(stage, [now, now])
+            window[1] = now
+        
+        def report_progress(message):
+            if progress_callback:
+                with progress_lock:
+                    snapshot = dict(progress)
+                snapshot["percent"] = int(snapshot["done"] * 100 / max(1, snapshot["total"]))
+                snapshot["message"] = message
+                try:
+                    progress_callback(snapshot)
+                except Exception as e:
+                    print(f"[Scanner] Progress callback error: {e}")
         
-        for url, source_info in all_sources.items():
+        def run_llm(url, scan_result, previous_content, content):
             try:
-                result = self.scan_source(url, source_info.get("description", ""))
-                result["used_by_pages"] = source_info.get("used_by_pages", [])
-                results.append(result)
-                
-                if result.get("has_changes") and result.get("success"):
-                    changes.append(result)
+                scan_result, elapsed = self._llm_stage(dict(scan_result), previous_content, content)
+                with progress_lock:
+                    timings["llm"].append(elapsed)
+                    mark_window("llm")
+            except Exception as e:
+                print(f"[Scanner] AI analysis failed for {url}: {e}")
+                scan_result = state["results"][url]
+                scan_result["ai_analysis"] = None
+            self._record_result(url, scan_result, "done")
+            with progress_lock:
+                progress["analyzed"] += 1
+                progress["done"] += 1
+            report_progress(f"AI analyzed {url}")
+        
+        # AI jobs queue in this scan's pool (llm_workers run at once) while scraping continues;
+        # their Ollama requests still share the client's global limit with the rest of the server
+        llm_futures = []
+        llm_pool = ThreadPoolExecutor(max_workers=self.llm_workers, thread_name_prefix='scan-llm')
+        
+        def queue_llm(url, scan_result, previous_content, content):
+            with progress_lock:
+                progress["llm_queued"] += 1
+            llm_futures.append(llm_pool.submit(run_llm, url, scan_result, previous_content, content))
+        
+        with ThreadPoolExecutor(max_workers=self.scrape_workers) as scrape_pool:
+            
+            # Re-queue AI work that was interrupted by a crash
+            for url, scan_result in pending_llm.items():
+                previous_content, content = self._load_pending_llm_input(scan_result)
+                if self.use_ai and previous_content and content:
+                    queue_llm(url, scan_result, previous_content, content)
+                else:
+                    self._record_result(url, scan_result, "done")
+                    with progress_lock:
+                        progress["done"] += 1
+            
+            scrape_futures = {scrape_pool.submit(self._scrape_stage, url): url for url in to_scrape}
+            report_progress(f"Scraping {len(to_scrape)} sources...")
+            
+            # Change detection runs here, in order of scrape completion, feeding the AI stage
+            for future in as_completed(scrape_futures):
+                url = scrape_futures[future]
+                source_info = all_sources[url]
                 
-                if not result.get("success"):
-                    errors.append(result)
+                try:
+                    result, elapsed = future.result()
+                    with progress_lock:
+                        timings["scrape"].append(elapsed)
+                        mark_window("scrape")
                     
-            except Exception as e:
-                print(f"[Scanner] Error scanning {url}: {e}")
-                errors.append({
-                    "url": url,
-                    "success": False,
-                    "error": str(e)
-                })
+                    detect_started = time.time()
+                    scan_result, previous_content = self._detect_stage(url, source_info.get("description", ""), result)
+                    with progress_lock:
+                        timings["detect"].append(time.time() - detect_started)
+                        mark_window("detect")
+                except Exception as e:
+                    print(f"[Scanner] Error scanning {url}: {e}")
+                    scan_result, previous_content = {"url": url, "success": False, "error": str(e)}, None
+                
+                scan_result["used_by_pages"] = source_info.get("used_by_pages", [])
+                
+                with progress_lock:
+                    progress["scraped"] += 1
+                    self._count_outcome(progress, scan_result)
+                
+                if self._needs_ai(scan_result, previous_content):
+                    self._record_result(url, scan_result, "llm_pending")
+                    queue_llm(url, scan_result, previous_content, result.get("content", ""))
+                else:
+                    self._record_result(url, scan_result, "done")
+                    with progress_lock:
+                        progress["done"] += 1
+                
+                report_progress(f"Scraped {progress['scraped']}/{progress['total']}")
+        
+        wait(llm_futures)
+        llm_pool.shutdown()
+        
+        # All stages finished - collect results
+        results, changes, errors = [], [], []
+        for url in all_sources:
+            result = state["results"].get(url)
+            if not result:
+                continue
+            result.pop("stage", None)
+            results.append(result)
+            if result.get("has_changes") and result.get("success"):
+                changes.append(result)
+            if not result.get("success"):
+                errors.append(result)
+        
+        timing = self._summarize_timings(timings, stage_windows, discovery_seconds, time.time() - scan_started)
+        timing["resumed_sources"] = progress["resumed"]
         
         # Generate report
-        report = self.generate_report(results, changes, errors)
+        report = self.generate_report(results, changes, errors, timing=timing)
         
         # Save report
         self.storage.save_weekly_report(report)
+        self._clear_scan_state()
         
         # Cleanup old files
         self.cleanup_old_history()
         
         print("=" * 60)
-        print(f"[Scanner] Scan complete!")
+        print(f"[Scanner] Scan complete in {timing['total_seconds']}s!")
         print(f"[Scanner] Sources scanned: {len(results)}")
         print(f"[Scanner] Changes detected: {len(changes)}")
         print(f"[Scanner] Errors: {len(errors)}")
         print("=" * 60)
         
+        progress["done"] = progress["total"]
+        report_progress(f"Complete! {len(changes)} changes found.")
+        
         return report
     
-    def generate_report(self, results, changes, errors):
+    def _summarize_timings(self, timings, stage_windows, discovery_seconds, total_seconds):
+        """פירוט זמנים לפי שלב - זמן עבודה מצטבר מול זמן קיר"""
+        stages = {}
+        for stage, values in timings.items():
+            window = stage_windows.get(stage)
+            stages[stage] = {
+                "count": len(values),
+                "busy_seconds": round(sum(values), 2),
+                "avg_seconds": round(sum(values) / len(values), 2) if values else 0,
+                "max_seconds": round(max(values), 2) if values else 0,
+                "wall_seconds": round(window[1] - window[0], 2) if window else 0
+            }
+        
+        return {
+            "total_seconds": round(total_seconds, 2),
+            "discovery_seconds": round(discovery_seconds, 2),
+            "stages": stages,
+            "workers": {"scrape": self.scrape_workers, "llm": self.llm_workers}
+        }
+    
+    def generate_report(self, results, changes, errors, timing=None):
         """יצירת דוח שבועי"""
         report_date = datetime.now().strftime("%Y-%m-%d")
         
@@ -293,6 +516,9 @@ class WeeklySourceScanner:
             ]
         }
         
+        if timing:
+            report["timing"] = timing
+        
         return report
     
     def cleanup_old_history(self, max_age_days=365):
@@ -323,6 +549,9 @@ def main():
     parser.add_argument('--no-ai', action='store_true', help='Run without AI analysis')
     parser.add_argument('--cleanup', action='store_true', help='Only run cleanup of old files')
     parser.add_argument('--status', action='store_true', help='Check scanner status')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent scrape workers')
+    parser.add_argument('--llm-workers', type=int, default=None, help='Concurrent AI comparisons (default and maximum: OLLAMA_NUM_PARALLEL env, else 1)')
+    parser.add_argument('--no-resume', action='store_true', help='Start fresh instead of resuming a crashed scan')
     
     args = parser.parse_args()
     
@@ -335,7 +564,7 @@ def main():
         print(f"URL: {ollama_status['base_url']}")
         return
     
-    scanner = WeeklySourceScanner(use_ai=not args.no_ai)
+    scanner = WeeklySourceScanner(use_ai=not args.no_ai, scrape_workers=args.workers, llm_workers=args.llm_workers)
     
     if args.cleanup:
         scanner.cleanup_old_history()
@@ -347,7 +576,7 @@ def main():
         return
     
     if args.full_scan:
-        report = scanner.run_full_scan()
+        report = scanner.run_full_scan(resume=not args.no_resume)
         print("\n" + "=" * 60)
         print("WEEKLY REPORT SUMMARY")
         print("=" * 60)
@@ -359,6 +588,11 @@ def main():
         print(f"  - Low Importance: {report['stats']['low_importance']}")
         print(f"Errors: {report['stats']['errors']}")
         
+        if report.get('timing'):
+            print(f"Duration: {report['timing']['total_seconds']}s")
+            for stage, t in report['timing']['stages'].items():
+                print(f"  - {stage}: {t['count']} items, busy {t['busy_seconds']}s, wall {t['wall_seconds']}s")
+        
         if report['changes']:
             print("\nCHANGES:")
             for change in report['changes']: